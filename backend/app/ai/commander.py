@@ -1,7 +1,10 @@
 from typing import List, Dict, Optional
 from datetime import datetime
+import asyncio
 import os
 
+import numpy as np
+
 try:
     from langchain_openai import ChatOpenAI
     from langchain.prompts import ChatPromptTemplate
@@ -12,10 +15,15 @@ except ImportError:
     print("LangChain not available. AI Commander will use fallback mode.")
 
 from ..models import Incident, Event, Action, ActionStatus, TimelineEntry, TimelineEntryType
-from ..db.storage import storage
+from ..db.storage import storage, run_storage
+from ..db.vector_store import vector_store
 from ..observability.metrics import ai_analysis_duration, ai_suggestions_generated
 import time
 
+# Nearest indexed vectors looked up per embedded event
+SIMILAR_EVENT_HITS = 10
+SIMILAR_INCIDENTS_LIMIT = 5
+
 
 class AICommander:
     """AI Incident Commander using LangChain"""
@@ -39,19 +47,20 @@ class AICommander:
         """Perform comprehensive incident analysis"""
         start_time = time.time()
 
-        incident = storage.get_incident(incident_id)
+        incident = await run_storage(storage.get_incident, incident_id)
         if not incident:
             return {"error": "Incident not found"}
 
         # Get related events
-        events = storage.list_events(incident_id, limit=50)
+        events = await run_storage(storage.list_events, incident_id, limit=50)
+        similar = await self._similar_incidents(incident, events)
 
         if not self.enabled:
             # Fallback analysis
-            return self._fallback_analysis(incident, events)
+            return self._fallback_analysis(incident, events, similar)
 
         # Build context
-        context = self._build_context(incident, events)
+        context = self._build_context(incident, events, similar)
 
         # Create analysis prompt
         prompt = ChatPromptTemplate.from_messages([
@@ -74,12 +83,14 @@ class AICommander:
 
             # Parse response
             analysis = self._parse_analysis(response.content)
+            analysis["similar_incidents"] = similar
 
             # Update incident with AI insights
-            storage.update_incident(incident_id, {
+            await run_storage(storage.update_incident, incident_id, {
                 "ai_summary": analysis.get("summary", ""),
                 "root_cause": analysis.get("root_cause", ""),
                 "suggested_actions": analysis.get("actions", []),
+                "similar_incidents": similar,
             })
 
             # Create suggested actions
@@ -92,7 +103,7 @@ class AICommander:
                     suggested_by="AI Commander",
                     status=ActionStatus.PENDING
                 )
-                storage.create_action(action)
+                await run_storage(storage.create_action, action)
 
             # Add timeline entry
             timeline_entry = TimelineEntry(
@@ -102,7 +113,7 @@ class AICommander:
                 description=analysis.get("summary", "Analysis complete"),
                 actor="AI Commander"
             )
-            storage.add_timeline_entry(timeline_entry)
+            await run_storage(storage.add_timeline_entry, timeline_entry)
 
             # Track metrics
             duration = time.time() - start_time
@@ -113,9 +124,32 @@ class AICommander:
 
         except Exception as e:
             print(f"AI analysis error: {e}")
-            return self._fallback_analysis(incident, events)
+            return self._fallback_analysis(incident, events, similar)
+
+    async def _similar_incidents(self, incident: Incident, events: List[Event]) -> List[str]:
+        """Other incidents with indexed vectors closest to these events' embeddings, best first.
 
-    def _build_context(self, incident: Incident, events: List[Event]) -> str:
+        All embedded events are looked up in one batched vector search.
+        """
+        embeddings = [
+            event.embedding for event in events
+            if event.embedding and len(event.embedding) == vector_store.dimension
+        ]
+        if not embeddings:
+            return []
+        results = await asyncio.to_thread(
+            vector_store.search_batch, np.array(embeddings, dtype='float32'), SIMILAR_EVENT_HITS
+        )
+
+        best: Dict[str, float] = {}
+        for hits in results:
+            for hit in hits:
+                other_id = hit.get("incident_id")
+                if other_id and other_id != incident.id and hit["similarity"] > best.get(other_id, -1.0):
+                    best[other_id] = hit["similarity"]
+        return sorted(best, key=best.get, reverse=True)[:SIMILAR_INCIDENTS_LIMIT]
+
+    def _build_context(self, incident: Incident, events: List[Event], similar: List[str]) -> str:
         """Build context string for AI analysis"""
         context = f"""
 INCIDENT DETAILS:
@@ -132,6 +166,9 @@ RECENT EVENTS ({len(events)} total):
         for event in events[:10]:
             context += f"\n[{event.timestamp}] [{event.level}] {event.source}: {event.message}"
 
+        if similar:
+            context += f"\n\nSIMILAR PAST INCIDENTS: {', '.join(similar)}"
+
         return context
 
     def _parse_analysis(self, response: str) -> Dict:
@@ -148,7 +185,7 @@ RECENT EVENTS ({len(events)} total):
             ]
         }
 
-    def _fallback_analysis(self, incident: Incident, events: List[Event]) -> Dict:
+    def _fallback_analysis(self, incident: Incident, events: List[Event], similar: List[str]) -> Dict:
         """Fallback analysis when AI is not available"""
         error_events = [e for e in events if e.level == "error"]
 
@@ -166,7 +203,7 @@ RECENT EVENTS ({len(events)} total):
             "summary": f"Detected {len(error_events)} error events. Manual investigation recommended.",
             "root_cause": "Analysis pending - AI Commander not available",
             "actions": actions,
-            "similar_incidents": [],
+            "similar_incidents": similar,
         }
 
 
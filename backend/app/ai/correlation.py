@@ -0,0 +1,446 @@
+import hashlib
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from ..config import get_settings
+from ..models import CorrelationProposal, Event, EventType, ProposalKind
+from ..observability.metrics import correlation_proposals
+
+# Events that take part in correlation: symptoms, not routine traffic
+CORRELATED_LEVELS = frozenset({"warning", "warn", "error", "critical", "fatal"})
+
+# Evidence per identical message template shared; without one, per 16-bit
+# SimHash band two similar messages share (messages within 3 differing bits
+# share at least one), up to one template's worth
+TEMPLATE_WEIGHT = 1.0
+SIMHASH_BAND_WEIGHT = 0.25
+SIMHASH_BANDS = 4
+
+# Incidents remembered per link key. A key that many incidents produce within
+# the window is too common to be evidence and links no further incidents.
+MAX_INCIDENTS_PER_KEY = 32
+# Shared link keys kept per incident pair as evidence
+MAX_EDGE_KEYS = 16
+# Message templates whose link keys are cached
+MAX_CACHED_TEMPLATES = 10_000
+# Message prefix a template is built from
+MAX_MESSAGE_CHARS = 256
+# Seconds between attachment checks of one unattached source/service
+ATTACH_CHECK_SECONDS = 1.0
+# Upper bound on seconds between pruning passes
+PRUNE_INTERVAL_SECONDS = 60.0
+
+# Numbers (also with a unit suffix), hex ids, UUID parts and IPs: the
+# variable parts of a message. Digits within names such as "db2" are kept.
+_VARIABLE = re.compile(r"(?<![0-9a-z])(?:0x)?[0-9a-f]*\d[0-9a-f]*(?![0-9a-z])|(?<![0-9a-z])\d+")
+_TOKEN = re.compile(r"[a-z_#]+")
+
+LinkKey = tuple
+
+
+def message_template(message: str) -> str:
+    """A message with its variable parts replaced by '#'"""
+    return _VARIABLE.sub("#", message[:MAX_MESSAGE_CHARS].lower())
+
+
+def simhash(tokens: Sequence[str]) -> int:
+    """64-bit SimHash of tokens: similar token sets give hashes a few bits apart"""
+    weights = [0] * 64
+    for token in tokens:
+        h = hash(token)
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+class IncidentActivity:
+    """Correlated events seen for one incident"""
+
+    __slots__ = ("first_seen", "last_seen", "events")
+
+    def __init__(self, now: float):
+        self.first_seen = now
+        self.last_seen = now
+        self.events = 0
+
+
+class Link:
+    """Evidence that two incidents are one problem: the link keys they share"""
+
+    __slots__ = ("keys", "score", "linked")
+
+    def __init__(self):
+        self.keys: Set[LinkKey] = set()
+        self.score = 0.0
+        self.linked = False
+
+
+class Attachment:
+    """An unattached source/service whose events match an incident's"""
+
+    __slots__ = ("source", "service", "incident_id", "keys", "score", "events", "first_seen", "last_seen")
+
+    def __init__(self, source: str, service: str, incident_id: str, keys: Set[LinkKey], score: float, now: float):
+        self.source = source
+        self.service = service
+        self.incident_id = incident_id
+        self.keys = keys
+        self.score = score
+        self.events = 0
+        self.first_seen = now
+        self.last_seen = now
+
+
+class EventCorrelator:
+    """Streaming correlation of incidents by their warning and error events
+
+    Each correlated event yields link keys: the values of selected metadata
+    keys (`service`, `region`, ...), its message template (numbers and ids
+    masked) and the bands of the template's SimHash. Two incidents whose
+    events produce the same key within `window_seconds` of each other share
+    it; once the weights of their shared keys reach `min_score` they are
+    joined in an incremental union-find. Components of more than one
+    incident are proposed merges.
+
+    Events without an incident are matched against the incidents' recent
+    keys instead, and the best match at or above `min_score` is proposed as
+    an attachment of their source/service to that incident.
+
+    State is bounded: keys remember their last `MAX_INCIDENTS_PER_KEY`
+    incidents within the window (and stop linking once that many share
+    them), incidents without correlated events for
+    `retention_seconds` (or beyond `max_incidents`) are dropped, and the
+    union-find is rebuilt from the remaining links when pruning.
+    """
+
+    def __init__(
+        self,
+        key_weights: Optional[Dict[str, float]] = None,
+        window_seconds: float = 300.0,
+        retention_seconds: float = 3600.0,
+        min_score: float = 1.5,
+        max_incidents: int = 10_000,
+    ):
+        self.key_weights = dict(key_weights or {"service": 1.0, "container_id": 1.0, "region": 0.25})
+        self.window_seconds = window_seconds
+        self.retention_seconds = retention_seconds
+        self.min_score = min_score
+        self.max_incidents = max_incidents
+
+        self._incidents: Dict[str, IncidentActivity] = {}
+        # Link key -> incident id -> last time an event produced the key
+        self._recent: Dict[LinkKey, Dict[str, float]] = {}
+        self._links: Dict[Tuple[str, str], Link] = {}
+        self._parent: Dict[str, str] = {}
+        self._size: Dict[str, int] = {}
+        self._dismissed: Set[Tuple[str, str]] = set()
+        self._attachments: Dict[Tuple[str, str], Attachment] = {}
+        self._attach_checked: Dict[Tuple[str, str], float] = {}
+        self._dismissed_attachments: Set[Tuple[str, str, str]] = set()
+        self._templates: Dict[str, Tuple[LinkKey, ...]] = {}
+        self._next_prune = 0.0
+
+    def observe(self, events: Sequence[Event], now: Optional[float] = None):
+        """Correlate the warning, error and alert events of a batch"""
+        now = time.time() if now is None else now
+        if now >= self._next_prune:
+            self._prune(now)
+        horizon = now - self.window_seconds
+        for event in events:
+            if event.event_type != EventType.ALERT and event.level.lower() not in CORRELATED_LEVELS:
+                continue
+            incident_id = event.incident_id
+            if incident_id is None:
+                self._check_attachment(event, now, horizon)
+                continue
+
+            activity = self._incidents.get(incident_id)
+            if activity is None:
+                if len(self._incidents) >= self.max_incidents:
+                    self._prune(now)
+                activity = self._incidents[incident_id] = IncidentActivity(now)
+            activity.last_seen = now
+            activity.events += 1
+
+            for key in self._link_keys(event):
+                recent = self._recent.get(key)
+                if recent is None:
+                    recent = self._recent[key] = {}
+                seen = recent.get(incident_id)
+                if seen is not None and seen >= horizon:
+                    # Already linked to the key's other recent incidents
+                    recent[incident_id] = now
+                    continue
+                if len(recent) < MAX_INCIDENTS_PER_KEY:
+                    for other, other_seen in recent.items():
+                        if other_seen >= horizon and other != incident_id:
+                            self._link(incident_id, other, key)
+                recent.pop(incident_id, None)
+                recent[incident_id] = now
+                if len(recent) > MAX_INCIDENTS_PER_KEY:
+                    del recent[next(iter(recent))]
+
+    def proposals(self) -> List[CorrelationProposal]:
+        """Current merge and attachment proposals, most recently active first"""
+        members: Dict[str, List[str]] = {}
+        for incident_id in self._parent:
+            members.setdefault(self._find(incident_id), []).append(incident_id)
+        component_links: Dict[str, List[Link]] = {}
+        for (a, _), link in self._links.items():
+            if link.linked:
+                component_links.setdefault(self._find(a), []).append(link)
+
+        proposals = []
+        for root, incident_ids in members.items():
+            if len(incident_ids) < 2:
+                continue
+            incident_ids.sort(key=lambda i: self._incidents[i].first_seen)
+            links = component_links.get(root, [])
+            activity = [self._incidents[i] for i in incident_ids]
+            proposals.append(CorrelationProposal(
+                id=_proposal_id("merge", *sorted(incident_ids)),
+                kind=ProposalKind.MERGE,
+                incident_id=incident_ids[0],
+                incident_ids=incident_ids[1:],
+                score=round(max((link.score for link in links), default=0.0), 3),
+                evidence=_describe(set().union(*(link.keys for link in links))),
+                events=sum(a.events for a in activity),
+                first_seen=datetime.utcfromtimestamp(min(a.first_seen for a in activity)),
+                last_seen=datetime.utcfromtimestamp(max(a.last_seen for a in activity)),
+            ))
+
+        for attachment in self._attachments.values():
+            proposals.append(CorrelationProposal(
+                id=_proposal_id("attach", attachment.source, attachment.service, attachment.incident_id),
+                kind=ProposalKind.ATTACH,
+                incident_id=attachment.incident_id,
+                source=attachment.source,
+                service=attachment.service or None,
+                score=round(attachment.score, 3),
+                evidence=_describe(attachment.keys),
+                events=attachment.events,
+                first_seen=datetime.utcfromtimestamp(attachment.first_seen),
+                last_seen=datetime.utcfromtimestamp(attachment.last_seen),
+            ))
+        proposals.sort(key=lambda p: p.last_seen, reverse=True)
+        return proposals
+
+    def get(self, proposal_id: str) -> Optional[CorrelationProposal]:
+        return next((p for p in self.proposals() if p.id == proposal_id), None)
+
+    def dismiss(self, proposal: CorrelationProposal):
+        """Stop proposing this merge or attachment"""
+        if proposal.kind == ProposalKind.ATTACH:
+            key = (proposal.source, proposal.service or "")
+            self._dismissed_attachments.add((key[0], key[1], proposal.incident_id))
+            self._attachments.pop(key, None)
+            return
+        incident_ids = [proposal.incident_id] + proposal.incident_ids
+        for i, a in enumerate(incident_ids):
+            for b in incident_ids[i + 1:]:
+                self._dismissed.add(_pair(a, b))
+        self._rebuild()
+
+    def forget(self, incident_ids: Sequence[str]):
+        """Drop incidents from correlation, e.g. once merged into another"""
+        self._drop(set(incident_ids))
+
+    def remove_attachment(self, source: str, service: Optional[str]):
+        """Drop the attachment proposal of a source/service, e.g. once accepted"""
+        self._attachments.pop((source, service or ""), None)
+
+    def _link_keys(self, event: Event) -> Tuple[LinkKey, ...]:
+        metadata = event.metadata
+        keys = tuple(
+            ("m", name, str(value)) for name in self.key_weights
+            if isinstance(value := metadata.get(name), (str, int)) and value != ""
+        )
+        template = message_template(event.message)
+        message_keys = self._templates.get(template)
+        if message_keys is None:
+            if len(self._templates) >= MAX_CACHED_TEMPLATES:
+                self._templates.clear()
+            signature = simhash(_TOKEN.findall(template))
+            message_keys = self._templates[template] = (("t", template),) + tuple(
+                ("b", band, signature >> (16 * band) & 0xFFFF) for band in range(SIMHASH_BANDS)
+            )
+        return keys + message_keys
+
+    def _score(self, keys: Set[LinkKey]) -> float:
+        score = 0.0
+        bands = 0
+        templates = 0
+        for key in keys:
+            if key[0] == "m":
+                score += self.key_weights.get(key[1], 0.0)
+            elif key[0] == "t":
+                templates += 1
+            else:
+                bands += 1
+        if templates:
+            return score + TEMPLATE_WEIGHT * templates
+        return score + min(TEMPLATE_WEIGHT, SIMHASH_BAND_WEIGHT * bands)
+
+    def _link(self, a: str, b: str, key: LinkKey):
+        pair = _pair(a, b)
+        if pair in self._dismissed:
+            return
+        link = self._links.get(pair)
+        if link is None:
+            link = self._links[pair] = Link()
+        if len(link.keys) < MAX_EDGE_KEYS:
+            link.keys.add(key)
+        link.score = self._score(link.keys)
+        if not link.linked and link.score >= self.min_score:
+            link.linked = True
+            if self._union(a, b):
+                correlation_proposals.labels(kind=ProposalKind.MERGE.value).inc()
+
+    def _find(self, x: str) -> str:
+        parent = self._parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:  # path compression
+            parent[x], x = root, parent[x]
+        return root
+
+    def _union(self, a: str, b: str) -> bool:
+        for x in (a, b):
+            if x not in self._parent:
+                self._parent[x] = x
+                self._size[x] = 1
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return False
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size.pop(b)
+        return True
+
+    def _check_attachment(self, event: Event, now: float, horizon: float):
+        service = event.metadata.get("service")
+        key = (event.source, service if isinstance(service, str) else "")
+        attachment = self._attachments.get(key)
+        if attachment is not None:
+            attachment.events += 1
+            attachment.last_seen = now
+        checked = self._attach_checked.get(key)
+        if checked is not None and now - checked < ATTACH_CHECK_SECONDS:
+            return
+        self._attach_checked[key] = now
+
+        candidates: Dict[str, Set[LinkKey]] = {}
+        for link_key in self._link_keys(event):
+            for incident_id, seen in self._recent.get(link_key, {}).items():
+                if seen >= horizon:
+                    candidates.setdefault(incident_id, set()).add(link_key)
+        best = max(
+            ((self._score(keys), incident_id, keys) for incident_id, keys in candidates.items()
+             if (key[0], key[1], incident_id) not in self._dismissed_attachments),
+            default=None, key=lambda candidate: candidate[0],
+        )
+        if best is None or best[0] < self.min_score:
+            return
+        score, incident_id, keys = best
+        if attachment is not None and attachment.incident_id == incident_id:
+            attachment.keys |= keys
+            attachment.score = max(attachment.score, score)
+        elif attachment is None or score > attachment.score:
+            attachment = self._attachments[key] = Attachment(key[0], key[1], incident_id, keys, score, now)
+            attachment.events = 1
+            correlation_proposals.labels(kind=ProposalKind.ATTACH.value).inc()
+
+    def _prune(self, now: float):
+        """Drop incidents idle for the retention period, then the oldest beyond capacity"""
+        self._next_prune = now + min(self.window_seconds, PRUNE_INTERVAL_SECONDS)
+        idle_before = now - self.retention_seconds
+        stale = {i for i, activity in self._incidents.items() if activity.last_seen < idle_before}
+        excess = len(self._incidents) - len(stale) - self.max_incidents * 9 // 10
+        if excess > 0:
+            by_age = sorted(
+                (i for i in self._incidents if i not in stale), key=lambda i: self._incidents[i].last_seen
+            )
+            stale.update(by_age[:excess])
+
+        horizon = now - self.window_seconds
+        for key, recent in list(self._recent.items()):
+            for incident_id in [i for i, seen in recent.items() if seen < horizon or i in stale]:
+                del recent[incident_id]
+            if not recent:
+                del self._recent[key]
+        for key, checked in list(self._attach_checked.items()):
+            if checked < horizon:
+                del self._attach_checked[key]
+        for key, attachment in list(self._attachments.items()):
+            if attachment.last_seen < idle_before:
+                del self._attachments[key]
+        self._drop(stale)
+
+    def _drop(self, incident_ids: Set[str]):
+        for incident_id in incident_ids:
+            self._incidents.pop(incident_id, None)
+        for recent in self._recent.values():
+            for incident_id in incident_ids & recent.keys():
+                del recent[incident_id]
+        for key, attachment in list(self._attachments.items()):
+            if attachment.incident_id not in self._incidents:
+                del self._attachments[key]
+        self._links = {
+            pair: link for pair, link in self._links.items()
+            if pair[0] in self._incidents and pair[1] in self._incidents
+        }
+        self._dismissed = {
+            pair for pair in self._dismissed if pair[0] in self._incidents and pair[1] in self._incidents
+        }
+        self._dismissed_attachments = {
+            entry for entry in self._dismissed_attachments if entry[2] in self._incidents
+        }
+        self._rebuild()
+
+    def _rebuild(self):
+        """Union-find from the links that remain, as it cannot remove members"""
+        self._parent = {}
+        self._size = {}
+        for pair, link in self._links.items():
+            if pair in self._dismissed:
+                link.linked = False
+            elif link.linked:
+                self._union(*pair)
+
+
+def _pair(a: str, b: str) -> Tuple[str, str]:
+    return (a, b) if a < b else (b, a)
+
+
+def _proposal_id(kind: str, *parts: str) -> str:
+    return f"{kind}-" + hashlib.sha1("\0".join(parts).encode()).hexdigest()[:16]
+
+
+def _describe(keys: Set[LinkKey]) -> List[str]:
+    """Readable evidence for shared link keys"""
+    evidence = sorted(f"{key[1]}={key[2]}" for key in keys if key[0] == "m")
+    evidence.extend(sorted(f"message: {key[1]}" for key in keys if key[0] == "t"))
+    if not any(key[0] == "t" for key in keys) and any(key[0] == "b" for key in keys):
+        evidence.append("similar messages")
+    return evidence
+
+
+def create_correlator(settings) -> Optional[EventCorrelator]:
+    """Build the event correlator from application settings, or None if disabled"""
+    if not settings.correlation_enabled:
+        return None
+    return EventCorrelator(
+        key_weights=settings.correlation_keys,
+        window_seconds=settings.correlation_window_seconds,
+        retention_seconds=settings.correlation_retention_seconds,
+        min_score=settings.correlation_min_score,
+        max_incidents=settings.correlation_max_incidents,
+    )
+
+
+# Global correlator fed by the ingestion paths
+event_correlator = create_correlator(get_settings())
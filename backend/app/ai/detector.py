@@ -0,0 +1,439 @@
+import math
+import time
+import uuid
+from bisect import insort
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from ..config import get_settings
+from ..models import Event, Incident, IncidentSeverity, TimelineEntry, TimelineEntryType
+from ..db.storage import storage, run_storage
+from ..observability.metrics import active_incidents, anomalies_detected, incidents_created
+
+# Levels counted as errors for the error-rate statistics
+ERROR_LEVELS = frozenset({"error", "critical", "fatal"})
+# Levels that make a detected incident critical on their own
+CRITICAL_LEVELS = frozenset({"critical", "fatal"})
+
+# Empty ticks replayed into the statistics after a key was idle; longer
+# gaps decay the baseline no further than this
+MAX_IDLE_TICKS = 60
+# Ticks after which the rolling quantile estimators start a new generation
+QUANTILE_GENERATION_TICKS = 360
+
+# Incident source for automatically opened incidents
+DETECTOR_SOURCE = "detector"
+
+
+class P2Quantile:
+    """Streaming estimate of one quantile in O(1) memory (Jain & Chlamtac P²)
+
+    Keeps five markers whose heights track the minimum, p/2, p, (1+p)/2 and
+    maximum quantiles, adjusted with piecewise-parabolic interpolation as
+    observations arrive.
+    """
+
+    __slots__ = ("p", "count", "heights", "positions", "desired", "increments")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x: float):
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            insort(q, x)
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Parabolic prediction, or linear when it would leave the bracket
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def value(self) -> Optional[float]:
+        if not self.count:
+            return None
+        if self.count <= 5:
+            return self.heights[min(int(self.p * self.count), self.count - 1)]
+        return self.heights[2]
+
+
+class RollingQuantile:
+    """P² quantile over a rolling window of roughly `window` observations
+
+    Runs two generations of estimators: once the current one has seen
+    `window` observations it becomes the previous one and a fresh one
+    starts. The estimate comes from whichever has seen more, so old
+    behaviour ages out within two windows at constant memory.
+    """
+
+    __slots__ = ("p", "window", "current", "previous")
+
+    def __init__(self, p: float, window: int):
+        self.p = p
+        self.window = window
+        self.current = P2Quantile(p)
+        self.previous: Optional[P2Quantile] = None
+
+    def add(self, x: float):
+        if self.current.count >= self.window:
+            self.previous, self.current = self.current, P2Quantile(self.p)
+        self.current.add(x)
+
+    def value(self) -> Optional[float]:
+        if self.previous is not None and self.previous.count > self.current.count:
+            return self.previous.value()
+        return self.current.value()
+
+
+class KeyStats:
+    """Per (source, service) statistics over fixed ticks, O(1) memory"""
+
+    __slots__ = (
+        "tick", "events", "errors", "ticks",
+        "rate_mean", "rate_var", "error_mean", "error_var", "rate_quantile", "error_quantile",
+        "rate_limit", "error_limit", "pending", "incident_id", "active_until", "quiet_tick", "last_seen",
+    )
+
+    def __init__(self, tick: int, quantile: float, pending: int, error_limit: float, now: float):
+        self.tick = tick
+        self.events = 0
+        self.errors = 0
+        self.ticks = 0
+        self.rate_mean = 0.0
+        self.rate_var = 0.0
+        self.error_mean = 0.0
+        self.error_var = 0.0
+        self.rate_quantile = RollingQuantile(quantile, QUANTILE_GENERATION_TICKS)
+        self.error_quantile = RollingQuantile(quantile, QUANTILE_GENERATION_TICKS)
+        # Events in the current tick above which it is anomalous; no volume
+        # limit until the key has a baseline
+        self.rate_limit: Optional[float] = None
+        self.error_limit = error_limit
+        # Recent events without an incident, attached if the key trips
+        self.pending: Deque[Tuple[Event, float]] = deque(maxlen=pending)
+        self.incident_id: Optional[str] = None
+        self.active_until = 0.0
+        self.quiet_tick = -1  # tick in which a released key does not trip again
+        self.last_seen = now
+
+
+class Anomaly:
+    """A threshold breach that opens an incident"""
+
+    __slots__ = ("incident_id", "source", "service", "kind", "observed", "limit", "baseline",
+                 "error_ratio", "severity", "events", "detected_at")
+
+    def __init__(self, incident_id: str, source: str, service: str, kind: str, observed: int,
+                 limit: float, baseline: float, error_ratio: float, severity: IncidentSeverity,
+                 events: List[Event], detected_at: float):
+        self.incident_id = incident_id
+        self.source = source
+        self.service = service
+        self.kind = kind
+        self.observed = observed
+        self.limit = limit
+        self.baseline = baseline
+        self.error_ratio = error_ratio
+        self.severity = severity
+        self.events = events
+        self.detected_at = detected_at
+
+
+class AnomalyDetector:
+    """Streaming error-rate and event-rate anomaly detection per source/service
+
+    Events without an `incident_id` are counted per (source,
+    `metadata.service`) key in ticks of `tick_seconds`; events already
+    logged against an incident are ignored, so a burst on an incident
+    someone opened does not open a second one. When a tick closes, its event
+    and error counts update an EWMA mean and variance and a rolling P²
+    quantile per key. The next tick is anomalous once its count exceeds all
+    of `min_*` (an absolute floor), mean + `sigma` standard deviations, and
+    the rolling quantile, checked as each event arrives. Error counts are
+    checked from the first event; event volume only once a key has
+    `warmup_ticks` of history.
+
+    A breach opens an incident for the key: its recent unattached events
+    and later events without an `incident_id` are attached to it until
+    `cooldown_seconds` pass without another breaching tick, or it is
+    released (resolved).
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = 10.0,
+        alpha: float = 0.1,
+        sigma: float = 4.0,
+        quantile: float = 0.99,
+        warmup_ticks: int = 30,
+        min_errors: int = 20,
+        min_events: int = 100,
+        cooldown_seconds: float = 900.0,
+        pending_events: int = 50,
+        max_keys: int = 100_000,
+    ):
+        self.tick_seconds = tick_seconds
+        self.alpha = alpha
+        self.sigma = sigma
+        self.quantile = quantile
+        self.warmup_ticks = warmup_ticks
+        self.min_errors = min_errors
+        self.min_events = min_events
+        self.cooldown_seconds = cooldown_seconds
+        self.pending_events = pending_events
+        self.max_keys = max_keys
+        self._stats: Dict[Tuple[str, str], KeyStats] = {}
+
+    def observe(self, events: Sequence[Event], now: Optional[float] = None) -> List[Anomaly]:
+        """Update statistics with events without an incident, attaching them.
+
+        Events with an `incident_id` are skipped. The others get the incident of their key when
+        one is active; the rest are held as pending triggering events. Returns
+        the anomalies detected, each with a new incident id to be opened
+        (see `open_incident`) and its attached pending events.
+        """
+        now = time.time() if now is None else now
+        tick = int(now // self.tick_seconds)
+        anomalies = []
+        for event in events:
+            if event.incident_id is not None:
+                continue
+            service = event.metadata.get("service")
+            key = (event.source, service if isinstance(service, str) else "")
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_keys:
+                    self._prune(now)
+                stats = self._stats[key] = KeyStats(tick, self.quantile, self.pending_events, self.min_errors, now)
+            elif tick != stats.tick:
+                self._close_ticks(stats, tick, now)
+            stats.last_seen = now
+
+            stats.events += 1
+            if event.level.lower() in ERROR_LEVELS:
+                stats.errors += 1
+
+            if stats.incident_id is not None and now >= stats.active_until:
+                stats.incident_id = None
+            if stats.incident_id is None and stats.tick != stats.quiet_tick:
+                if stats.errors > stats.error_limit:
+                    anomalies.append(self._open(key, stats, "error_rate", stats.errors, stats.error_limit,
+                                                stats.error_mean, event, now))
+                elif stats.rate_limit is not None and stats.events > stats.rate_limit:
+                    anomalies.append(self._open(key, stats, "event_rate", stats.events, stats.rate_limit,
+                                                stats.rate_mean, event, now))
+
+            if stats.incident_id is not None:
+                event.incident_id = stats.incident_id
+            else:
+                stats.pending.append((event, now))
+        return anomalies
+
+    def release(self, incident_id: str):
+        """Stop attaching events to an incident, e.g. once it is resolved"""
+        for stats in self._stats.values():
+            if stats.incident_id == incident_id:
+                stats.incident_id = None
+                stats.quiet_tick = stats.tick
+
+    def assign(self, source: str, service: Optional[str], incident_id: str,
+               now: Optional[float] = None) -> List[Event]:
+        """Attach a key's events without an incident to `incident_id`, as if it had tripped.
+
+        Returns the key's pending events, now attached to the incident.
+        """
+        now = time.time() if now is None else now
+        key = (source, service or "")
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = KeyStats(
+                int(now // self.tick_seconds), self.quantile, self.pending_events, self.min_errors, now,
+            )
+        stats.incident_id = incident_id
+        stats.active_until = now + self.cooldown_seconds
+        events = [event for event, _ in stats.pending if event.incident_id is None]
+        stats.pending.clear()
+        for event in events:
+            event.incident_id = incident_id
+        return events
+
+    def reassign(self, incident_id: str, new_incident_id: str):
+        """Attach events meant for one incident to another, e.g. once merged into it"""
+        for stats in self._stats.values():
+            if stats.incident_id == incident_id:
+                stats.incident_id = new_incident_id
+
+    def _close_ticks(self, stats: KeyStats, tick: int, now: float):
+        breached = stats.errors > stats.error_limit or (
+            stats.rate_limit is not None and stats.events > stats.rate_limit
+        )
+        if breached and stats.incident_id is not None:
+            stats.active_until = now + self.cooldown_seconds
+
+        self._add_tick(stats, stats.events, stats.errors)
+        for _ in range(min(tick - stats.tick - 1, MAX_IDLE_TICKS)):
+            self._add_tick(stats, 0, 0)
+        stats.tick = tick
+        stats.events = 0
+        stats.errors = 0
+
+        error_quantile = stats.error_quantile.value() or 0.0
+        stats.error_limit = max(
+            self.min_errors, stats.error_mean + self.sigma * math.sqrt(stats.error_var), error_quantile,
+        )
+        if stats.ticks >= self.warmup_ticks:
+            stats.rate_limit = max(
+                self.min_events,
+                stats.rate_mean + self.sigma * math.sqrt(stats.rate_var),
+                stats.rate_quantile.value() or 0.0,
+            )
+
+    def _add_tick(self, stats: KeyStats, events: int, errors: int):
+        # Incremental EWMA mean and variance
+        a = self.alpha
+        diff = events - stats.rate_mean
+        stats.rate_mean += a * diff
+        stats.rate_var = (1 - a) * (stats.rate_var + a * diff * diff)
+        diff = errors - stats.error_mean
+        stats.error_mean += a * diff
+        stats.error_var = (1 - a) * (stats.error_var + a * diff * diff)
+        stats.rate_quantile.add(events)
+        stats.error_quantile.add(errors)
+        stats.ticks += 1
+
+    def _open(self, key: Tuple[str, str], stats: KeyStats, kind: str, observed: int, limit: float,
+              baseline: float, trigger: Event, now: float) -> Anomaly:
+        stats.incident_id = str(uuid.uuid4())
+        stats.active_until = now + self.cooldown_seconds
+
+        # Pending events from the last two ticks are the lead-up to the breach
+        horizon = now - 2 * self.tick_seconds
+        events = [event for event, seen in stats.pending if seen >= horizon and event.incident_id is None]
+        stats.pending.clear()
+        for event in events:
+            event.incident_id = stats.incident_id
+
+        error_ratio = stats.errors / stats.events
+        levels = {event.level.lower() for event in events} | {trigger.level.lower()}
+        if levels & CRITICAL_LEVELS or error_ratio >= 0.5:
+            severity = IncidentSeverity.CRITICAL
+        elif kind == "error_rate" and (error_ratio >= 0.2 or observed >= 4 * limit):
+            severity = IncidentSeverity.HIGH
+        elif kind == "error_rate":
+            severity = IncidentSeverity.MEDIUM
+        else:
+            severity = IncidentSeverity.LOW
+
+        anomalies_detected.labels(kind=kind).inc()
+        return Anomaly(stats.incident_id, key[0], key[1], kind, observed, limit, baseline,
+                       error_ratio, severity, events, now)
+
+    def _prune(self, now: float):
+        """Forget keys idle for a cooldown period that have no active incident"""
+        idle_before = now - self.cooldown_seconds
+        for key, stats in list(self._stats.items()):
+            if stats.last_seen < idle_before and (stats.incident_id is None or now >= stats.active_until):
+                del self._stats[key]
+
+
+async def open_incident(anomaly: Anomaly) -> Incident:
+    """Create the incident for a detected anomaly, with a timeline entry"""
+    subject = f"{anomaly.source}/{anomaly.service}" if anomaly.service else anomaly.source
+    window = get_settings().detector_tick_seconds
+    if anomaly.kind == "error_rate":
+        title = f"Error rate spike on {subject}"
+        description = (
+            f"{anomaly.observed} errors within {window:g}s on {subject} "
+            f"(threshold {anomaly.limit:.1f}, baseline {anomaly.baseline:.1f} per {window:g}s); "
+            f"{anomaly.error_ratio:.0%} of events are errors."
+        )
+    else:
+        title = f"Event rate spike on {subject}"
+        description = (
+            f"{anomaly.observed} events within {window:g}s on {subject} "
+            f"(threshold {anomaly.limit:.1f}, baseline {anomaly.baseline:.1f} per {window:g}s)."
+        )
+
+    incident = Incident(
+        id=anomaly.incident_id,
+        title=title,
+        description=description,
+        severity=anomaly.severity,
+        source=DETECTOR_SOURCE,
+        tags=["auto-detected", anomaly.kind] + ([anomaly.service] if anomaly.service else []),
+        metadata={"detection": {
+            "kind": anomaly.kind,
+            "source": anomaly.source,
+            "service": anomaly.service,
+            "observed": anomaly.observed,
+            "threshold": round(anomaly.limit, 3),
+            "baseline": round(anomaly.baseline, 3),
+            "error_ratio": round(anomaly.error_ratio, 3),
+            "tick_seconds": window,
+        }},
+    )
+    await run_storage(storage.create_incident, incident)
+
+    await run_storage(storage.add_timeline_entry, TimelineEntry(
+        incident_id=incident.id,
+        entry_type=TimelineEntryType.SYSTEM_EVENT,
+        title="Incident detected",
+        description=f"{description} {len(anomaly.events)} triggering events attached.",
+        actor=DETECTOR_SOURCE,
+    ))
+
+    incidents_created.labels(severity=incident.severity.value, source=incident.source).inc()
+    active_incidents.labels(severity=incident.severity.value, status=incident.status.value).inc()
+    return incident
+
+
+def create_detector(settings) -> Optional[AnomalyDetector]:
+    """Build the anomaly detector from application settings, or None if disabled"""
+    if not settings.detector_enabled:
+        return None
+    return AnomalyDetector(
+        tick_seconds=settings.detector_tick_seconds,
+        alpha=settings.detector_alpha,
+        sigma=settings.detector_sigma,
+        quantile=settings.detector_quantile,
+        warmup_ticks=settings.detector_warmup_ticks,
+        min_errors=settings.detector_min_errors,
+        min_events=settings.detector_min_events,
+        cooldown_seconds=settings.detector_cooldown_seconds,
+    )
+
+
+# Global detector fed by the ingestion paths
+anomaly_detector = create_detector(get_settings())
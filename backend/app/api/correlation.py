@@ -0,0 +1,214 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional, Tuple
+from datetime import datetime
+
+from ..models import (
+    CorrelationProposal,
+    Incident,
+    IncidentStatus,
+    IncidentSeverity,
+    ProposalKind,
+    TimelineEntry,
+    TimelineEntryType,
+)
+from ..ai.correlation import EventCorrelator, event_correlator
+from ..ai.detector import anomaly_detector
+from ..config import get_settings
+from ..db.storage import storage, run_storage
+from ..ingest.events import store_events, uuid4_strings
+from ..observability.metrics import active_incidents
+
+router = APIRouter(prefix="/api/correlations", tags=["correlation"])
+
+# Incidents that can still be merged or attached to
+ACTIVE_STATUSES = (
+    IncidentStatus.OPEN,
+    IncidentStatus.INVESTIGATING,
+    IncidentStatus.IDENTIFIED,
+    IncidentStatus.MONITORING,
+)
+SEVERITY_ORDER = [
+    IncidentSeverity.INFO,
+    IncidentSeverity.LOW,
+    IncidentSeverity.MEDIUM,
+    IncidentSeverity.HIGH,
+    IncidentSeverity.CRITICAL,
+]
+# Events copied from a merged incident when retention sets no limit
+MERGE_EVENT_LIMIT = 100000
+
+
+def _correlator() -> EventCorrelator:
+    if event_correlator is None:
+        raise HTTPException(status_code=501, detail="Event correlation is disabled")
+    return event_correlator
+
+
+async def _resolve(proposal: CorrelationProposal) -> Optional[Tuple[CorrelationProposal, List[Incident]]]:
+    """The proposal restricted to incidents that are still active, with those incidents.
+
+    A merge keeps the earliest created incident; returns None once fewer
+    than two (merge) or no (attach) incidents remain.
+    """
+    incident_ids = [proposal.incident_id] + proposal.incident_ids
+    incidents = [await run_storage(storage.get_incident, incident_id) for incident_id in incident_ids]
+    incidents = [incident for incident in incidents if incident and incident.status in ACTIVE_STATUSES]
+    if not incidents or (proposal.kind == ProposalKind.MERGE and len(incidents) < 2):
+        return None
+    incidents.sort(key=lambda incident: incident.created_at)
+    resolved = proposal.model_copy(update={
+        "incident_id": incidents[0].id,
+        "incident_ids": [incident.id for incident in incidents[1:]],
+    })
+    return resolved, incidents
+
+
+async def _find_proposal(proposal_id: str) -> Tuple[CorrelationProposal, List[Incident]]:
+    proposal = _correlator().get(proposal_id)
+    resolved = await _resolve(proposal) if proposal else None
+    if not resolved:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    return resolved
+
+
+@router.get("/", response_model=List[CorrelationProposal])
+async def list_proposals(
+    kind: Optional[ProposalKind] = None,
+    incident_id: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=1000),
+) -> List[CorrelationProposal]:
+    """Proposed incident merges and attachments, most recently active first"""
+    proposals = []
+    for proposal in _correlator().proposals():
+        if kind is not None and proposal.kind != kind:
+            continue
+        if incident_id is not None and incident_id not in [proposal.incident_id] + proposal.incident_ids:
+            continue
+        resolved = await _resolve(proposal)
+        if resolved:
+            proposals.append(resolved[0])
+            if len(proposals) >= limit:
+                break
+    return proposals
+
+
+@router.get("/{proposal_id}", response_model=CorrelationProposal)
+async def get_proposal(proposal_id: str) -> CorrelationProposal:
+    """Get a correlation proposal"""
+    proposal, _ = await _find_proposal(proposal_id)
+    return proposal
+
+
+@router.post("/{proposal_id}/accept", response_model=Incident)
+async def accept_proposal(proposal_id: str) -> Incident:
+    """Apply a proposal and return the incident that remains.
+
+    A merge closes the other incidents, copies their events into the kept
+    one and routes their sources to it. An attachment stores the source's
+    recent unattached events in the incident and sends its later events
+    without an incident_id there, like an incident opened by detection.
+    """
+    proposal, incidents = await _find_proposal(proposal_id)
+    if proposal.kind == ProposalKind.MERGE:
+        return await _merge(proposal, incidents[0], incidents[1:])
+    return await _attach(proposal, incidents[0])
+
+
+@router.post("/{proposal_id}/dismiss", status_code=204)
+async def dismiss_proposal(proposal_id: str) -> Response:
+    """Stop proposing this merge or attachment"""
+    proposal, _ = await _find_proposal(proposal_id)
+    _correlator().dismiss(proposal)
+    return Response(status_code=204)
+
+
+async def _merge(proposal: CorrelationProposal, primary: Incident, others: List[Incident]) -> Incident:
+    event_limit = get_settings().max_events_per_incident or MERGE_EVENT_LIMIT
+    merged_ids = []
+    copied = 0
+    for other in others:
+        # Close it only if nobody changed its status meanwhile
+        closed = await run_storage(storage.compare_and_set_status, other.id, other.status, {
+            "status": IncidentStatus.CLOSED,
+            "updated_at": datetime.utcnow(),
+            "metadata": {**other.metadata, "merged_into": primary.id},
+        })
+        if not closed:
+            continue
+        merged_ids.append(other.id)
+        active_incidents.labels(severity=other.severity.value, status=other.status.value).dec()
+        if anomaly_detector is not None:
+            anomaly_detector.reassign(other.id, primary.id)
+
+        # Newest first; stored oldest first like at ingest
+        events = await run_storage(storage.list_events, other.id, event_limit)
+        events.reverse()
+        copies = [
+            event.model_copy(update={"id": event_id, "incident_id": primary.id})
+            for event, event_id in zip(events, uuid4_strings(len(events)))
+        ]
+        if copies:
+            await run_storage(storage.create_events, copies)
+        copied += len(copies)
+
+        await run_storage(storage.add_timeline_entry, TimelineEntry(
+            incident_id=other.id,
+            entry_type=TimelineEntryType.STATUS_CHANGE,
+            title="Merged into another incident",
+            description=f"Closed and merged into \"{primary.title}\"; {len(copies)} events copied there.",
+            actor="user",
+            metadata={"proposal_id": proposal.id, "merged_into": primary.id},
+        ))
+
+    if not merged_ids:
+        raise HTTPException(status_code=409, detail="Incident status changed concurrently, retry")
+    _correlator().forget(merged_ids)
+
+    merged = [other for other in others if other.id in merged_ids]
+    severity = max([primary.severity] + [other.severity for other in merged], key=SEVERITY_ORDER.index)
+    updated = await run_storage(storage.update_incident, primary.id, {
+        "severity": severity,
+        "tags": list(dict.fromkeys(primary.tags + [tag for other in merged for tag in other.tags])),
+        "metadata": {**primary.metadata, "merged_incidents": primary.metadata.get("merged_incidents", []) + merged_ids},
+        "updated_at": datetime.utcnow(),
+    })
+    if updated and severity != primary.severity:
+        active_incidents.labels(severity=primary.severity.value, status=updated.status.value).dec()
+        active_incidents.labels(severity=severity.value, status=updated.status.value).inc()
+
+    await run_storage(storage.add_timeline_entry, TimelineEntry(
+        incident_id=primary.id,
+        entry_type=TimelineEntryType.SYSTEM_EVENT,
+        title=f"Merged {len(merged)} related incidents",
+        description=(
+            f"Merged {', '.join(repr(other.title) for other in merged)} with {copied} events. "
+            f"Evidence: {'; '.join(proposal.evidence) or 'none'}."
+        ),
+        actor="user",
+        metadata={"proposal_id": proposal.id, "merged": merged_ids},
+    ))
+    return updated or primary
+
+
+async def _attach(proposal: CorrelationProposal, incident: Incident) -> Incident:
+    if anomaly_detector is None:
+        # Without detection there are no unattached events to route
+        raise HTTPException(status_code=409, detail="Anomaly detection is disabled")
+    events = anomaly_detector.assign(proposal.source, proposal.service, incident.id)
+    if events:
+        await store_events(events, wait=True)
+    _correlator().remove_attachment(proposal.source, proposal.service)
+
+    subject = f"{proposal.source}/{proposal.service}" if proposal.service else proposal.source
+    await run_storage(storage.add_timeline_entry, TimelineEntry(
+        incident_id=incident.id,
+        entry_type=TimelineEntryType.SYSTEM_EVENT,
+        title=f"Attached {subject}",
+        description=(
+            f"Events from {subject} without an incident_id now go to this incident; "
+            f"{len(events)} recent events attached. Evidence: {'; '.join(proposal.evidence) or 'none'}."
+        ),
+        actor="user",
+        metadata={"proposal_id": proposal.id, "source": proposal.source, "service": proposal.service},
+    ))
+    return incident
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Response
 from typing import List, Optional
 from datetime import datetime
 
@@ -11,7 +11,8 @@ from ..models import (
     TimelineEntryType,
     Action,
 )
-from ..db.storage import storage
+from ..ai.detector import anomaly_detector
+from ..db.storage import storage, run_storage, encode_cursor
 from ..observability.metrics import incidents_created, active_incidents, incidents_resolved
 
 router = APIRouter(prefix="/api/incidents", tags=["incidents"])
@@ -35,7 +36,7 @@ async def create_incident(
     )
 
     # Save to storage
-    storage.create_incident(incident)
+    await run_storage(storage.create_incident, incident)
 
     # Add timeline entry
     timeline_entry = TimelineEntry(
@@ -45,7 +46,7 @@ async def create_incident(
         description=f"Incident created from {incident.source}",
         actor=incident.source,
     )
-    storage.add_timeline_entry(timeline_entry)
+    await run_storage(storage.add_timeline_entry, timeline_entry)
 
     # Update metrics
     incidents_created.labels(
@@ -65,17 +66,30 @@ async def create_incident(
 
 @router.get("/", response_model=List[Incident])
 async def list_incidents(
+    response: Response,
     status: Optional[IncidentStatus] = None,
-    limit: int = 50
+    limit: int = 50,
+    cursor: Optional[str] = None,
 ) -> List[Incident]:
-    """List all incidents with optional filtering"""
-    return storage.list_incidents(status=status, limit=limit)
+    """List incidents newest first with optional filtering.
+
+    When more results may follow, the cursor for the next page is returned
+    in the `X-Next-Cursor` response header.
+    """
+    try:
+        incidents = await run_storage(storage.list_incidents, status=status, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if incidents and len(incidents) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(incidents[-1])
+    return incidents
 
 
 @router.get("/{incident_id}", response_model=Incident)
 async def get_incident(incident_id: str) -> Incident:
     """Get a specific incident by ID"""
-    incident = storage.get_incident(incident_id)
+    incident = await run_storage(storage.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     return incident
@@ -87,7 +101,7 @@ async def update_incident_status(
     status: IncidentStatus
 ) -> Incident:
     """Update incident status"""
-    incident = storage.get_incident(incident_id)
+    incident = await run_storage(storage.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -97,11 +111,19 @@ async def update_incident_status(
     updates = {"status": status, "updated_at": datetime.utcnow()}
 
     # If resolving, set resolved timestamp and calculate MTTR
-    if status == IncidentStatus.RESOLVED and incident.status != IncidentStatus.RESOLVED:
+    resolving = status == IncidentStatus.RESOLVED and incident.status != IncidentStatus.RESOLVED
+    if resolving:
         updates["resolved_at"] = datetime.utcnow()
         duration = (updates["resolved_at"] - incident.created_at).total_seconds()
         updates["mttr_minutes"] = duration / 60
 
+    # Only apply if nobody changed the status since we read it, so a
+    # transition (and its metrics) is never applied twice
+    incident = await run_storage(storage.compare_and_set_status, incident_id, old_status, updates)
+    if not incident:
+        raise HTTPException(status_code=409, detail="Incident status changed concurrently, retry")
+
+    if resolving:
         # Update metrics
         incidents_resolved.labels(severity=incident.severity.value).inc()
         active_incidents.labels(
@@ -109,7 +131,9 @@ async def update_incident_status(
             status=old_status.value
         ).dec()
 
-    incident = storage.update_incident(incident_id, updates)
+    if anomaly_detector is not None and status in (IncidentStatus.RESOLVED, IncidentStatus.CLOSED):
+        # New events from the source open a new incident if it trips again
+        anomaly_detector.release(incident_id)
 
     # Add timeline entry
     timeline_entry = TimelineEntry(
@@ -119,26 +143,37 @@ async def update_incident_status(
         description=f"Status updated from {old_status.value} to {status.value}",
         actor="user",
     )
-    storage.add_timeline_entry(timeline_entry)
+    await run_storage(storage.add_timeline_entry, timeline_entry)
 
     return incident
 
 
 @router.get("/{incident_id}/timeline", response_model=List[TimelineEntry])
-async def get_incident_timeline(incident_id: str) -> List[TimelineEntry]:
-    """Get incident timeline"""
-    incident = storage.get_incident(incident_id)
+async def get_incident_timeline(
+    incident_id: str,
+    since_seq: Optional[int] = None,
+    before_seq: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[TimelineEntry]:
+    """Get incident timeline.
+
+    Pass the highest `seq` seen as `since_seq` to poll only for new entries
+    (oldest first), or `before_seq` to page back through older ones.
+    """
+    incident = await run_storage(storage.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
-    return storage.get_timeline(incident_id)
+    return await run_storage(
+        storage.get_timeline, incident_id, since_seq=since_seq, before_seq=before_seq, limit=limit
+    )
 
 
 @router.get("/{incident_id}/actions", response_model=List[Action])
 async def get_incident_actions(incident_id: str) -> List[Action]:
     """Get suggested actions for an incident"""
-    incident = storage.get_incident(incident_id)
+    incident = await run_storage(storage.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
-    return storage.list_actions(incident_id)
+    return await run_storage(storage.list_actions, incident_id)
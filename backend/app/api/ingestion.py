@@ -1,20 +1,74 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.exceptions import RequestValidationError
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+import json
 
-from ..models import Event, EventCreate
-from ..db.storage import storage
-from ..observability.metrics import events_ingested
+from pydantic import ValidationError
+
+from ..models import (
+    Event,
+    EventCreate,
+    EventType,
+    EventHistogram,
+    IngestError,
+    IngestResult,
+    BatchIngestResult,
+)
+from ..db.storage import storage, run_storage
+from ..ingest.codecs import (
+    BodyDecoder,
+    BodyTooLarge,
+    MsgpackStream,
+    UnsupportedMediaType,
+    is_msgpack,
+    read_body,
+    unpack,
+)
+from ..ai.detector import anomaly_detector
+from ..ingest.events import attach_incidents, build_events, events_from_objects, sample_events, store_events
+from ..ingest.pipeline import ingest_pipeline, IngestBatchTooLarge, IngestQueueFull
 
 router = APIRouter(prefix="/api/ingest", tags=["ingestion"])
 
+# Streaming ingest: events are stored in micro-batches of this size
+STREAM_BATCH_SIZE = 500
+# Longest accepted NDJSON line; longer lines are rejected without buffering them
+MAX_LINE_BYTES = 1024 * 1024
+# Rejected lines reported individually; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+# Rejection for events without an incident_id when anomaly detection is off
+INCIDENT_REQUIRED = "incident_id is required when anomaly detection is disabled"
+# Largest batch body accepted, after undoing its Content-Encoding
+MAX_BATCH_BYTES = 256 * 1024 * 1024
+
+# Batch bodies are decoded by the handler, so their schema is declared here
+BATCH_REQUEST_BODY = {"requestBody": {"required": True, "content": {
+    media_type: {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/EventCreate"}}}
+    for media_type in ("application/json", "application/msgpack")
+}}}
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; convert timezone-aware query bounds"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 
 @router.post("/events", response_model=Event, status_code=201)
-async def ingest_event(event_data: EventCreate) -> Event:
-    """Ingest a single event (log, metric, alert)"""
+async def ingest_event(event_data: EventCreate, response: Response) -> Event:
+    """Ingest a single event (log, metric, alert).
+
+    Without an `incident_id`, the event feeds anomaly detection and is
+    stored only if it is attached to a detected incident.
+    """
 
     # Verify incident exists
-    incident = storage.get_incident(event_data.incident_id)
-    if not incident:
+    if event_data.incident_id is None:
+        if anomaly_detector is None:
+            raise HTTPException(status_code=422, detail=INCIDENT_REQUIRED)
+    elif not await run_storage(storage.get_incident, event_data.incident_id):
         raise HTTPException(status_code=404, detail="Incident not found")
 
     # Create event
@@ -27,51 +81,217 @@ async def ingest_event(event_data: EventCreate) -> Event:
         metadata=event_data.metadata,
     )
 
-    # Save to storage
-    storage.create_event(event)
-
-    # Update metrics
-    events_ingested.labels(
-        event_type=event.event_type.value,
-        source=event.source
-    ).inc()
+    # Save to storage (or queue for the ingest pipeline) with any pending
+    # events a detected incident attached; an event dropped by sampling or
+    # left without an incident is acknowledged but not stored
+    events, _ = await attach_incidents([event])
+    kept = sample_events(events)
+    if kept:
+        await _store_events(kept)
+    if ingest_pipeline.running or not any(e is event for e in kept):
+        response.status_code = 202
 
     return event
 
 
-@router.post("/events/batch", response_model=List[Event], status_code=201)
-async def ingest_events_batch(events_data: List[EventCreate]) -> List[Event]:
-    """Ingest multiple events in batch"""
+@router.post("/events/batch", response_model=BatchIngestResult, status_code=201, openapi_extra=BATCH_REQUEST_BODY)
+async def ingest_events_batch(request: Request, response: Response) -> BatchIngestResult:
+    """Ingest multiple events in batch.
+
+    The body is a JSON array of events, or a MessagePack one with
+    `Content-Type: application/msgpack`, optionally gzip or zstd
+    compressed (`Content-Encoding`). Events for unknown incidents are
+    rejected and reported; events without an `incident_id` feed anomaly
+    detection. The rest are sampled during log storms and stored in one
+    bulk insert.
+    """
+    return await _ingest_batch(await _decode_batch(request), response)
+
+
+async def _decode_batch(request: Request) -> List[Event]:
+    """Decode a batch body and validate it straight into events in one call.
+
+    JSON is parsed with `json.loads` rather than pydantic's JSON mode,
+    which is slower for the free-form `metadata` values.
+    """
+    try:
+        msgpack_body = is_msgpack(request.headers.get("content-type"))
+        body = await read_body(request, max_bytes=MAX_BATCH_BYTES)
+        try:
+            objects = unpack(body) if msgpack_body else json.loads(body)
+        except json.JSONDecodeError as e:
+            raise RequestValidationError([{
+                "type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+                "input": {}, "ctx": {"error": e.msg},
+            }])
+        return events_from_objects(objects, datetime.utcnow())
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValidationError as e:
+        # Same 422 body FastAPI produces for a declared body parameter
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _ingest_batch(events: List[Event], response: Response) -> BatchIngestResult:
+    result = BatchIngestResult()
+
+    # Verify each distinct incident once; events without one go to anomaly detection
+    known_incidents = {None: anomaly_detector is not None}
+    for incident_id in {event.incident_id for event in events} - {None}:
+        known_incidents[incident_id] = await run_storage(storage.get_incident, incident_id) is not None
+
+    accepted = []
+    for item, event in enumerate(events, start=1):
+        if known_incidents[event.incident_id]:
+            accepted.append(event)
+            continue
+        result.rejected += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            error = INCIDENT_REQUIRED if event.incident_id is None else "Incident not found"
+            result.errors.append(IngestError(line=item, error=error))
+
+    attached, result.unattached = await attach_incidents(accepted)
+    kept = sample_events(attached)
+    result.sampled = len(attached) - len(kept)
+    if kept:
+        result.events = kept
+        result.accepted = await _store_events(kept)
+        if ingest_pipeline.running:
+            response.status_code = 202
+    return result
+
+
+@router.post("/events/stream", response_model=IngestResult, status_code=201)
+async def ingest_events_stream(request: Request) -> IngestResult:
+    """Ingest newline-delimited JSON events (application/x-ndjson).
+
+    With `Content-Type: application/msgpack` the body is instead a sequence
+    of MessagePack event maps, and errors report the position of the map
+    in place of a line number. Either may be gzip or zstd compressed
+    (`Content-Encoding`). The body is decoded incrementally as it arrives
+    and events are stored in micro-batches, so memory stays bounded for any
+    body size. Items that fail to parse or validate, or name an unknown
+    incident, are rejected and reported; the rest are stored. Corrupt
+    compressed or MessagePack data ends the stream with an error.
+    """
+    try:
+        unpacker = MsgpackStream(MAX_LINE_BYTES) if is_msgpack(request.headers.get("content-type")) else None
+        decoder = BodyDecoder(request.headers.get("content-encoding"))
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+
+    result = IngestResult()
+    known_incidents: Dict[Optional[str], bool] = {None: anomaly_detector is not None}
+    batch: List[EventCreate] = []
+
+    def reject(line: int, error: str):
+        result.rejected += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(IngestError(line=line, error=error))
+
+    async def handle_line(line_number: int, line: bytes):
+        if not line.strip():
+            return
+        try:
+            event_data = EventCreate.model_validate_json(line)
+        except ValidationError as e:
+            reject(line_number, _first_error(e))
+            return
+        await handle_event(line_number, event_data)
 
-    created_events = []
+    async def handle_document(item: int, document):
+        try:
+            event_data = EventCreate.model_validate(document)
+        except ValidationError as e:
+            reject(item, _first_error(e))
+            return
+        await handle_event(item, event_data)
 
-    for event_data in events_data:
-        # Verify incident exists
-        incident = storage.get_incident(event_data.incident_id)
-        if not incident:
-            continue  # Skip invalid incidents in batch
+    async def handle_event(line_number: int, event_data: EventCreate):
+        exists = known_incidents.get(event_data.incident_id)
+        if exists is None:
+            exists = known_incidents[event_data.incident_id] = (
+                await run_storage(storage.get_incident, event_data.incident_id) is not None
+            )
+        if not exists:
+            reject(line_number, INCIDENT_REQUIRED if event_data.incident_id is None else "Incident not found")
+            return
 
-        # Create event
-        event = Event(
-            incident_id=event_data.incident_id,
-            event_type=event_data.event_type,
-            message=event_data.message,
-            level=event_data.level,
-            source=event_data.source,
-            metadata=event_data.metadata,
-        )
+        batch.append(event_data)
+        if len(batch) >= STREAM_BATCH_SIZE:
+            await flush()
 
-        # Save to storage
-        storage.create_event(event)
-        created_events.append(event)
+    async def flush():
+        attached, unattached = await attach_incidents(build_events(batch, datetime.utcnow()))
+        kept = sample_events(attached)
+        result.unattached += unattached
+        result.sampled += len(attached) - len(kept)
+        if kept:
+            result.accepted += await _store_events(kept, wait=True)
+        batch.clear()
 
-        # Update metrics
-        events_ingested.labels(
-            event_type=event.event_type.value,
-            source=event.source
-        ).inc()
+    buffer = bytearray()
+    line_number = 0
+    oversized = False
+    try:
+        async for chunk in request.stream():
+            for data in decoder.decode(chunk):
+                if unpacker is not None:
+                    for document in unpacker.feed(data):
+                        line_number += 1
+                        await handle_document(line_number, document)
+                    continue
 
-    return created_events
+                buffer += data
+                start = 0
+                while (end := buffer.find(b"\n", start)) != -1:
+                    line_number += 1
+                    if oversized or end - start > MAX_LINE_BYTES:
+                        reject(line_number, f"Line exceeds {MAX_LINE_BYTES} bytes")
+                        oversized = False
+                    else:
+                        await handle_line(line_number, bytes(buffer[start:end]))
+                    start = end + 1
+                del buffer[:start]
+                if len(buffer) > MAX_LINE_BYTES:
+                    # Drop the rest of an oversized line as it streams in
+                    oversized = True
+                    buffer.clear()
+        decoder.finish()
+        if unpacker is not None:
+            unpacker.finish()
+    except ValueError as e:
+        # Nothing after corrupt compressed or MessagePack data can be read
+        reject(line_number + 1, str(e))
+    else:
+        if oversized:
+            reject(line_number + 1, f"Line exceeds {MAX_LINE_BYTES} bytes")
+        elif buffer:
+            await handle_line(line_number + 1, bytes(buffer))
+    if batch:
+        await flush()
+    return result
+
+
+async def _store_events(events: List[Event], wait: bool = False) -> int:
+    """Store (or queue) events; a full ingest queue answers 429 with Retry-After,
+    and a batch larger than the whole queue 413"""
+    try:
+        return await store_events(events, wait=wait)
+    except IngestQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except IngestBatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+def _first_error(error: ValidationError) -> str:
+    details = error.errors()[0]
+    location = ".".join(str(part) for part in details["loc"])
+    return f"{location}: {details['msg']}" if location else details["msg"]
 
 
 @router.get("/events/{incident_id}", response_model=List[Event])
@@ -82,8 +302,56 @@ async def get_incident_events(
     """Get events for a specific incident"""
 
     # Verify incident exists
-    incident = storage.get_incident(incident_id)
+    incident = await run_storage(storage.get_incident, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
-    return storage.list_events(incident_id, limit=limit)
+    return await run_storage(storage.list_events, incident_id, limit=limit)
+
+
+@router.get("/events/{incident_id}/query", response_model=List[Event])
+async def query_incident_events(
+    incident_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    event_type: Optional[EventType] = None,
+    limit: int = Query(default=100, ge=1, le=10000),
+) -> List[Event]:
+    """Get events for an incident in a time range [start, end), newest first"""
+
+    # Verify incident exists
+    incident = await run_storage(storage.get_incident, incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    return await run_storage(
+        storage.query_events, incident_id,
+        start=_naive_utc(start), end=_naive_utc(end),
+        level=level, source=source, event_type=event_type, limit=limit,
+    )
+
+
+@router.get("/events/{incident_id}/histogram", response_model=EventHistogram)
+async def get_incident_event_histogram(
+    incident_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    level: Optional[str] = None,
+    source: Optional[str] = None,
+    event_type: Optional[EventType] = None,
+    bucket_seconds: int = Query(default=60, ge=1),
+) -> EventHistogram:
+    """Count events in a time range [start, end) per time bucket, level and source"""
+
+    # Verify incident exists
+    incident = await run_storage(storage.get_incident, incident_id)
+    if not incident:
+        raise HTTPException(status_code=404, detail="Incident not found")
+
+    return await run_storage(
+        storage.event_histogram, incident_id,
+        bucket_seconds=bucket_seconds, start=_naive_utc(start), end=_naive_utc(end),
+        level=level, source=source, event_type=event_type,
+    )
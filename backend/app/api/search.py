@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+
+from ..models import EventSearchResult
+from ..db.search import SearchDisabled
+from ..db.storage import storage, run_storage
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+
+@router.get("/events", response_model=EventSearchResult)
+async def search_events(
+    q: str = Query(..., min_length=1, description='Terms, "phrases", OR and -excluded terms'),
+    incident_id: Optional[str] = None,
+    source: Optional[str] = None,
+    level: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=1000),
+) -> EventSearchResult:
+    """Full-text search over event messages, sources and metadata values"""
+    try:
+        return await run_storage(
+            storage.search_events, q,
+            limit=limit, incident_id=incident_id, source=source, level=level,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SearchDisabled as e:
+        raise HTTPException(status_code=501, detail=str(e))
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -16,8 +17,109 @@ class Settings(BaseSettings):
     # Rate Limiting
     rate_limit_per_minute: int = 100
 
-    # Vector Database
+    # In-memory event layout: objects or columnar
+    event_store: str = "objects"
+
+    # Ingest pipeline: queue events and write them in batches off the request path
+    ingest_queue_enabled: bool = False
+    ingest_queue_size: int = 100000  # events; full queue answers 429, larger batches 413
+    ingest_batch_size: int = 1000
+    ingest_flush_interval_ms: int = 20
+    ingest_writers: int = 1
+
+    # Adaptive sampling of debug/info/warning events per (incident, source)
+    # once they arrive faster than the rate; errors and alerts are always kept.
+    # Off by default: when on, storms lose low-severity events (counted in
+    # events_sampled_out_total)
+    sampling_enabled: bool = False
+    sampling_rate_per_second: float = 100
+    sampling_burst: float = 1000
+
+    # Syslog listener (UDP/TCP, RFC5424, RFC3164 or JSON lines; port 0 disables
+    # one). Lines go to the incident of the first matching route, e.g.
+    # [{"host": "web-*", "service": "nginx", "incident_id": "..."}], else to
+    # syslog_default_incident_id, else are dropped
+    syslog_enabled: bool = False
+    syslog_host: str = "0.0.0.0"
+    syslog_udp_port: int = 5514
+    syslog_tcp_port: int = 5514
+    syslog_routes: List[Dict[str, str]] = []
+    syslog_default_incident_id: str = ""
+    syslog_batch_size: int = 1000
+    syslog_flush_interval_ms: int = 50
+
+    # Anomaly detection: per source/service error and event rates per tick,
+    # with EWMA baselines and rolling quantiles; a breach opens an incident
+    # and attaches events that name no incident
+    detector_enabled: bool = True
+    detector_tick_seconds: float = 10
+    detector_alpha: float = 0.1
+    detector_sigma: float = 4
+    detector_quantile: float = 0.99
+    detector_warmup_ticks: int = 30
+    detector_min_errors: int = 20  # per tick
+    detector_min_events: int = 100  # per tick
+    detector_cooldown_seconds: float = 900
+
+    # Event correlation: incidents whose warning/error events arrive within
+    # the window and share weighted metadata values (or message shapes) are
+    # proposed for merging; unattached sources matching an incident are
+    # proposed for attachment
+    correlation_enabled: bool = True
+    correlation_keys: Dict[str, float] = {"service": 1.0, "container_id": 1.0, "region": 0.25}
+    correlation_window_seconds: float = 300
+    correlation_retention_seconds: float = 3600
+    correlation_min_score: float = 1.5  # a shared message template adds 1.0
+    correlation_max_incidents: int = 10000
+
+    # Full-text index over event messages, sources and metadata values
+    search_enabled: bool = True
+
+    # Event Retention (0 disables a limit)
+    max_events_per_incident: int = 100000
+    max_events_total: int = 5000000
+    max_event_memory_mb: int = 2048
+
+    # Storage backend: memory, sqlite, or remote (opt-in shared storage server
+    # for running several uvicorn workers; the server uses
+    # storage_server_backend). Only storage is shared: vectors, WebSocket
+    # rooms, jobs, detector and correlation state stay per worker
+    storage_backend: str = "memory"
+    sqlite_path: str = "./data/opsmind.db"
+    storage_shards: int = 0  # >1 partitions memory storage into locked shards
+    storage_socket_path: str = "/tmp/opsmind-storage.sock"
+    storage_server_backend: str = "memory"
+    storage_server_autostart: bool = True
+
+    # Durability: write-ahead log and snapshots for in-memory storage
+    wal_enabled: bool = False
+    data_dir: str = "./data"
+    wal_fsync: str = "interval"  # always, interval or never
+    wal_flush_interval_ms: int = 50
+    snapshot_interval_seconds: int = 300
+    snapshot_wal_mb: int = 256
+
+    # Cold archive: idle resolved/closed incidents move to compressed segments
+    archive_enabled: bool = False
+    archive_dir: str = "./data/archive"
+    archive_after_hours: float = 24
+    archive_compression: str = "zstd"  # zstd (falls back to gzip) or gzip
+    archive_cache_size: int = 128
+    archive_interval_seconds: int = 300
+
+    # Vector Database. Index type flat, ivf_flat, ivf_pq, hnsw, or auto to
+    # promote along the tiers (index type -> minimum vectors) as the corpus
+    # grows, training the next index in the background
     vector_db_path: str = "./faiss_index"
+    vector_index_type: str = "auto"
+    vector_index_tiers: Dict[str, int] = {"flat": 0, "ivf_flat": 50000, "ivf_pq": 1000000}
+    vector_nprobe: int = 16  # IVF lists scanned per query
+    vector_ef_search: int = 64  # HNSW candidates per query
+    vector_hnsw_m: int = 32
+    vector_pq_m: int = 48  # bytes per vector in ivf_pq; must divide the dimension
+    # Vectors added since the last save are appended as segments this often
+    # (0 saves only at shutdown)
+    vector_save_interval_seconds: int = 60
 
     # Observability
     prometheus_port: int = 8001
@@ -0,0 +1,179 @@
+import gzip
+import itertools
+import json
+import os
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..models import Incident, IncidentStatus
+from .wal import OP_EVENT, decode_records, encode_record
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+class SegmentArchive:
+    """Cold tier of immutable, compressed segment files
+
+    Each archived incident is stored as two independently compressed
+    blocks of WAL-format records: a header block (incident, timeline,
+    actions) and an events block. A sparse index file next to each segment
+    maps incident ids to block offsets, so the incident itself can be read
+    back without decoding its events, and either block is a single seek
+    and decompress. All indexes are loaded into memory on open; that costs
+    one small entry per archived incident.
+    """
+
+    def __init__(self, directory: str, compression: str = "zstd"):
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            print("zstandard not available. Archive segments will use gzip.")
+            compression = "gzip"
+        if compression not in ("zstd", "gzip"):
+            raise ValueError(f"Unknown archive compression: {compression}")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.compression = compression
+
+        # incident_id -> (segment path, codec, header offset, header length,
+        # events offset, events length)
+        self._index: Dict[str, Tuple[Path, str, int, int, int, int]] = {}
+        # incident_id -> (created_at, status), so archived incidents can be
+        # listed without reading their blocks
+        self._keys: Dict[str, Tuple[datetime, IncidentStatus]] = {}
+        self._lock = threading.Lock()
+        self._next_segment = 1
+        self._load_indexes()
+
+    def _load_indexes(self):
+        for index_path in sorted(self.directory.glob("segment-*.idx")):
+            segment_path = index_path.with_suffix(".seg")
+            with open(index_path) as f:
+                header = json.loads(f.readline())
+                for line in f:
+                    entry = json.loads(line)
+                    self._index[entry["id"]] = (
+                        segment_path, header["codec"], entry["offset"], entry["length"],
+                        entry["events_offset"], entry["events_length"],
+                    )
+                    self._keys[entry["id"]] = (datetime.fromisoformat(entry["created_at"]), IncidentStatus(entry["status"]))
+            self._next_segment = max(self._next_segment, int(index_path.stem.split("-")[1]) + 1)
+
+    def __contains__(self, incident_id: str) -> bool:
+        return incident_id in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def entries(self) -> List[Tuple[str, datetime, IncidentStatus]]:
+        """(incident_id, created_at, status) of every archived incident"""
+        with self._lock:
+            return [(incident_id, *self._keys[incident_id]) for incident_id in self._index]
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def write_segment(self, incidents: List[Tuple[Incident, Iterable[Tuple[int, bytes]]]]) -> Path:
+        """Write a new segment holding each (incident, records) block.
+
+        Safe to call from a worker thread. The segment and its index are
+        written to temporary files and renamed, index last, so a crash never
+        leaves an index pointing at a partial segment.
+        """
+        with self._lock:
+            seq = self._next_segment
+            self._next_segment += 1
+
+        segment_path = self.directory / f"segment-{seq:06d}.seg"
+        index_path = segment_path.with_suffix(".idx")
+        entries = []
+        with open(f"{segment_path}.tmp", "wb") as f:
+            for incident, records in incidents:
+                header, events = [], []
+                for op, payload in records:
+                    (events if op == OP_EVENT else header).append(encode_record(op, payload))
+                entry = {
+                    "id": incident.id,
+                    "created_at": incident.created_at.isoformat(),
+                    "status": IncidentStatus(incident.status).value,
+                }
+                for prefix, block in (("", header), ("events_", events)):
+                    block = self._compress(b"".join(block))
+                    entry[f"{prefix}offset"] = f.tell()
+                    entry[f"{prefix}length"] = len(block)
+                    f.write(block)
+                entries.append(entry)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(f"{index_path}.tmp", "w") as f:
+            f.write(json.dumps({"codec": self.compression}) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{segment_path}.tmp", segment_path)
+        os.replace(f"{index_path}.tmp", index_path)
+
+        with self._lock:
+            for entry in entries:
+                self._index[entry["id"]] = (
+                    segment_path, self.compression, entry["offset"], entry["length"],
+                    entry["events_offset"], entry["events_length"],
+                )
+                self._keys[entry["id"]] = (datetime.fromisoformat(entry["created_at"]), IncidentStatus(entry["status"]))
+        return segment_path
+
+    def read(self, incident_id: str) -> Optional[Iterator[Tuple[int, bytes]]]:
+        """Records of an archived incident (incident record first), or None
+        if it is not archived"""
+        location = self._index.get(incident_id)
+        if location is None:
+            return None
+        return itertools.chain(
+            self._read_block(location[0], location[1], location[2], location[3]),
+            self._read_block(location[0], location[1], location[4], location[5]),
+        )
+
+    def read_header(self, incident_id: str) -> Optional[Iterator[Tuple[int, bytes]]]:
+        """Incident, timeline and action records of an archived incident
+        (incident record first), or None if it is not archived"""
+        location = self._index.get(incident_id)
+        if location is None:
+            return None
+        return self._read_block(location[0], location[1], location[2], location[3])
+
+    def read_events(self, incident_id: str) -> Optional[Iterator[Tuple[int, bytes]]]:
+        """Event records of an archived incident, or None if it is not archived"""
+        location = self._index.get(incident_id)
+        if location is None:
+            return None
+        return self._read_block(location[0], location[1], location[4], location[5])
+
+    def _read_block(self, segment_path: Path, codec: str, offset: int, length: int) -> Iterator[Tuple[int, bytes]]:
+        with open(segment_path, "rb") as f:
+            f.seek(offset)
+            block = f.read(length)
+        return decode_records(self._decompress(codec, block))
+
+    def forget(self, incident_id: str):
+        """Stop serving an incident from the archive (it is hot again).
+
+        Segments are immutable, so the stale block stays on disk; the hot
+        copy takes precedence if the index is reloaded after a restart.
+        """
+        with self._lock:
+            self._index.pop(incident_id, None)
+            self._keys.pop(incident_id, None)
@@ -0,0 +1,251 @@
+import sys
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..models import Event, EventType
+
+EPOCH = datetime(1970, 1, 1)
+
+# Fixed per-row cost: 16 byte id, 8 byte timestamp, 1+4+4 byte codes and
+# one pointer each for the message and the (usually empty) metadata slot
+COLUMNAR_ROW_BYTES = 16 + 8 + 9 + 8 + 8
+
+EVENT_TYPES = list(EventType)
+EVENT_TYPE_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+
+class StringTable:
+    """Dictionary encoding of repeated strings (levels, sources) to small ints"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ColumnarEventRing:
+    """Drop-in replacement for EventRing that stores events column-wise
+
+    Each column is a compact array: ids as raw 16 byte UUIDs, timestamps as
+    int64 microseconds, event type, level and source as dictionary codes,
+    messages as interned strings (identical log lines share one object)
+    and metadata only for rows that have any. `Event` models are only
+    materialized when events are read.
+    """
+
+    def __init__(self, levels: StringTable, sources: StringTable):
+        self._levels = levels
+        self._sources = sources
+        self._incident_id: Optional[str] = None
+
+        self._ids = bytearray()
+        self._timestamps = array("q")
+        self._types = array("B")
+        # Levels are free-form strings, so their codes get the same width as sources
+        self._level_codes = array("I")
+        self._source_codes = array("I")
+        self._messages: List[Optional[str]] = []
+        self._metadata: List[Optional[dict]] = []
+
+        # Ids that are not UUIDs, by row
+        self._custom_ids: Dict[int, str] = {}
+
+        self._head = 0
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._timestamps) - self._head
+
+    def __iter__(self) -> Iterator[Event]:
+        """Iterate events oldest first"""
+        for row in range(self._head, len(self._timestamps)):
+            yield self._materialize(row)
+
+    @staticmethod
+    def row_bytes(event: Event) -> int:
+        """Estimated bytes a row adds, message and metadata included"""
+        return ColumnarEventRing._charge(event.message, event.metadata)
+
+    @staticmethod
+    def _charge(message: str, metadata: Optional[dict]) -> int:
+        # Identical interned messages share one object, but each row is
+        # still charged for its message so the memory budget stays an upper bound
+        size = COLUMNAR_ROW_BYTES + len(message)
+        for key, value in (metadata or {}).items():
+            size += len(key) + len(str(value))
+        return size
+
+    def add(self, event: Event) -> int:
+        """Insert an event, keeping timestamp order; returns bytes charged"""
+        self._incident_id = event.incident_id
+        ts = (event.timestamp - EPOCH) // timedelta(microseconds=1)
+        timestamps = self._timestamps
+
+        if len(timestamps) == self._head or ts >= timestamps[-1]:
+            row = len(timestamps)
+            self._insert_columns(row, ts, event, append=True)
+        else:
+            row = bisect_right(timestamps, ts, self._head)
+            self._custom_ids = {r + (r >= row): i for r, i in self._custom_ids.items()}
+            self._insert_columns(row, ts, event, append=False)
+
+        try:
+            id_bytes = uuid.UUID(event.id).bytes
+        except ValueError:
+            id_bytes = bytes(16)
+            self._custom_ids[row] = event.id
+        self._ids[row * 16:row * 16] = id_bytes
+
+        size = self.row_bytes(event)
+        self.bytes += size
+        return size
+
+    def _insert_columns(self, row: int, ts: int, event: Event, append: bool):
+        values = (
+            (self._timestamps, ts),
+            (self._types, EVENT_TYPE_CODES[event.event_type]),
+            (self._level_codes, self._levels.encode(event.level)),
+            (self._source_codes, self._sources.encode(event.source)),
+            (self._messages, sys.intern(event.message)),
+            (self._metadata, event.metadata or None),
+        )
+        for column, value in values:
+            if append:
+                column.append(value)
+            else:
+                column.insert(row, value)
+
+    def _materialize(self, row: int) -> Event:
+        event_id = self._custom_ids.get(row)
+        if event_id is None:
+            event_id = str(uuid.UUID(bytes=bytes(self._ids[row * 16:row * 16 + 16])))
+        return Event.model_construct(
+            id=event_id,
+            incident_id=self._incident_id,
+            event_type=EVENT_TYPES[self._types[row]],
+            message=self._messages[row],
+            level=self._levels.values[self._level_codes[row]],
+            source=self._sources.values[self._source_codes[row]],
+            metadata=dict(self._metadata[row] or {}),
+            timestamp=EPOCH + timedelta(microseconds=self._timestamps[row]),
+        )
+
+    def latest(self, limit: int) -> List[Event]:
+        """Return up to `limit` events, newest first"""
+        start = max(len(self._timestamps) - limit, self._head)
+        return [self._materialize(row) for row in range(len(self._timestamps) - 1, start - 1, -1)]
+
+    def _bounds(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+        """Row range with start <= timestamp < end, by binary search"""
+        timestamps = self._timestamps
+        lo = self._head
+        if start is not None:
+            lo = bisect_left(timestamps, (start - EPOCH) // timedelta(microseconds=1), lo)
+        hi = len(timestamps)
+        if end is not None:
+            hi = bisect_left(timestamps, (end - EPOCH) // timedelta(microseconds=1), lo)
+        return lo, hi
+
+    def _filter_codes(self, level, source, event_type):
+        """Translate filters into codes; None means no filter, -1 matches nothing"""
+        return (
+            None if level is None else self._levels.codes.get(level, -1),
+            None if source is None else self._sources.codes.get(source, -1),
+            None if event_type is None else EVENT_TYPE_CODES[event_type],
+        )
+
+    def _matching_rows(self, rows, level, source, event_type) -> Iterator[int]:
+        level_code, source_code, type_code = self._filter_codes(level, source, event_type)
+        if level_code is None and source_code is None and type_code is None:
+            return iter(rows)
+        levels, sources, types = self._level_codes, self._source_codes, self._types
+        return (
+            row for row in rows
+            if (level_code is None or levels[row] == level_code)
+            and (source_code is None or sources[row] == source_code)
+            and (type_code is None or types[row] == type_code)
+        )
+
+    def select(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+        limit: int = 100,
+    ) -> List[Event]:
+        """Return up to `limit` matching events in [start, end), newest first.
+        Filters run on the code columns; only matches are materialized."""
+        lo, hi = self._bounds(start, end)
+        matched = []
+        for row in self._matching_rows(range(hi - 1, lo - 1, -1), level, source, event_type):
+            matched.append(self._materialize(row))
+            if len(matched) >= limit:
+                break
+        return matched
+
+    def histogram(
+        self,
+        bucket_seconds: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+    ) -> Counter:
+        """Count matching events in [start, end) by (bucket start, level, source),
+        working on the timestamp and code columns only"""
+        lo, hi = self._bounds(start, end)
+        bucket = bucket_seconds * 1_000_000
+        timestamps, levels, sources = self._timestamps, self._level_codes, self._source_codes
+        coded = Counter(
+            (timestamps[row] // bucket, levels[row], sources[row])
+            for row in self._matching_rows(range(lo, hi), level, source, event_type)
+        )
+        level_values, source_values = self._levels.values, self._sources.values
+        return Counter({
+            (index, level_values[level_code], source_values[source_code]): count
+            for (index, level_code, source_code), count in coded.items()
+        })
+
+    def evict(self, count: int = 0, min_bytes: int = 0) -> Tuple[int, int]:
+        """Drop the oldest events until `count` events and `min_bytes` bytes
+        have been freed. Returns (events evicted, bytes evicted)."""
+        end = len(self._timestamps)
+        evicted = freed = 0
+        while self._head < end and (evicted < count or freed < min_bytes):
+            row = self._head
+            freed += self._charge(self._messages[row], self._metadata[row])
+            self._messages[row] = None
+            self._metadata[row] = None
+            self._custom_ids.pop(row, None)
+            self._head += 1
+            evicted += 1
+
+        if self._head > 1024 and self._head * 2 > end:
+            self._compact()
+
+        self.bytes -= freed
+        self.evicted += evicted
+        return evicted, freed
+
+    def _compact(self):
+        head = self._head
+        for column in (self._timestamps, self._types, self._level_codes, self._source_codes,
+                       self._messages, self._metadata):
+            del column[:head]
+        del self._ids[:head * 16]
+        self._custom_ids = {row - head: i for row, i in self._custom_ids.items()}
+        self._head = 0
@@ -0,0 +1,246 @@
+"""Shared storage for multi-worker deployments
+
+One storage server process owns the real storage backend and serves it over
+a Unix domain socket; every uvicorn worker talks to it through
+`RemoteStorage`, so all workers see the same incidents, events and timelines.
+
+Run the server with `python -m app.db.remote`, or let the first worker start
+it automatically (see `ensure_server`).
+
+Only storage is shared, which is why this mode is opt-in
+(`STORAGE_BACKEND=remote`). The vector store, WebSocket rooms, the job
+queue, the anomaly detector, the event correlator, the ingest sampler and
+queue and the Prometheus metrics all stay per worker; of the workers, only
+the one that claims the vector index directory saves it.
+"""
+import asyncio
+import fcntl
+import os
+import pickle
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Frame: 4 byte big-endian payload length, then a pickled payload.
+# Requests are (method, args, kwargs); responses are (ok, result_or_exception).
+FRAME_HEADER = struct.Struct("!I")
+
+# Storage methods the server exposes
+REMOTE_METHODS = frozenset({
+    "create_incident",
+    "get_incident",
+    "list_incidents",
+    "update_incident",
+    "compare_and_set_status",
+    "create_event",
+    "create_events",
+    "list_events",
+    "query_events",
+    "event_histogram",
+    "search_events",
+    "add_timeline_entry",
+    "get_timeline",
+    "create_action",
+    "get_action",
+    "list_actions",
+    "update_action",
+})
+
+# Calls safe to send twice. A write that fails mid-call may already have been
+# applied by the server, so it is not resent
+IDEMPOTENT_METHODS = frozenset({
+    "get_incident",
+    "list_incidents",
+    "list_events",
+    "query_events",
+    "event_histogram",
+    "search_events",
+    "get_timeline",
+    "get_action",
+    "list_actions",
+})
+
+
+def _encode(payload) -> bytes:
+    data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Storage server closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+class RemoteStorage:
+    """Client for a storage server, with the same interface as InMemoryStorage
+
+    Each thread keeps its own connection. Calls block on the socket, so API
+    handlers run them in the thread pool via `run_storage`.
+    """
+
+    blocking = True
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def call(self, method: str, *args, **kwargs):
+        """Invoke a storage method on the server"""
+        request = _encode((method, args, kwargs))
+        for attempt in range(2):
+            sock = self._socket()
+            try:
+                sock.sendall(request)
+                (length,) = FRAME_HEADER.unpack(_recv_exactly(sock, FRAME_HEADER.size))
+                ok, result = pickle.loads(_recv_exactly(sock, length))
+                break
+            except (ConnectionError, BrokenPipeError):
+                # Reconnect once, e.g. after the server restarted; writes are
+                # not resent, the caller sees the error
+                sock.close()
+                self._local.sock = None
+                if attempt or method not in IDEMPOTENT_METHODS:
+                    raise
+        if not ok:
+            raise result
+        return result
+
+    def __getattr__(self, name: str):
+        if name not in REMOTE_METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+
+class StorageServer:
+    """Serves a storage backend to RemoteStorage clients over a Unix socket"""
+
+    def __init__(self, backend, socket_path: str):
+        self.backend = backend
+        self.socket_path = socket_path
+
+    async def serve(self):
+        Path(self.socket_path).unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        print(f"Storage server listening on {self.socket_path}")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                method, args, kwargs = pickle.loads(await reader.readexactly(length))
+                try:
+                    if method not in REMOTE_METHODS:
+                        raise AttributeError(f"Unknown storage method: {method}")
+                    func = getattr(self.backend, method)
+                    if self.backend.blocking:
+                        result = await asyncio.to_thread(func, *args, **kwargs)
+                    else:
+                        result = func(*args, **kwargs)
+                    response = (True, result)
+                except Exception as e:
+                    response = (False, e)
+                writer.write(_encode(response))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def ensure_server(socket_path: str, timeout: float = 30.0):
+    """Start the storage server unless one is already listening.
+
+    Workers race to call this on startup; a file lock makes sure only one
+    of them spawns the server while the others wait for it to accept.
+    """
+    with open(f"{socket_path}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if _is_listening(socket_path):
+                return
+            subprocess.Popen(
+                [sys.executable, "-m", "app.db.remote"],
+                cwd=Path(__file__).resolve().parents[2],
+                start_new_session=True,
+            )
+            deadline = time.monotonic() + timeout
+            while not _is_listening(socket_path):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Storage server did not start on {socket_path}")
+                time.sleep(0.05)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_listening(socket_path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+async def main():
+    from ..config import get_settings
+    from ..jobs.archiver import archive_loop
+    from ..jobs.snapshot import snapshot_loop
+    from .archive import SegmentArchive
+    from .storage import InMemoryStorage, create_storage
+    from .wal import WriteAheadLog
+
+    settings = get_settings()
+    backend = create_storage(settings.model_copy(update={"storage_backend": settings.storage_server_backend}))
+
+    if settings.wal_enabled and isinstance(backend, InMemoryStorage):
+        backend.attach_wal(WriteAheadLog(
+            settings.data_dir,
+            fsync=settings.wal_fsync,
+            flush_interval=settings.wal_flush_interval_ms / 1000,
+        ))
+        asyncio.create_task(snapshot_loop(
+            backend,
+            interval_seconds=settings.snapshot_interval_seconds,
+            max_wal_bytes=settings.snapshot_wal_mb * 1024 * 1024,
+        ))
+
+    if settings.archive_enabled and isinstance(backend, InMemoryStorage):
+        backend.attach_archive(
+            SegmentArchive(settings.archive_dir, compression=settings.archive_compression),
+            cache_size=settings.archive_cache_size,
+        )
+        asyncio.create_task(archive_loop(
+            backend,
+            max_age_hours=settings.archive_after_hours,
+            interval_seconds=settings.archive_interval_seconds,
+        ))
+
+    await StorageServer(backend, settings.storage_socket_path).serve()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
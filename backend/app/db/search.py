@@ -0,0 +1,543 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from ..models import Event, EventSearchHit, EventSearchResult
+from .columnar import EPOCH, StringTable
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Doc ids are buffered per term and sealed into a compressed block at this size
+POSTINGS_BLOCK_SIZE = 128
+
+# Rebuild the index once hidden (evicted or archived) documents outnumber
+# live ones and there are at least this many of them
+COMPACT_MIN_HIDDEN = 100_000
+
+# Per-incident doc id lists drop their released prefix past this length
+RELEASED_COMPACT_MIN = 1024
+
+# A background compaction keeps copying documents added while it ran, up to
+# this many rounds, until at most this many are left for the swap itself
+COMPACT_CATCH_UP_ROUNDS = 16
+COMPACT_CATCH_UP_DOCS = 1024
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+class SearchDisabled(Exception):
+    """Event search is not enabled for this storage"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of `text`"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SearchQuery:
+    """A parsed search query
+
+    Whitespace separated terms must all match. `a OR b` matches either side,
+    a quoted "phrase" must match as consecutive tokens, and a term or phrase
+    prefixed with `-` (or preceded by NOT) must not match. Each alternative
+    is a tuple of tokens; a term that tokenizes into several tokens, such as
+    `pool-exhausted`, is treated as a phrase.
+    """
+
+    def __init__(self, clauses: List[List[Tuple[str, ...]]], excluded: List[Tuple[str, ...]]):
+        self.clauses = clauses
+        self.excluded = excluded
+
+    @property
+    def tokens(self) -> Set[str]:
+        """Every token the query needs to match"""
+        return {token for clause in self.clauses for alternative in clause for token in alternative}
+
+    @classmethod
+    def parse(cls, query: str) -> "SearchQuery":
+        """Parse a query string, raising ValueError if it has nothing to match"""
+        clauses: List[List[Tuple[str, ...]]] = []
+        excluded: List[Tuple[str, ...]] = []
+        negate = join = False
+        for match in re.finditer(r'(-?)"([^"]*)"?|(\S+)', query):
+            sign, phrase, word = match.groups()
+            if word in ("OR", "AND", "NOT"):
+                join = join or word == "OR"
+                negate = negate or word == "NOT"
+                continue
+            if word is not None and word.startswith("-"):
+                sign, word = "-", word[1:]
+            tokens = tuple(tokenize(phrase if phrase is not None else word))
+            if not tokens:
+                continue
+            if sign or negate:
+                excluded.append(tokens)
+            elif join and clauses:
+                clauses[-1].append(tokens)
+            else:
+                clauses.append([tokens])
+            negate = join = False
+
+        if not clauses:
+            raise ValueError("Search query must contain at least one term")
+        return cls(clauses, excluded)
+
+    def to_fts5(self) -> str:
+        """The query in SQLite FTS5 syntax"""
+        def quote(tokens):
+            return '"' + " ".join(tokens) + '"'
+
+        expression = " AND ".join(
+            "(" + " OR ".join(quote(alternative) for alternative in clause) + ")"
+            for clause in self.clauses
+        )
+        for tokens in self.excluded:
+            expression += f" NOT {quote(tokens)}"
+        return expression
+
+
+class PostingsList:
+    """Increasing doc ids and term frequencies of one term
+
+    Full blocks are stored delta-encoded in the narrowest integer type that
+    fits (1, 2 or 4 bytes), so a term costs one or two bytes per document
+    plus one for its frequency; blocks decode with a NumPy cumulative sum.
+    """
+
+    __slots__ = ("blocks", "doc_ids", "freqs", "count")
+
+    def __init__(self):
+        # Sealed blocks: (first doc id, delta dtype, delta bytes, frequency bytes)
+        self.blocks: List[Tuple[int, str, bytes, bytes]] = []
+        self.doc_ids = array("I")
+        self.freqs = array("B")
+        self.count = 0
+
+    def add(self, doc_id: int, freq: int):
+        self.doc_ids.append(doc_id)
+        self.freqs.append(min(freq, 255))
+        self.count += 1
+        if len(self.doc_ids) >= POSTINGS_BLOCK_SIZE:
+            self._seal()
+
+    def _seal(self):
+        ids = np.frombuffer(self.doc_ids, dtype=np.uint32)
+        deltas = np.diff(ids)
+        largest = int(deltas.max(initial=0))
+        dtype = "u1" if largest < 1 << 8 else "u2" if largest < 1 << 16 else "u4"
+        self.blocks.append((int(ids[0]), dtype, deltas.astype(dtype).tobytes(), self.freqs.tobytes()))
+        del ids
+        self.doc_ids = array("I")
+        self.freqs = array("B")
+
+    def decode(self) -> Tuple[np.ndarray, np.ndarray]:
+        """All doc ids in increasing order, and their frequencies"""
+        ids = []
+        for first, dtype, deltas, _ in self.blocks:
+            block = np.empty(len(deltas) // np.dtype(dtype).itemsize + 1, dtype=np.int64)
+            block[0] = first
+            np.cumsum(np.frombuffer(deltas, dtype=dtype), out=block[1:])
+            block[1:] += first
+            ids.append(block)
+        ids.append(np.array(self.doc_ids, dtype=np.int64))
+        freqs = b"".join(f for _, _, _, f in self.blocks) + self.freqs.tobytes()
+        return np.concatenate(ids), np.frombuffer(freqs, dtype=np.uint8).astype(np.float64)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(d) + len(f) + 32 for _, _, d, f in self.blocks) + len(self.doc_ids) * 5
+
+
+class EventSearchIndex:
+    """Incremental inverted index over event message, source and metadata values
+
+    Documents get increasing integer ids as events are added. Alongside the
+    postings, compact columns keep what is needed to filter and return hits
+    (strings are shared with the stored events, not copied); scoring and
+    filtering run vectorized over the matching doc ids.
+
+    Evicted events are hidden rather than removed: ring eviction drops an
+    incident's oldest events, so per incident the index keeps its doc ids
+    in the same timestamp order as the ring and hides as many of the first
+    ones as were evicted; dropping a whole incident (archiving) hides all
+    of them. A hidden document's message and metadata are released at
+    once; its postings and columns are purged when the index is compacted.
+    Compaction re-tokenizes every live document, so by default it runs in
+    a worker thread on a snapshot while this index keeps serving, and the
+    rebuilt index is swapped in, with documents added or hidden since the
+    snapshot carried over, by the first call after it finishes.
+    """
+
+    def __init__(self, background: bool = True):
+        self.postings: Dict[str, PostingsList] = {}
+        self._incidents, self._levels, self._sources = StringTable(), StringTable(), StringTable()
+
+        # Document columns, by doc id
+        self._event_ids: List[str] = []
+        self._incident_codes = array("I")
+        self._level_codes = array("I")
+        self._source_codes = array("I")
+        self._timestamps = array("q")
+        self._lengths = array("H")
+        # (event_type, message, metadata); the id and this are None once hidden
+        self._events: List[Optional[Tuple]] = []
+        # 1 while visible, 0 once hidden
+        self._live = array("B")
+        self._total_length = 0
+
+        # By incident code: number of visible documents
+        self._incident_docs = array("q")
+        self._hidden = 0
+
+        # By incident code: its doc ids in timestamp order (ties in the
+        # order added, as in the ring), those before the head hidden
+        self._doc_lists: List[array] = []
+        self._doc_heads = array("q")
+
+        # Running background compaction: (thread, result holder)
+        self.background = background
+        self._compaction: Optional[Tuple[threading.Thread, dict]] = None
+
+    def __len__(self) -> int:
+        return len(self._event_ids) - self._hidden
+
+    @staticmethod
+    def _document_tokens(message: str, source: str, metadata: Optional[dict]) -> List[str]:
+        tokens = tokenize(message)
+        tokens += tokenize(source)
+        if metadata:
+            for value in metadata.values():
+                tokens += tokenize(str(value))
+        return tokens
+
+    def add(self, event: Event):
+        """Index an event"""
+        self._poll_compaction()
+        self._add(event.id, event.incident_id, _micros(event.timestamp), event.event_type,
+                  event.message, event.level, event.source, event.metadata or None)
+
+    def _add(self, event_id, incident_id, timestamp, event_type, message, level, source, metadata):
+        doc_id = len(self._event_ids)
+        tokens = self._document_tokens(message, source, metadata)
+        for token, freq in Counter(tokens).items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = PostingsList()
+            postings.add(doc_id, freq)
+
+        incident_code = self._incident_code(incident_id)
+        self._event_ids.append(event_id)
+        self._incident_codes.append(incident_code)
+        self._level_codes.append(self._levels.encode(level))
+        self._source_codes.append(self._sources.encode(source))
+        self._timestamps.append(timestamp)
+        self._lengths.append(min(len(tokens), 65535))
+        self._events.append((event_type, message, metadata))
+        self._live.append(1)
+        self._total_length += len(tokens)
+        self._incident_docs[incident_code] += 1
+
+        docs = self._doc_lists[incident_code]
+        head = self._doc_heads[incident_code]
+        if len(docs) == head or timestamp >= self._timestamps[docs[-1]]:
+            docs.append(doc_id)
+        else:
+            bisect.insort(docs, doc_id, lo=head, key=self._timestamps.__getitem__)
+
+    def _incident_code(self, incident_id: str) -> int:
+        code = self._incidents.encode(incident_id)
+        if code == len(self._incident_docs):
+            self._incident_docs.append(0)
+            self._doc_lists.append(array("I"))
+            self._doc_heads.append(0)
+        return code
+
+    def evict(self, incident_id: str, count: int):
+        """Hide an incident's `count` oldest documents, after its ring evicted
+        as many events"""
+        self._poll_compaction()
+        code = self._incident_code(incident_id)
+        docs, head = self._doc_lists[code], self._doc_heads[code]
+        end = min(head + count, len(docs))
+        for doc_id in docs[head:end]:
+            self._release(doc_id)
+        hidden, head = end - head, end
+        if head > RELEASED_COMPACT_MIN and head * 2 > len(docs):
+            del docs[:head]
+            head = 0
+        self._doc_heads[code] = head
+        self._incident_docs[code] -= hidden
+        self._hide(hidden)
+
+    def drop_incident(self, incident_id: str):
+        """Hide every document of an incident indexed so far"""
+        self._poll_compaction()
+        code = self._incident_code(incident_id)
+        for doc_id in self._doc_lists[code][self._doc_heads[code]:]:
+            self._release(doc_id)
+        self._doc_lists[code] = array("I")
+        self._doc_heads[code] = 0
+        hidden, self._incident_docs[code] = self._incident_docs[code], 0
+        self._hide(hidden)
+
+    def _release(self, doc_id: int):
+        """Hide a document, freeing its id, message and metadata"""
+        self._event_ids[doc_id] = None
+        self._events[doc_id] = None
+        self._live[doc_id] = 0
+
+    def _hide(self, count: int):
+        self._hidden += count
+        if (self._compaction is None and self._hidden >= COMPACT_MIN_HIDDEN
+                and self._hidden * 2 > len(self._event_ids)):
+            if self.background:
+                self._start_compaction()
+            else:
+                self.compact()
+
+    def compact(self):
+        """Rebuild the index without hidden documents, waiting for it"""
+        if self._compaction is not None:
+            self._compaction[0].join()
+            self._poll_compaction()
+            return
+        self._install(*self._rebuild(self._live_docs(), catch_up=False))
+
+    def _start_compaction(self):
+        result = {}
+        thread = threading.Thread(
+            target=self._compact_worker, args=(self._live_docs(), result), name="search-compaction", daemon=True
+        )
+        self._compaction = (thread, result)
+        thread.start()
+
+    def _compact_worker(self, doc_ids: np.ndarray, result: dict):
+        try:
+            result["rebuilt"] = self._rebuild(doc_ids, catch_up=True)
+        except Exception as e:
+            print(f"Event search compaction error: {e}")
+
+    def _poll_compaction(self):
+        """Swap in the index rebuilt by a finished background compaction"""
+        if self._compaction is None or self._compaction[0].is_alive():
+            return
+        _, result = self._compaction
+        self._compaction = None
+        if "rebuilt" in result:
+            self._install(*result["rebuilt"])
+
+    def _live_docs(self) -> np.ndarray:
+        doc_ids = np.arange(len(self._event_ids))
+        return doc_ids[self._visible(doc_ids)]
+
+    def _rebuild(self, doc_ids: np.ndarray, catch_up: bool) -> Tuple["EventSearchIndex", array, int]:
+        """A new index of `doc_ids` (increasing), then with `catch_up` of
+        documents added meanwhile until few are left, skipping released ones.
+
+        Returns the new index, the doc id each of its documents was copied
+        from and how many documents of this index it has gone through. Safe
+        to run in a worker thread while this index keeps changing: it only
+        reads items of existing documents, never column buffers.
+        """
+        rebuilt, sources = EventSearchIndex(background=self.background), array("q")
+        for doc_id in doc_ids.tolist():
+            if self._copy_doc(doc_id, rebuilt):
+                sources.append(doc_id)
+        done = int(doc_ids[-1]) + 1 if len(doc_ids) else 0
+        for _ in range(COMPACT_CATCH_UP_ROUNDS if catch_up else 0):
+            end = len(self._event_ids)
+            if end - done <= COMPACT_CATCH_UP_DOCS:
+                break
+            for doc_id in range(done, end):
+                if self._copy_doc(doc_id, rebuilt):
+                    sources.append(doc_id)
+            done = end
+        return rebuilt, sources, done
+
+    def _copy_doc(self, doc_id: int, target: "EventSearchIndex") -> bool:
+        event_id, payload = self._event_ids[doc_id], self._events[doc_id]
+        if event_id is None or payload is None:
+            return False
+        target._add(
+            event_id, self._incidents.values[self._incident_codes[doc_id]], self._timestamps[doc_id], payload[0],
+            payload[1], self._levels.values[self._level_codes[doc_id]],
+            self._sources.values[self._source_codes[doc_id]], payload[2],
+        )
+        return True
+
+    def _install(self, rebuilt: "EventSearchIndex", sources: array, done: int):
+        """Take over an index returned by `_rebuild`, after copying the
+        documents it has not gone through and re-applying what was hidden"""
+        added = np.arange(done, len(self._event_ids))
+        for doc_id in added[self._visible(added)].tolist():
+            if self._copy_doc(doc_id, rebuilt):
+                sources.append(doc_id)
+
+        # Hide the copies of documents hidden since they were copied
+        visible = self._visible(np.frombuffer(sources, dtype=np.int64).copy())
+        doc_ids = np.arange(len(rebuilt._event_ids))
+        hidden = doc_ids[~visible]
+        rebuilt._hidden = len(hidden)
+        for doc_id in hidden.tolist():
+            rebuilt._release(doc_id)
+        codes, counts = np.unique(rebuilt._column(rebuilt._incident_codes, hidden), return_counts=True)
+        for code, hidden_count in zip(codes.tolist(), counts.tolist()):
+            rebuilt._incident_docs[code] -= hidden_count
+            docs = np.frombuffer(rebuilt._doc_lists[code], dtype=np.uint32)[rebuilt._doc_heads[code]:]
+            rebuilt._doc_lists[code] = array("I", docs[visible[docs]].tobytes())
+            rebuilt._doc_heads[code] = 0
+
+        vars(self).update(vars(rebuilt))
+
+    def _column(self, column: array, doc_ids: np.ndarray) -> np.ndarray:
+        """Values of a document column at `doc_ids` (a copy, so the column can keep growing)"""
+        return np.frombuffer(column, dtype=column.typecode)[doc_ids]
+
+    def _visible(self, doc_ids: np.ndarray) -> np.ndarray:
+        return self._column(self._live, doc_ids).astype(bool)
+
+    def _matching_docs(self, tokens: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids containing all `tokens` (consecutively, for a phrase),
+        and the summed frequency of those tokens in each"""
+        lists = []
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            lists.append(postings)
+        lists.sort(key=lambda p: p.count)
+
+        doc_ids, freqs = lists[0].decode()
+        for postings in lists[1:]:
+            other_ids, other_freqs = postings.decode()
+            doc_ids, left, right = np.intersect1d(doc_ids, other_ids, assume_unique=True, return_indices=True)
+            freqs = freqs[left] + other_freqs[right]
+
+        if len(tokens) > 1 and len(doc_ids):
+            # Hidden documents have no text left to check
+            visible = self._visible(doc_ids)
+            doc_ids, freqs = doc_ids[visible], freqs[visible]
+            keep = np.fromiter((_contains_phrase(self._doc_tokens(d), tokens) for d in doc_ids.tolist()),
+                               dtype=bool, count=len(doc_ids))
+            doc_ids, freqs = doc_ids[keep], freqs[keep]
+        return doc_ids, freqs
+
+    def _doc_tokens(self, doc_id: int) -> List[str]:
+        _, message, metadata = self._events[doc_id]
+        return self._document_tokens(message, self._sources.values[self._source_codes[doc_id]], metadata)
+
+    def _score_clause(self, clause: List[Tuple[str, ...]], doc_count: int, average_length: float):
+        """Doc ids matching any alternative of a clause, with BM25 scores"""
+        all_ids, all_scores = [], []
+        for alternative in clause:
+            doc_ids, freqs = self._matching_docs(alternative)
+            idf = sum(self._idf(token, doc_count) for token in alternative)
+            lengths = self._column(self._lengths, doc_ids)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+            all_ids.append(doc_ids)
+            all_scores.append(idf * freqs * (BM25_K1 + 1) / (freqs + norm))
+        if len(clause) == 1:
+            return all_ids[0], all_scores[0]
+
+        doc_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.zeros(len(doc_ids))
+        np.maximum.at(scores, inverse, np.concatenate(all_scores))
+        return doc_ids, scores
+
+    def search(
+        self,
+        query: SearchQuery,
+        limit: int = 20,
+        incident_id: Optional[str] = None,
+        source: Optional[str] = None,
+        level: Optional[str] = None,
+    ) -> EventSearchResult:
+        """Top `limit` matching events by BM25 score, newest first on ties"""
+        self._poll_compaction()
+        doc_count = max(len(self._event_ids), 1)
+        average_length = max(self._total_length / doc_count, 1.0)
+
+        doc_ids, scores = self._score_clause(query.clauses[0], doc_count, average_length)
+        for clause in query.clauses[1:]:
+            if not len(doc_ids):
+                break
+            other_ids, other_scores = self._score_clause(clause, doc_count, average_length)
+            doc_ids, left, right = np.intersect1d(doc_ids, other_ids, assume_unique=True, return_indices=True)
+            scores = scores[left] + other_scores[right]
+
+        keep = self._visible(doc_ids)
+        for tokens in query.excluded:
+            keep &= ~np.isin(doc_ids, self._matching_docs(tokens)[0], assume_unique=True)
+        for column, table, value in ((self._incident_codes, self._incidents, incident_id),
+                                     (self._source_codes, self._sources, source),
+                                     (self._level_codes, self._levels, level)):
+            if value is not None:
+                keep &= self._column(column, doc_ids) == table.codes.get(value, -1)
+        doc_ids, scores = doc_ids[keep], scores[keep]
+
+        timestamps = self._column(self._timestamps, doc_ids)
+        top = np.lexsort((-timestamps, -scores))[:limit]
+        codes, counts = np.unique(self._column(self._incident_codes, doc_ids), return_counts=True)
+        return EventSearchResult(
+            total=len(doc_ids),
+            incidents={self._incidents.values[code]: count for code, count in zip(codes.tolist(), counts.tolist())},
+            hits=[
+                EventSearchHit(event=self._materialize(doc_id), score=round(score, 4))
+                for doc_id, score in zip(doc_ids[top].tolist(), scores[top].tolist())
+            ],
+        )
+
+    def _idf(self, token: str, doc_count: int) -> float:
+        postings = self.postings.get(token)
+        df = postings.count if postings else 0
+        return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+    def _materialize(self, doc_id: int) -> Event:
+        event_type, message, metadata = self._events[doc_id]
+        return Event.model_construct(
+            id=self._event_ids[doc_id],
+            incident_id=self._incidents.values[self._incident_codes[doc_id]],
+            event_type=event_type,
+            message=message,
+            level=self._levels.values[self._level_codes[doc_id]],
+            source=self._sources.values[self._source_codes[doc_id]],
+            metadata=dict(metadata or {}),
+            timestamp=EPOCH + timedelta(microseconds=self._timestamps[doc_id]),
+        )
+
+
+def merge_search_results(results: Iterable[EventSearchResult], limit: int) -> EventSearchResult:
+    """Combine results from independent indexes (e.g. shards) into one top-k"""
+    merged = EventSearchResult()
+    incidents = Counter()
+    hits = []
+    for result in results:
+        merged.total += result.total
+        incidents.update(result.incidents)
+        hits.extend(result.hits)
+    merged.incidents = dict(incidents)
+    merged.hits = heapq.nlargest(limit, hits, key=lambda hit: (hit.score, hit.event.timestamp))
+    return merged
+
+
+def _contains_phrase(tokens: List[str], phrase: Tuple[str, ...]) -> bool:
+    n = len(phrase)
+    first = phrase[0]
+    return any(
+        tokens[i:i + n] == list(phrase)
+        for i, token in enumerate(tokens) if token == first
+    )
+
+
+def _micros(value: datetime) -> int:
+    return (value - EPOCH) // timedelta(microseconds=1)
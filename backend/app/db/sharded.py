@@ -0,0 +1,163 @@
+import heapq
+import threading
+import zlib
+from typing import List, Optional
+
+from ..models import Incident, Event, EventHistogram, EventSearchResult, TimelineEntry, Action, IncidentStatus
+from .search import SearchQuery, merge_search_results
+from .storage import InMemoryStorage, RetentionPolicy, decode_cursor
+
+
+class ShardedStorage:
+    """Thread-safe in-memory storage partitioned into independently locked shards
+
+    Incidents are assigned to a shard by a stable hash of their id, and the
+    incident's events, timeline and actions live in the same shard. Every
+    call holds only its shard's lock, so threads working on different
+    incidents rarely contend, and read-modify-write updates are atomic.
+    """
+
+    blocking = False
+
+    def __init__(
+        self,
+        shards: int,
+        retention: Optional[RetentionPolicy] = None,
+        event_store: str = "objects",
+        search_index: bool = False,
+    ):
+        retention = retention or RetentionPolicy()
+        # Global limits are split evenly; each shard enforces its share
+        shard_retention = RetentionPolicy(
+            max_events_per_incident=retention.max_events_per_incident,
+            max_events=retention.max_events // shards,
+            max_bytes=retention.max_bytes // shards,
+        )
+        self.shards = [
+            InMemoryStorage(retention=shard_retention, event_store=event_store, search_index=search_index)
+            for _ in range(shards)
+        ]
+        self.locks = [threading.RLock() for _ in range(shards)]
+
+    def _shard_index(self, incident_id: str) -> int:
+        return zlib.crc32(incident_id.encode()) % len(self.shards)
+
+    def _call(self, incident_id: str, method: str, *args, **kwargs):
+        index = self._shard_index(incident_id)
+        with self.locks[index]:
+            return getattr(self.shards[index], method)(*args, **kwargs)
+
+    @property
+    def event_count(self) -> int:
+        return sum(shard.event_count for shard in self.shards)
+
+    @property
+    def event_bytes(self) -> int:
+        return sum(shard.event_bytes for shard in self.shards)
+
+    # Incident operations
+    def create_incident(self, incident: Incident) -> Incident:
+        """Create a new incident"""
+        return self._call(incident.id, "create_incident", incident)
+
+    def get_incident(self, incident_id: str) -> Optional[Incident]:
+        """Get incident by ID"""
+        return self._call(incident_id, "get_incident", incident_id)
+
+    def list_incidents(
+        self,
+        status: Optional[IncidentStatus] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> List[Incident]:
+        """List incidents newest first, merging one page from each shard"""
+        if cursor:
+            decode_cursor(cursor)  # Validate before touching any shard
+
+        pages = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                pages.append(shard.list_incidents(status=status, limit=limit, cursor=cursor))
+
+        merged = heapq.merge(*pages, key=lambda i: (i.created_at, i.id), reverse=True)
+        return [incident for _, incident in zip(range(limit), merged)]
+
+    def update_incident(self, incident_id: str, updates: dict) -> Optional[Incident]:
+        """Update incident fields atomically"""
+        return self._call(incident_id, "update_incident", incident_id, updates)
+
+    def compare_and_set_status(
+        self, incident_id: str, expected: IncidentStatus, updates: dict
+    ) -> Optional[Incident]:
+        """Apply `updates` only if the incident's status is still `expected`"""
+        return self._call(incident_id, "compare_and_set_status", incident_id, expected, updates)
+
+    # Event operations
+    def create_event(self, event: Event) -> Event:
+        """Create a new event"""
+        return self._call(event.incident_id, "create_event", event)
+
+    def create_events(self, events: List[Event]) -> List[Event]:
+        """Create many events, taking each shard's lock once"""
+        by_shard = {}
+        for event in events:
+            by_shard.setdefault(self._shard_index(event.incident_id), []).append(event)
+        for index, shard_events in by_shard.items():
+            with self.locks[index]:
+                self.shards[index].create_events(shard_events)
+        return events
+
+    def list_events(self, incident_id: str, limit: int = 100) -> List[Event]:
+        """List events for an incident, newest first"""
+        return self._call(incident_id, "list_events", incident_id, limit=limit)
+
+    def query_events(self, incident_id: str, **kwargs) -> List[Event]:
+        """Events in a time range; see InMemoryStorage.query_events"""
+        return self._call(incident_id, "query_events", incident_id, **kwargs)
+
+    def event_histogram(self, incident_id: str, **kwargs) -> EventHistogram:
+        """Bucketed event counts; see InMemoryStorage.event_histogram"""
+        return self._call(incident_id, "event_histogram", incident_id, **kwargs)
+
+    def search_events(self, query: str, limit: int = 20, **kwargs) -> EventSearchResult:
+        """Search every shard and merge their top matches"""
+        SearchQuery.parse(query)  # Validate before touching any shard
+        results = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                results.append(shard.search_events(query, limit=limit, **kwargs))
+        return merge_search_results(results, limit)
+
+    # Timeline operations
+    def add_timeline_entry(self, entry: TimelineEntry) -> TimelineEntry:
+        """Add a timeline entry, assigning its sequence number"""
+        return self._call(entry.incident_id, "add_timeline_entry", entry)
+
+    def get_timeline(self, incident_id: str, **kwargs) -> List[TimelineEntry]:
+        """Get timeline entries; see InMemoryStorage.get_timeline"""
+        return self._call(incident_id, "get_timeline", incident_id, **kwargs)
+
+    # Action operations
+    def create_action(self, action: Action) -> Action:
+        """Create a new action"""
+        return self._call(action.incident_id, "create_action", action)
+
+    def get_action(self, action_id: str) -> Optional[Action]:
+        """Get action by ID"""
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                action = shard.get_action(action_id)
+            if action:
+                return action
+        return None
+
+    def list_actions(self, incident_id: str) -> List[Action]:
+        """List actions for an incident"""
+        return self._call(incident_id, "list_actions", incident_id)
+
+    def update_action(self, action_id: str, updates: dict) -> Optional[Action]:
+        """Update action fields atomically"""
+        action = self.get_action(action_id)
+        if not action:
+            return None
+        return self._call(action.incident_id, "update_action", action_id, updates)
@@ -0,0 +1,364 @@
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from ..models import (
+    Incident,
+    Event,
+    EventType,
+    EventHistogram,
+    EventSearchHit,
+    EventSearchResult,
+    TimelineEntry,
+    Action,
+    IncidentStatus,
+)
+from .search import SearchQuery
+from .storage import build_histogram, decode_cursor
+
+EPOCH = datetime(1970, 1, 1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_created ON incidents (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_status_created ON incidents (status, created_at, id);
+
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT NOT NULL,
+    incident_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_incident_timestamp ON events (incident_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS timeline (
+    incident_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (incident_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS actions (
+    id TEXT PRIMARY KEY,
+    incident_id TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_actions_incident_priority ON actions (incident_id, priority, created_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(body, tokenize = "unicode61 tokenchars '_'");
+CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts (rowid, body) SELECT new.rowid, {body} FROM (SELECT new.data AS data);
+END;
+"""
+
+# Searchable text of an event row: message, source and metadata values
+EVENT_SEARCH_BODY = (
+    "json_extract(data, '$.message') || ' ' || json_extract(data, '$.source') || ' ' || "
+    "COALESCE((SELECT group_concat(value, ' ') FROM json_each(data, '$.metadata')), '')"
+)
+SCHEMA = SCHEMA.replace("{body}", EVENT_SEARCH_BODY)
+
+# Statements are constants so sqlite3's per-connection statement cache
+# prepares each of them once
+INSERT_INCIDENT = "INSERT INTO incidents (id, status, created_at, data) VALUES (?, ?, ?, ?)"
+UPDATE_INCIDENT = "UPDATE incidents SET status = ?, created_at = ?, data = ? WHERE id = ?"
+SELECT_INCIDENT = "SELECT data FROM incidents WHERE id = ?"
+INSERT_EVENT = "INSERT INTO events (id, incident_id, timestamp, data) VALUES (?, ?, ?, ?)"
+SELECT_EVENTS = "SELECT data FROM events WHERE incident_id = ? ORDER BY timestamp DESC LIMIT ?"
+INSERT_TIMELINE = "INSERT INTO timeline (incident_id, seq, data) VALUES (?, ?, ?)"
+SELECT_TIMELINE_SEQ = "SELECT COALESCE(MAX(seq), 0) FROM timeline WHERE incident_id = ?"
+SELECT_TIMELINE_SINCE = "SELECT data FROM timeline WHERE incident_id = ? AND seq > ? ORDER BY seq LIMIT ?"
+SELECT_TIMELINE_BEFORE = "SELECT data FROM timeline WHERE incident_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?"
+UPSERT_ACTION = "INSERT OR REPLACE INTO actions (id, incident_id, priority, created_at, data) VALUES (?, ?, ?, ?, ?)"
+SELECT_ACTION = "SELECT data FROM actions WHERE id = ?"
+SELECT_ACTIONS = "SELECT data FROM actions WHERE incident_id = ? ORDER BY priority, created_at"
+BACKFILL_EVENTS_FTS = (
+    f"INSERT INTO events_fts (rowid, body) SELECT rowid, {EVENT_SEARCH_BODY} FROM events "
+    "WHERE NOT EXISTS (SELECT 1 FROM events_fts LIMIT 1)"
+)
+
+
+def to_micros(value: datetime) -> int:
+    """Naive UTC datetime to integer microseconds since the epoch"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class SQLiteStorage:
+    """SQLite-backed storage with the same interface as InMemoryStorage
+
+    Runs in WAL journal mode so readers never block the writer. Each thread
+    gets its own connection; writes are serialized with a lock. Calls block
+    on disk I/O, so API handlers run them through `run_storage`.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.RLock()
+        self._connection().executescript(SCHEMA)
+        # Index events stored before the search table existed
+        self._write(BACKFILL_EVENTS_FTS, ())
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, params: tuple):
+        with self._write_lock:
+            self._connection().execute(sql, params)
+
+    def _write_many(self, sql: str, rows: list):
+        with self._write_lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(sql, rows)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # Incident operations
+    def create_incident(self, incident: Incident) -> Incident:
+        """Create a new incident"""
+        self._write(INSERT_INCIDENT, (
+            incident.id, incident.status.value, to_micros(incident.created_at), incident.model_dump_json(),
+        ))
+        return incident
+
+    def get_incident(self, incident_id: str) -> Optional[Incident]:
+        """Get incident by ID"""
+        row = self._connection().execute(SELECT_INCIDENT, (incident_id,)).fetchone()
+        return Incident.model_validate_json(row[0]) if row else None
+
+    def list_incidents(
+        self,
+        status: Optional[IncidentStatus] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> List[Incident]:
+        """List incidents newest first with optional status filter and cursor"""
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status.value)
+        if cursor:
+            created_at, incident_id = decode_cursor(cursor)
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend([to_micros(created_at), incident_id])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT data FROM incidents {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._connection().execute(sql, (*params, limit)).fetchall()
+        return [Incident.model_validate_json(data) for data, in rows]
+
+    def update_incident(self, incident_id: str, updates: dict) -> Optional[Incident]:
+        """Update incident fields"""
+        with self._write_lock:
+            incident = self.get_incident(incident_id)
+            if not incident:
+                return None
+
+            for key, value in updates.items():
+                if hasattr(incident, key):
+                    setattr(incident, key, value)
+
+            incident.updated_at = datetime.utcnow()
+            self._connection().execute(UPDATE_INCIDENT, (
+                incident.status.value, to_micros(incident.created_at), incident.model_dump_json(), incident.id,
+            ))
+            return incident
+
+    def compare_and_set_status(
+        self, incident_id: str, expected: IncidentStatus, updates: dict
+    ) -> Optional[Incident]:
+        """Apply `updates` only if the incident's status is still `expected`"""
+        with self._write_lock:
+            incident = self.get_incident(incident_id)
+            if not incident or incident.status != expected:
+                return None
+            return self.update_incident(incident_id, updates)
+
+    # Event operations
+    def create_event(self, event: Event) -> Event:
+        """Create a new event"""
+        self._write(INSERT_EVENT, _event_row(event))
+        return event
+
+    def create_events(self, events: List[Event]) -> List[Event]:
+        """Create many events in one transaction"""
+        if events:
+            self._write_many(INSERT_EVENT, [_event_row(e) for e in events])
+        return events
+
+    def list_events(self, incident_id: str, limit: int = 100) -> List[Event]:
+        """List events for an incident, newest first"""
+        rows = self._connection().execute(SELECT_EVENTS, (incident_id, limit)).fetchall()
+        return [Event.model_validate_json(data) for data, in rows]
+
+    def _event_range(self, incident_id, start, end, level, source, event_type):
+        """WHERE clause for events of an incident in [start, end) matching filters"""
+        clauses, params = ["incident_id = ?"], [incident_id]
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(to_micros(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(to_micros(end))
+        for field, value in (("level", level), ("source", source), ("event_type", event_type)):
+            if value is not None:
+                clauses.append(f"json_extract(data, '$.{field}') = ?")
+                params.append(value.value if isinstance(value, EventType) else value)
+        return " AND ".join(clauses), params
+
+    def query_events(
+        self,
+        incident_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+        limit: int = 100,
+    ) -> List[Event]:
+        """Events in [start, end) matching the filters, newest first"""
+        where, params = self._event_range(incident_id, start, end, level, source, event_type)
+        sql = f"SELECT data FROM events WHERE {where} ORDER BY timestamp DESC LIMIT ?"
+        rows = self._connection().execute(sql, (*params, limit)).fetchall()
+        return [Event.model_validate_json(data) for data, in rows]
+
+    def event_histogram(
+        self,
+        incident_id: str,
+        bucket_seconds: int = 60,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+    ) -> EventHistogram:
+        """Counts of events in [start, end) per time bucket, level and source"""
+        where, params = self._event_range(incident_id, start, end, level, source, event_type)
+        sql = (
+            "SELECT timestamp / ?, json_extract(data, '$.level'), json_extract(data, '$.source'), COUNT(*) "
+            f"FROM events WHERE {where} GROUP BY 1, 2, 3"
+        )
+        rows = self._connection().execute(sql, (bucket_seconds * 1_000_000, *params)).fetchall()
+        counts = Counter({(index, lvl, src): count for index, lvl, src, count in rows})
+        return build_histogram(incident_id, bucket_seconds, counts)
+
+    def search_events(
+        self,
+        query: str,
+        limit: int = 20,
+        incident_id: Optional[str] = None,
+        source: Optional[str] = None,
+        level: Optional[str] = None,
+    ) -> EventSearchResult:
+        """Full-text search over events with SQLite FTS5, ranked by BM25"""
+        clauses, params = ["events_fts MATCH ?"], [SearchQuery.parse(query).to_fts5()]
+        if incident_id is not None:
+            clauses.append("e.incident_id = ?")
+            params.append(incident_id)
+        for field, value in (("level", level), ("source", source)):
+            if value is not None:
+                clauses.append(f"json_extract(e.data, '$.{field}') = ?")
+                params.append(value)
+
+        where = " AND ".join(clauses)
+        matches = f"FROM events_fts JOIN events e ON e.rowid = events_fts.rowid WHERE {where}"
+        conn = self._connection()
+        rows = conn.execute(
+            f"SELECT e.data, -bm25(events_fts) {matches} ORDER BY bm25(events_fts), e.timestamp DESC LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+        incidents = dict(conn.execute(f"SELECT e.incident_id, COUNT(*) {matches} GROUP BY 1", params).fetchall())
+        return EventSearchResult(
+            total=sum(incidents.values()),
+            incidents=incidents,
+            hits=[EventSearchHit(event=Event.model_validate_json(data), score=round(score, 4)) for data, score in rows],
+        )
+
+    # Timeline operations
+    def add_timeline_entry(self, entry: TimelineEntry) -> TimelineEntry:
+        """Add a timeline entry, assigning its sequence number"""
+        with self._write_lock:
+            conn = self._connection()
+            entry.seq = conn.execute(SELECT_TIMELINE_SEQ, (entry.incident_id,)).fetchone()[0] + 1
+            conn.execute(INSERT_TIMELINE, (entry.incident_id, entry.seq, entry.model_dump_json()))
+        return entry
+
+    def get_timeline(
+        self,
+        incident_id: str,
+        since_seq: Optional[int] = None,
+        before_seq: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[TimelineEntry]:
+        """Get timeline entries after `since_seq` oldest first, or else
+        newest first (optionally before `before_seq`)"""
+        limit = -1 if limit is None else limit
+        if since_seq is not None:
+            params = (SELECT_TIMELINE_SINCE, (incident_id, since_seq, limit))
+        else:
+            before = before_seq if before_seq is not None else 2 ** 62
+            params = (SELECT_TIMELINE_BEFORE, (incident_id, before, limit))
+        rows = self._connection().execute(*params).fetchall()
+        return [TimelineEntry.model_validate_json(data) for data, in rows]
+
+    # Action operations
+    def create_action(self, action: Action) -> Action:
+        """Create a new action"""
+        self._write(UPSERT_ACTION, _action_row(action))
+        return action
+
+    def get_action(self, action_id: str) -> Optional[Action]:
+        """Get action by ID"""
+        row = self._connection().execute(SELECT_ACTION, (action_id,)).fetchone()
+        return Action.model_validate_json(row[0]) if row else None
+
+    def list_actions(self, incident_id: str) -> List[Action]:
+        """List actions for an incident"""
+        rows = self._connection().execute(SELECT_ACTIONS, (incident_id,)).fetchall()
+        return [Action.model_validate_json(data) for data, in rows]
+
+    def update_action(self, action_id: str, updates: dict) -> Optional[Action]:
+        """Update action fields"""
+        with self._write_lock:
+            action = self.get_action(action_id)
+            if not action:
+                return None
+
+            for key, value in updates.items():
+                if hasattr(action, key):
+                    setattr(action, key, value)
+
+            self._connection().execute(UPSERT_ACTION, _action_row(action))
+            return action
+
+
+def _event_row(event: Event) -> tuple:
+    return (event.id, event.incident_id, to_micros(event.timestamp), event.model_dump_json())
+
+
+def _action_row(action: Action) -> tuple:
+    return (action.id, action.incident_id, action.priority, to_micros(action.created_at), action.model_dump_json())
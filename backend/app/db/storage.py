@@ -1,79 +1,515 @@
-from typing import Dict, List, Optional
-from datetime import datetime
-from ..models import Incident, Event, TimelineEntry, Action, IncidentStatus
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+import base64
+import bisect
+from starlette.concurrency import run_in_threadpool
+from ..config import get_settings
+from ..models import (
+    Incident,
+    Event,
+    EventType,
+    EventHistogram,
+    EventHistogramBucket,
+    EventSearchResult,
+    TimelineEntry,
+    Action,
+    IncidentStatus,
+)
+from ..observability.metrics import events_evicted, events_evicted_bytes, events_stored, events_stored_bytes
+from .columnar import ColumnarEventRing, StringTable, EPOCH
+from .wal import WriteAheadLog, OP_INCIDENT, OP_EVENT, OP_TIMELINE, OP_ACTION
+from .archive import SegmentArchive
+from .search import EventSearchIndex, SearchDisabled, SearchQuery
+
+# Rough fixed cost of an Event model (object, dicts, datetime, uuid string)
+EVENT_OVERHEAD_BYTES = 600
+
+# When a global limit is hit, evict down to this fraction of it so eviction
+# work is amortized over many writes instead of running on every insert
+EVICTION_LOW_WATERMARK = 0.95
+
+# Incidents whose events are evicted first under global pressure
+INACTIVE_STATUSES = (IncidentStatus.RESOLVED, IncidentStatus.CLOSED)
+
+# Most archived incidents whose events are kept decoded at once; far fewer
+# than headers, since one incident can hold millions of events
+COLD_EVENT_CACHE_SIZE = 8
+
+
+def estimate_event_bytes(event: Event) -> int:
+    """Cheap estimate of the memory held by a stored event"""
+    size = EVENT_OVERHEAD_BYTES + len(event.message) + len(event.source)
+    for key, value in event.metadata.items():
+        size += len(key) + len(str(value))
+    return size
+
+
+class RetentionPolicy:
+    """Event retention limits. A value of 0 disables that limit."""
+
+    def __init__(self, max_events_per_incident: int = 0, max_events: int = 0, max_bytes: int = 0):
+        self.max_events_per_incident = max_events_per_incident
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls, settings) -> "RetentionPolicy":
+        """Build a policy from application settings"""
+        return cls(
+            max_events_per_incident=settings.max_events_per_incident,
+            max_events=settings.max_events_total,
+            max_bytes=settings.max_event_memory_mb * 1024 * 1024,
+        )
+
+
+class EventRing:
+    """Timestamp-ordered ring buffer of one incident's events
+
+    Evictions advance a head offset instead of shifting the list, and the
+    dead prefix is compacted once it dominates the buffer.
+    """
+
+    def __init__(self):
+        self._items: List[Event] = []
+        self._head = 0
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._items) - self._head
+
+    def __iter__(self) -> Iterator[Event]:
+        """Iterate events oldest first"""
+        return iter(self._items[self._head:])
+
+    def add(self, event: Event) -> int:
+        """Insert an event, keeping timestamp order; returns bytes charged"""
+        items = self._items
+        if len(items) == self._head or event.timestamp >= items[-1].timestamp:
+            # Fast path: events almost always arrive in timestamp order
+            items.append(event)
+        else:
+            bisect.insort(items, event, lo=self._head, key=_event_sort_key)
+        size = estimate_event_bytes(event)
+        self.bytes += size
+        return size
+
+    def latest(self, limit: int) -> List[Event]:
+        """Return up to `limit` events, newest first"""
+        start = max(len(self._items) - limit, self._head)
+        return self._items[start:][::-1]
+
+    def _bounds(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+        """Index range of events with start <= timestamp < end, by binary search"""
+        items = self._items
+        lo = self._head
+        if start is not None:
+            lo = bisect.bisect_left(items, start, lo=lo, key=_event_sort_key)
+        hi = len(items)
+        if end is not None:
+            hi = bisect.bisect_left(items, end, lo=lo, key=_event_sort_key)
+        return lo, hi
+
+    def select(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+        limit: int = 100,
+    ) -> List[Event]:
+        """Return up to `limit` matching events in [start, end), newest first"""
+        lo, hi = self._bounds(start, end)
+        matched = []
+        for i in range(hi - 1, lo - 1, -1):
+            event = self._items[i]
+            if ((level is None or event.level == level)
+                    and (source is None or event.source == source)
+                    and (event_type is None or event.event_type == event_type)):
+                matched.append(event)
+                if len(matched) >= limit:
+                    break
+        return matched
+
+    def histogram(
+        self,
+        bucket_seconds: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+    ) -> Counter:
+        """Count matching events in [start, end) by (bucket start, level, source)"""
+        lo, hi = self._bounds(start, end)
+        bucket = timedelta(seconds=bucket_seconds)
+        counts = Counter()
+        for i in range(lo, hi):
+            event = self._items[i]
+            if ((level is None or event.level == level)
+                    and (source is None or event.source == source)
+                    and (event_type is None or event.event_type == event_type)):
+                counts[((event.timestamp - EPOCH) // bucket, event.level, event.source)] += 1
+        return counts
+
+    def evict(self, count: int = 0, min_bytes: int = 0) -> Tuple[int, int]:
+        """Drop the oldest events until `count` events and `min_bytes` bytes
+        have been freed. Returns (events evicted, bytes evicted)."""
+        items = self._items
+        evicted = freed = 0
+        while self._head < len(items) and (evicted < count or freed < min_bytes):
+            freed += estimate_event_bytes(items[self._head])
+            items[self._head] = None
+            self._head += 1
+            evicted += 1
+
+        if self._head > 1024 and self._head * 2 > len(items):
+            del items[:self._head]
+            self._head = 0
+
+        self.bytes -= freed
+        self.evicted += evicted
+        return evicted, freed
 
 
 class InMemoryStorage:
     """In-memory storage for incidents, events, and actions"""
 
-    def __init__(self):
+    # Calls never wait on I/O, so handlers can run them on the event loop
+    blocking = False
+
+    def __init__(
+        self,
+        retention: Optional[RetentionPolicy] = None,
+        event_store: str = "objects",
+        search_index: bool = False,
+    ):
         self.incidents: Dict[str, Incident] = {}
-        self.events: Dict[str, Event] = {}
         self.timeline: Dict[str, List[TimelineEntry]] = {}
         self.actions: Dict[str, Action] = {}
 
+        # Events live in one bounded, timestamp-ordered ring per incident so
+        # reads are O(k) and a single noisy incident cannot grow without limit.
+        # The "columnar" event store keeps rings as compact column arrays.
+        self.events: Dict[str, EventRing] = {}
+        if event_store == "columnar":
+            levels, sources = StringTable(), StringTable()
+            self._new_ring = lambda: ColumnarEventRing(levels, sources)
+        elif event_store == "objects":
+            self._new_ring = EventRing
+        else:
+            raise ValueError(f"Unknown event store: {event_store}")
+        self.retention = retention or RetentionPolicy()
+        self.search_index: Optional[EventSearchIndex] = EventSearchIndex() if search_index else None
+        self.event_count = 0
+        self.event_bytes = 0
+
+        # Incident ids in least-recently-used order, for global eviction
+        self._event_lru: "OrderedDict[str, None]" = OrderedDict()
+
+        # Incident keys (created_at, id) in ascending order, one list for all
+        # incidents (under None) and one per status, so pages are O(log N + k)
+        self._incident_index: Dict[Optional[IncidentStatus], List[Tuple[datetime, str]]] = {None: []}
+
+        # Per-incident secondary index, actions kept in priority order
+        self._actions_by_incident: Dict[str, List[Action]] = {}
+
+        # Optional write-ahead log; every mutation is appended once attached
+        self.wal: Optional[WriteAheadLog] = None
+
+        # Optional cold tier. Archived incidents keep their keys in
+        # `_incident_index` and are read back through a small LRU of
+        # per-incident stores rebuilt from their archive header blocks, and
+        # a smaller LRU of event rings decoded only when events are read.
+        self.archive: Optional[SegmentArchive] = None
+        self._cold: "OrderedDict[str, InMemoryStorage]" = OrderedDict()
+        self._cold_events: "OrderedDict[str, EventRing]" = OrderedDict()
+        self._cold_cache_size = 0
+
     # Incident operations
     def create_incident(self, incident: Incident) -> Incident:
         """Create a new incident"""
         self.incidents[incident.id] = incident
         self.timeline[incident.id] = []
+        self._index_incident(incident)
+        if self.wal is not None:
+            self.wal.append(OP_INCIDENT, incident.model_dump_json().encode())
         return incident
 
     def get_incident(self, incident_id: str) -> Optional[Incident]:
         """Get incident by ID"""
-        return self.incidents.get(incident_id)
+        incident = self.incidents.get(incident_id)
+        if incident is None and self.archive is not None:
+            cold = self._cold_store(incident_id)
+            if cold is not None:
+                return cold.incidents.get(incident_id)
+        return incident
+
+    def list_incidents(
+        self,
+        status: Optional[IncidentStatus] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+    ) -> List[Incident]:
+        """List incidents newest first with optional status filter.
 
-    def list_incidents(self, status: Optional[IncidentStatus] = None, limit: int = 50) -> List[Incident]:
-        """List all incidents with optional status filter"""
-        incidents = list(self.incidents.values())
-        if status:
-            incidents = [i for i in incidents if i.status == status]
-        # Sort by created_at descending
-        incidents.sort(key=lambda x: x.created_at, reverse=True)
-        return incidents[:limit]
+        `cursor` is the value of `encode_cursor()` for the last incident of
+        the previous page; raises ValueError if it is malformed.
+        """
+        keys = self._incident_index.get(status, [])
+        end = bisect.bisect_left(keys, decode_cursor(cursor)) if cursor else len(keys)
+        start = max(end - limit, 0)
+        return [self.get_incident(incident_id) for _, incident_id in reversed(keys[start:end])]
 
     def update_incident(self, incident_id: str, updates: dict) -> Optional[Incident]:
         """Update incident fields"""
+        self._rehydrate(incident_id)
         incident = self.incidents.get(incident_id)
         if not incident:
             return None
 
+        old_key, old_status = _incident_sort_key(incident), incident.status
         for key, value in updates.items():
             if hasattr(incident, key):
                 setattr(incident, key, value)
 
         incident.updated_at = datetime.utcnow()
+        if incident.status != old_status or _incident_sort_key(incident) != old_key:
+            self._unindex_incident(old_key, old_status)
+            self._index_incident(incident)
+        if self.wal is not None:
+            self.wal.append(OP_INCIDENT, incident.model_dump_json().encode())
         return incident
 
+    def compare_and_set_status(
+        self, incident_id: str, expected: IncidentStatus, updates: dict
+    ) -> Optional[Incident]:
+        """Apply `updates` only if the incident's status is still `expected`.
+
+        Returns the updated incident, or None if it is missing or its status
+        changed in the meantime.
+        """
+        self._rehydrate(incident_id)
+        incident = self.incidents.get(incident_id)
+        if not incident or incident.status != expected:
+            return None
+        return self.update_incident(incident_id, updates)
+
+    def _index_incident(self, incident: Incident):
+        self._index_key(_incident_sort_key(incident), incident.status)
+
+    def _index_key(self, key: Tuple[datetime, str], status: IncidentStatus):
+        bisect.insort(self._incident_index[None], key)
+        bisect.insort(self._incident_index.setdefault(status, []), key)
+
+    def _unindex_incident(self, key: Tuple[datetime, str], status: IncidentStatus):
+        for keys in (self._incident_index[None], self._incident_index[status]):
+            del keys[bisect.bisect_left(keys, key)]
+
     # Event operations
     def create_event(self, event: Event) -> Event:
         """Create a new event"""
-        self.events[event.id] = event
+        ring = self.events.get(event.incident_id)
+        if ring is None:
+            if self.archive is not None:
+                self._rehydrate(event.incident_id)
+                ring = self.events.get(event.incident_id)
+        if ring is None:
+            ring = self.events[event.incident_id] = self._new_ring()
+
+        size = ring.add(event)
+        if self.search_index is not None:
+            self.search_index.add(event)
+        if self.wal is not None:
+            self.wal.append(OP_EVENT, event.model_dump_json().encode())
+        self.event_count += 1
+        self.event_bytes += size
+        self._touch(event.incident_id)
+
+        policy = self.retention
+        if policy.max_events_per_incident and len(ring) > policy.max_events_per_incident:
+            self._evict_ring(event.incident_id, ring, "incident_cap", count=len(ring) - policy.max_events_per_incident)
+        if policy.max_events and self.event_count > policy.max_events:
+            self._evict_global("global_cap", count=self.event_count - int(policy.max_events * EVICTION_LOW_WATERMARK))
+        if policy.max_bytes and self.event_bytes > policy.max_bytes:
+            self._evict_global("memory_budget", min_bytes=self.event_bytes - int(policy.max_bytes * EVICTION_LOW_WATERMARK))
         return event
 
+    def create_events(self, events: List[Event]) -> List[Event]:
+        """Create many events"""
+        for event in events:
+            self.create_event(event)
+        return events
+
     def list_events(self, incident_id: str, limit: int = 100) -> List[Event]:
-        """List events for an incident"""
-        events = [e for e in self.events.values() if e.incident_id == incident_id]
-        events.sort(key=lambda x: x.timestamp, reverse=True)
-        return events[:limit]
+        """List events for an incident, newest first"""
+        ring = self._event_ring(incident_id)
+        if not ring or limit <= 0:
+            return []
+        return ring.latest(limit)
+
+    def query_events(
+        self,
+        incident_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+        limit: int = 100,
+    ) -> List[Event]:
+        """Events in [start, end) matching the filters, newest first.
+
+        The time range is located by binary search on the incident's
+        timestamp-ordered ring; only events inside it are examined.
+        """
+        ring = self._event_ring(incident_id)
+        if not ring or limit <= 0:
+            return []
+        return ring.select(start, end, level=level, source=source, event_type=event_type, limit=limit)
+
+    def event_histogram(
+        self,
+        incident_id: str,
+        bucket_seconds: int = 60,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        level: Optional[str] = None,
+        source: Optional[str] = None,
+        event_type: Optional[EventType] = None,
+    ) -> EventHistogram:
+        """Counts of events in [start, end) per time bucket, level and source,
+        computed without materializing events"""
+        ring = self._event_ring(incident_id)
+        counts = Counter()
+        if ring:
+            counts = ring.histogram(
+                bucket_seconds, start, end, level=level, source=source, event_type=event_type
+            )
+        return build_histogram(incident_id, bucket_seconds, counts)
+
+    def _event_ring(self, incident_id: str):
+        """Ring holding an incident's events, hot or archived, or None.
+        Hot rings are marked recently used."""
+        ring = self.events.get(incident_id)
+        if ring is not None:
+            self._touch(incident_id)
+            return ring
+        return self._cold_ring(incident_id)
+
+    def _touch(self, incident_id: str):
+        """Mark an incident's events as recently used"""
+        lru = self._event_lru
+        if incident_id in lru:
+            lru.move_to_end(incident_id)
+        else:
+            lru[incident_id] = None
+
+    def _evict_global(self, reason: str, count: int = 0, min_bytes: int = 0):
+        """Free events across incidents: least recently used resolved or
+        closed incidents first, then the least recently used of the rest.
+        Each incident gives up its oldest events first."""
+        inactive, active = [], []
+        for incident_id in self._event_lru:
+            incident = self.incidents.get(incident_id)
+            if incident is None or incident.status in INACTIVE_STATUSES:
+                inactive.append(incident_id)
+            else:
+                active.append(incident_id)
+
+        for incident_id in inactive + active:
+            if count <= 0 and min_bytes <= 0:
+                break
+            ring = self.events[incident_id]
+            evicted, freed = self._evict_ring(incident_id, ring, reason, count=count, min_bytes=min_bytes)
+            count -= evicted
+            min_bytes -= freed
+            if not len(ring):
+                del self._event_lru[incident_id]
+
+    def _evict_ring(self, incident_id: str, ring, reason: str, count: int = 0, min_bytes: int = 0) -> Tuple[int, int]:
+        evicted, freed = ring.evict(count=count, min_bytes=min_bytes)
+        if evicted and self.search_index is not None:
+            self.search_index.evict(incident_id, evicted)
+        self._record_eviction(reason, evicted, freed)
+        return evicted, freed
+
+    def _record_eviction(self, reason: str, evicted: int, freed: int):
+        if not evicted:
+            return
+        self.event_count -= evicted
+        self.event_bytes -= freed
+        events_evicted.labels(reason=reason).inc(evicted)
+        events_evicted_bytes.labels(reason=reason).inc(freed)
+
+    def search_events(
+        self,
+        query: str,
+        limit: int = 20,
+        incident_id: Optional[str] = None,
+        source: Optional[str] = None,
+        level: Optional[str] = None,
+    ) -> EventSearchResult:
+        """Full-text search over stored events, best matches first.
+
+        See `SearchQuery` for the query syntax; raises ValueError for a
+        query with nothing to match, and SearchDisabled if this store keeps
+        no search index. Archived incidents are not searched.
+        """
+        if self.search_index is None:
+            raise SearchDisabled("Event search is disabled")
+        return self.search_index.search(
+            SearchQuery.parse(query), limit=limit, incident_id=incident_id, source=source, level=level
+        )
 
     # Timeline operations
     def add_timeline_entry(self, entry: TimelineEntry) -> TimelineEntry:
-        """Add a timeline entry"""
-        if entry.incident_id not in self.timeline:
-            self.timeline[entry.incident_id] = []
-        self.timeline[entry.incident_id].append(entry)
+        """Add a timeline entry, assigning its sequence number"""
+        self._rehydrate(entry.incident_id)
+        entries = self.timeline.setdefault(entry.incident_id, [])
+        entry.seq = len(entries) + 1
+        entries.append(entry)
+        if self.wal is not None:
+            self.wal.append(OP_TIMELINE, entry.model_dump_json().encode())
         return entry
 
-    def get_timeline(self, incident_id: str) -> List[TimelineEntry]:
-        """Get timeline for an incident"""
+    def get_timeline(
+        self,
+        incident_id: str,
+        since_seq: Optional[int] = None,
+        before_seq: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[TimelineEntry]:
+        """Get timeline entries for an incident in O(k).
+
+        With `since_seq`, returns entries after that sequence number oldest
+        first (for incremental polling). Otherwise returns entries newest
+        first, optionally only those before `before_seq` (for paging back).
+        """
+        cold = self._cold_store(incident_id)
+        if cold is not None:
+            return cold.get_timeline(incident_id, since_seq=since_seq, before_seq=before_seq, limit=limit)
         entries = self.timeline.get(incident_id, [])
-        return sorted(entries, key=lambda x: x.timestamp, reverse=True)
+        if since_seq is not None:
+            start = max(since_seq, 0)
+            end = len(entries) if limit is None else start + limit
+            return entries[start:end]
+
+        end = len(entries) if before_seq is None else min(max(before_seq - 1, 0), len(entries))
+        start = 0 if limit is None else max(end - limit, 0)
+        return entries[start:end][::-1]
 
     # Action operations
     def create_action(self, action: Action) -> Action:
         """Create a new action"""
+        self._rehydrate(action.incident_id)
         self.actions[action.id] = action
+        actions = self._actions_by_incident.setdefault(action.incident_id, [])
+        bisect.insort(actions, action, key=_action_sort_key)
+        if self.wal is not None:
+            self.wal.append(OP_ACTION, action.model_dump_json().encode())
         return action
 
     def get_action(self, action_id: str) -> Optional[Action]:
@@ -82,9 +518,10 @@ class InMemoryStorage:
 
     def list_actions(self, incident_id: str) -> List[Action]:
         """List actions for an incident"""
-        actions = [a for a in self.actions.values() if a.incident_id == incident_id]
-        actions.sort(key=lambda x: (x.priority, x.created_at))
-        return actions
+        cold = self._cold_store(incident_id)
+        if cold is not None:
+            return cold.list_actions(incident_id)
+        return list(self._actions_by_incident.get(incident_id, []))
 
     def update_action(self, action_id: str, updates: dict) -> Optional[Action]:
         """Update action fields"""
@@ -92,12 +529,296 @@ class InMemoryStorage:
         if not action:
             return None
 
+        old_key = _action_sort_key(action)
         for key, value in updates.items():
             if hasattr(action, key):
                 setattr(action, key, value)
 
+        # Re-position in the per-incident index if the sort key changed
+        if _action_sort_key(action) != old_key:
+            actions = self._actions_by_incident[action.incident_id]
+            del actions[next(i for i, a in enumerate(actions) if a is action)]
+            bisect.insort(actions, action, key=_action_sort_key)
+
+        if self.wal is not None:
+            self.wal.append(OP_ACTION, action.model_dump_json().encode())
         return action
 
+    # Durability
+    def attach_wal(self, wal: WriteAheadLog):
+        """Rebuild state from `wal` (snapshot plus log tail), then log every
+        subsequent mutation to it"""
+        for op, payload in wal.recover():
+            self._replay(op, payload)
+        wal.open()
+        self.wal = wal
+
+    def _replay(self, op: int, payload: bytes):
+        if op == OP_EVENT:
+            self.create_event(Event.model_validate_json(payload))
+        elif op == OP_INCIDENT:
+            incident = Incident.model_validate_json(payload)
+            existing = self.incidents.get(incident.id)
+            if existing is not None:
+                self._unindex_incident(_incident_sort_key(existing), existing.status)
+                self.incidents[incident.id] = incident
+                self._index_incident(incident)
+            else:
+                self.create_incident(incident)
+        elif op == OP_TIMELINE:
+            self.add_timeline_entry(TimelineEntry.model_validate_json(payload))
+        elif op == OP_ACTION:
+            action = Action.model_validate_json(payload)
+            if action.id in self.actions:
+                self.update_action(action.id, dict(action))
+            else:
+                self.create_action(action)
+
+    def snapshot_models(self) -> List[Tuple[int, list]]:
+        """Point-in-time references to every stored model, grouped by record op.
+
+        Cheap enough to call on the event loop; serialize the result
+        elsewhere with `snapshot_records`.
+        """
+        return [
+            (OP_INCIDENT, list(self.incidents.values())),
+            (OP_TIMELINE, [e for entries in self.timeline.values() for e in entries]),
+            (OP_ACTION, list(self.actions.values())),
+            (OP_EVENT, [e for ring in self.events.values() for e in ring]),
+        ]
+
+    @staticmethod
+    def snapshot_records(models: List[Tuple[int, list]]) -> Iterator[Tuple[int, bytes]]:
+        """Serialize the output of `snapshot_models` as WAL records"""
+        for op, items in models:
+            for item in items:
+                yield op, item.model_dump_json().encode()
+
+
+    # Cold tier
+    def attach_archive(self, archive: SegmentArchive, cache_size: int = 128):
+        """Serve archived incidents from `archive`, keeping up to
+        `cache_size` of them (and a few of their event sets) decoded in memory"""
+        for incident_id, created_at, status in archive.entries():
+            if incident_id in self.incidents:
+                # Recovered from the WAL after it was archived; the hot copy is newer
+                archive.forget(incident_id)
+            else:
+                self._index_key((created_at, incident_id), status)
+        self.archive = archive
+        self._cold_cache_size = cache_size
+
+    def _cold_store(self, incident_id: str) -> Optional["InMemoryStorage"]:
+        """Store holding an archived incident with its timeline and actions
+        but no events, or None if it is hot or unknown.
+
+        A cache miss reads and decodes the incident's small header block;
+        that read is the only I/O these calls do.
+        """
+        if self.archive is None or incident_id in self.incidents:
+            return None
+        cold = self._cold.get(incident_id)
+        if cold is not None:
+            self._cold.move_to_end(incident_id)
+            return cold
+
+        records = self.archive.read_header(incident_id)
+        if records is None:
+            return None
+        cold = InMemoryStorage()
+        for op, payload in records:
+            cold._replay(op, payload)
+        self._cold[incident_id] = cold
+        if len(self._cold) > self._cold_cache_size:
+            self._cold.popitem(last=False)
+        return cold
+
+    def _cold_ring(self, incident_id: str):
+        """Ring of an archived incident's events, or None if it is hot or
+        unknown. A cache miss decodes the incident's events block."""
+        if self.archive is None or incident_id in self.incidents:
+            return None
+        ring = self._cold_events.get(incident_id)
+        if ring is not None:
+            self._cold_events.move_to_end(incident_id)
+            return ring
+
+        records = self.archive.read_events(incident_id)
+        if records is None:
+            return None
+        ring = self._new_ring()
+        for _, payload in records:
+            ring.add(Event.model_validate_json(payload))
+        self._cold_events[incident_id] = ring
+        if len(self._cold_events) > min(self._cold_cache_size, COLD_EVENT_CACHE_SIZE):
+            self._cold_events.popitem(last=False)
+        return ring
+
+    def _rehydrate(self, incident_id: str):
+        """Move an archived incident back into hot storage before a write"""
+        if self.archive is None or incident_id in self.incidents:
+            return
+        records = self.archive.read(incident_id)
+        if records is None:
+            return
+        records = list(records)
+        archived = Incident.model_validate_json(records[0][1])
+        self._unindex_incident(_incident_sort_key(archived), archived.status)
+        # Replaying through the public methods also logs the incident to the WAL
+        for op, payload in records:
+            self._replay(op, payload)
+        self.archive.forget(incident_id)
+        self._cold.pop(incident_id, None)
+        self._cold_events.pop(incident_id, None)
+
+    def archivable_incidents(self, cutoff: datetime, limit: int) -> List[str]:
+        """Ids of up to `limit` resolved or closed incidents not updated since `cutoff`"""
+        candidates = []
+        for status in INACTIVE_STATUSES:
+            for _, incident_id in self._incident_index.get(status, []):
+                incident = self.incidents.get(incident_id)
+                if incident is not None and incident.updated_at < cutoff:
+                    candidates.append(incident_id)
+                    if len(candidates) >= limit:
+                        return candidates
+        return candidates
+
+    def incident_models(self, incident_id: str) -> List[Tuple[int, list]]:
+        """Like `snapshot_models`, for a single incident (incident record first)"""
+        ring = self.events.get(incident_id)
+        return [
+            (OP_INCIDENT, [self.incidents[incident_id]]),
+            (OP_TIMELINE, list(self.timeline.get(incident_id, []))),
+            (OP_ACTION, list(self._actions_by_incident.get(incident_id, []))),
+            (OP_EVENT, list(ring) if ring else []),
+        ]
+
+    def incident_version(self, incident_id: str) -> tuple:
+        """Changes whenever anything stored for the incident changes"""
+        ring = self.events.get(incident_id)
+        return (
+            self.incidents[incident_id].model_dump_json(),
+            len(ring) + ring.evicted if ring else 0,
+            len(self.timeline.get(incident_id, [])),
+            tuple(action.model_dump_json() for action in self._actions_by_incident.get(incident_id, [])),
+        )
+
+    def drop_archived(self, incident_id: str, version: tuple) -> bool:
+        """Drop an incident from memory once it has been written to the archive.
+
+        If it changed since `version` was taken, it stays hot, the archived
+        copy is discarded and False is returned.
+        """
+        if incident_id not in self.incidents or self.incident_version(incident_id) != version:
+            self.archive.forget(incident_id)
+            return False
+
+        # The incident's key stays in `_incident_index`, now served from the archive
+        del self.incidents[incident_id]
+        self.timeline.pop(incident_id, None)
+        for action in self._actions_by_incident.pop(incident_id, []):
+            self.actions.pop(action.id, None)
+        ring = self.events.pop(incident_id, None)
+        if ring is not None:
+            self.event_count -= len(ring)
+            self.event_bytes -= ring.bytes
+        self._event_lru.pop(incident_id, None)
+        if self.search_index is not None:
+            self.search_index.drop_incident(incident_id)
+        return True
+
+
+def build_histogram(incident_id: str, bucket_seconds: int, counts: Counter) -> EventHistogram:
+    """Build an EventHistogram from counts keyed by (bucket index, level, source)"""
+    histogram = EventHistogram(incident_id=incident_id, bucket_seconds=bucket_seconds)
+    by_level, by_source = Counter(), Counter()
+    buckets: Dict[int, EventHistogramBucket] = {}
+    for (index, level, source), count in sorted(counts.items()):
+        bucket = buckets.get(index)
+        if bucket is None:
+            start = EPOCH + timedelta(seconds=index * bucket_seconds)
+            bucket = buckets[index] = EventHistogramBucket(start=start, count=0)
+        bucket.count += count
+        bucket.by_level[level] = bucket.by_level.get(level, 0) + count
+        bucket.by_source[source] = bucket.by_source.get(source, 0) + count
+        by_level[level] += count
+        by_source[source] += count
+
+    histogram.total = sum(by_level.values())
+    histogram.by_level = dict(by_level)
+    histogram.by_source = dict(by_source)
+    histogram.buckets = list(buckets.values())
+    return histogram
+
+
+def _incident_sort_key(incident: Incident) -> Tuple[datetime, str]:
+    return (incident.created_at, incident.id)
+
+
+def encode_cursor(incident: Incident) -> str:
+    """Opaque pagination cursor pointing just past `incident`"""
+    raw = f"{incident.created_at.isoformat()}|{incident.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by `encode_cursor`, raising ValueError if invalid"""
+    try:
+        created_at, incident_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return (datetime.fromisoformat(created_at), incident_id)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _event_sort_key(event: Event):
+    return event.timestamp
+
+
+def _action_sort_key(action: Action):
+    return (action.priority, action.created_at)
+
+
+def create_storage(settings):
+    """Build the storage backend selected by `settings.storage_backend`"""
+    if settings.storage_backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage(settings.sqlite_path)
+    if settings.storage_backend == "remote":
+        from .remote import RemoteStorage
+        return RemoteStorage(settings.storage_socket_path)
+    if settings.storage_backend != "memory":
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+    if settings.storage_shards > 1:
+        from .sharded import ShardedStorage
+        return ShardedStorage(
+            settings.storage_shards,
+            retention=RetentionPolicy.from_settings(settings),
+            event_store=settings.event_store,
+            search_index=settings.search_enabled,
+        )
+    return InMemoryStorage(
+        retention=RetentionPolicy.from_settings(settings),
+        event_store=settings.event_store,
+        search_index=settings.search_enabled,
+    )
+
+
+T = TypeVar("T")
+
+
+async def run_storage(func: Callable[..., T], *args, **kwargs) -> T:
+    """Call a method of the global storage without blocking the event loop.
+
+    Backends that wait on disk (`blocking = True`) run in the thread pool;
+    in-memory calls are cheaper than a thread hop and run inline.
+    """
+    if storage.blocking:
+        return await run_in_threadpool(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
 
 # Global storage instance
-storage = InMemoryStorage()
+storage = create_storage(get_settings())
+if hasattr(storage, "event_count"):
+    events_stored.set_function(lambda: storage.event_count)
+    events_stored_bytes.set_function(lambda: storage.event_bytes)
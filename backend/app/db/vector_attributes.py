@@ -0,0 +1,218 @@
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from .columnar import EPOCH, StringTable
+
+# Timestamp of entries without a (parseable) one; they never match a time window
+NO_TIMESTAMP = -(2 ** 63)
+
+Strings = Union[str, Sequence[str], None]
+
+
+def _strings(value) -> Optional[List[str]]:
+    """A metadata value or filter criterion as a list of strings (None if unset)"""
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)) or not isinstance(value, Iterable):
+        value = [value]
+    return [_text(item) for item in value]
+
+
+def _text(value) -> str:
+    """The string a metadata value is indexed under ("" when unset); enums by value"""
+    if value is None:
+        return ""
+    return str(getattr(value, "value", value))
+
+
+def _micros(value) -> int:
+    """Microseconds since the epoch of a datetime, ISO string or epoch seconds"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return NO_TIMESTAMP
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value * 1_000_000)
+    if not isinstance(value, datetime):
+        return NO_TIMESTAMP
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class VectorFilter:
+    """Which entries a vector search may return
+
+    `severity` and `service` match entries whose metadata value is one of
+    those given, `tags` entries with at least one of the given tags, and
+    `since` / `until` entries whose `timestamp` (or `created_at`) falls in
+    [since, until). Unset criteria match everything; entries without a
+    timestamp never match a time window.
+    """
+
+    def __init__(
+        self,
+        severity: Strings = None,
+        service: Strings = None,
+        tags: Strings = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+    ):
+        self.severity = _strings(severity)
+        self.service = _strings(service)
+        self.tags = _strings(tags)
+        self.since = since
+        self.until = until
+
+    @property
+    def empty(self) -> bool:
+        """True if the filter matches every entry"""
+        return all(value is None for value in (self.severity, self.service, self.tags, self.since, self.until))
+
+
+class AttributeIndex:
+    """Severity, service, tags and timestamp of every vector store entry
+
+    Read from each entry's metadata as it is added and kept column-wise:
+    severity and service as dictionary codes, timestamps as int64
+    microseconds, and tags both per entry (offsets into a code array, to
+    save and select them) and per tag (positions having it, to filter).
+    A filter is evaluated over the columns with vectorized comparisons,
+    so its cost follows the corpus size, not how many entries match. Not
+    thread-safe; the vector store uses it under its lock.
+    """
+
+    def __init__(self):
+        self.severities = StringTable()
+        self.services = StringTable()
+        self.tag_names = StringTable()
+        self._timestamps = array("q")
+        self._severity = array("I")
+        self._service = array("I")
+        self._tag_offsets = array("q", [0])
+        self._tag_codes = array("I")
+        self._postings: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._timestamps)
+
+    def extend(self, records: Iterable[Dict]):
+        """Index the attributes of entries added after the current ones"""
+        for record in records:
+            if not isinstance(record, dict):
+                record = {}
+            position = len(self._timestamps)
+            self._timestamps.append(_micros(record.get("timestamp", record.get("created_at"))))
+            self._severity.append(self.severities.encode(_text(record.get("severity"))))
+            self._service.append(self.services.encode(_text(record.get("service"))))
+            for tag in _strings(record.get("tags")) or ():
+                code = self.tag_names.encode(tag)
+                self._tag_codes.append(code)
+                self._postings.setdefault(code, array("q")).append(position)
+            self._tag_offsets.append(len(self._tag_codes))
+
+    def columns(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """Entries start..end as arrays (codes plus their strings), to save"""
+        tag_start, tag_end = self._tag_offsets[start], self._tag_offsets[end]
+        return {
+            "timestamp": np.array(self._timestamps[start:end], dtype="int64"),
+            "severity": np.array(self._severity[start:end], dtype="uint32"),
+            "severity_values": np.array(self.severities.values, dtype=str),
+            "service": np.array(self._service[start:end], dtype="uint32"),
+            "service_values": np.array(self.services.values, dtype=str),
+            "tag_offsets": np.array(self._tag_offsets[start:end + 1], dtype="int64") - tag_start,
+            "tags": np.array(self._tag_codes[tag_start:tag_end], dtype="uint32"),
+            "tag_values": np.array(self.tag_names.values, dtype=str),
+        }
+
+    def append_columns(self, columns: Dict[str, np.ndarray]):
+        """Add saved entries (see `columns`) after the current ones"""
+        start, count = len(self), len(columns["timestamp"])
+        self._timestamps.frombytes(columns["timestamp"].astype("int64").tobytes())
+        self._severity.frombytes(
+            self._recode(self.severities, columns["severity"], columns["severity_values"]).tobytes()
+        )
+        self._service.frombytes(
+            self._recode(self.services, columns["service"], columns["service_values"]).tobytes()
+        )
+
+        tags = self._recode(self.tag_names, columns["tags"], columns["tag_values"])
+        offsets = columns["tag_offsets"].astype("int64")
+        self._tag_offsets.frombytes((offsets[1:] + self._tag_offsets[-1]).tobytes())
+        self._tag_codes.frombytes(tags.tobytes())
+        positions = np.repeat(np.arange(start, start + count, dtype="int64"), np.diff(offsets))
+        order = np.argsort(tags, kind="stable")
+        codes, firsts = np.unique(tags[order], return_index=True)
+        for code, group in zip(codes.tolist(), np.split(positions[order], firsts[1:])):
+            self._postings.setdefault(code, array("q")).frombytes(group.tobytes())
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "AttributeIndex":
+        index = cls()
+        index.append_columns(columns)
+        return index
+
+    @staticmethod
+    def select(columns: Dict[str, np.ndarray], positions: np.ndarray) -> Dict[str, np.ndarray]:
+        """The entries of `columns` at `positions`, in that order"""
+        offsets = columns["tag_offsets"]
+        lengths = np.diff(offsets)[positions]
+        selected_offsets = np.zeros(len(positions) + 1, dtype="int64")
+        np.cumsum(lengths, out=selected_offsets[1:])
+        # Index of each kept tag: its entry's first tag plus its rank within the entry
+        tag_rows = np.repeat(offsets[positions] - selected_offsets[:-1], lengths) + np.arange(selected_offsets[-1])
+        return {
+            **columns,
+            "timestamp": columns["timestamp"][positions],
+            "severity": columns["severity"][positions],
+            "service": columns["service"][positions],
+            "tag_offsets": selected_offsets,
+            "tags": columns["tags"][tag_rows],
+        }
+
+    def mask(self, vector_filter: VectorFilter, count: int) -> np.ndarray:
+        """Which of entries 0..count match `vector_filter`"""
+        mask = np.zeros(count, dtype=bool)
+        indexed = min(count, len(self))
+        matched = mask[:indexed]
+        matched[:] = True
+        if vector_filter.severity is not None:
+            matched &= self._match(self._severity, self.severities, vector_filter.severity, indexed)
+        if vector_filter.service is not None:
+            matched &= self._match(self._service, self.services, vector_filter.service, indexed)
+        if vector_filter.tags is not None:
+            tagged = np.zeros(indexed, dtype=bool)
+            for tag in vector_filter.tags:
+                # A tag can outlive its entries (compaction, reload keep the names)
+                postings = self._postings.get(self.tag_names.codes.get(tag))
+                if postings is not None:
+                    positions = np.frombuffer(postings, dtype="int64")
+                    tagged[positions[positions < indexed]] = True
+            matched &= tagged
+        if vector_filter.since is not None or vector_filter.until is not None:
+            timestamps = np.frombuffer(self._timestamps, dtype="int64")[:indexed]
+            if vector_filter.since is not None:
+                matched &= timestamps >= _micros(vector_filter.since)
+            else:
+                matched &= timestamps != NO_TIMESTAMP
+            if vector_filter.until is not None:
+                matched &= timestamps < _micros(vector_filter.until)
+        return mask
+
+    @staticmethod
+    def _match(column: array, table: StringTable, values: List[str], count: int) -> np.ndarray:
+        codes = [table.codes[value] for value in values if value in table.codes]
+        if not codes:
+            return np.zeros(count, dtype=bool)
+        column = np.frombuffer(column, dtype="uint32")[:count]
+        return column == codes[0] if len(codes) == 1 else np.isin(column, codes)
+
+    @staticmethod
+    def _recode(table: StringTable, codes: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Saved dictionary codes translated to `table`'s codes"""
+        lookup = np.array([table.encode(str(value)) for value in values.tolist()], dtype="uint32")
+        return lookup[codes] if len(codes) else np.zeros(0, dtype="uint32")
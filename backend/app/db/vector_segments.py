@@ -0,0 +1,412 @@
+import fcntl
+import json
+import mmap
+import os
+from bisect import bisect_right
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MANIFEST_NAME = "manifest.json"
+# Held while the manifest is swapped (and the files it drops are deleted)
+# and while a load reads it and opens its files; the writer lock is held
+# by the one process that saves the directory, for as long as it runs
+LOCK_NAME = "store.lock"
+WRITER_LOCK_NAME = "writer.lock"
+
+# A trailing run of segments is merged into one once it has MERGE_FANIN
+# segments, each no more than twice the size of the ones after it combined;
+# every row is then rewritten O(log n) times. MAX_SEGMENTS caps the count.
+MERGE_FANIN = 4
+MAX_SEGMENTS = 8
+
+# Rows copied per step when merging segments
+COPY_CHUNK = 65536
+
+
+def merge_run(counts: Sequence[int]) -> int:
+    """Index of the first of the trailing segments to merge, len(counts) if none"""
+    if len(counts) < 2:
+        return len(counts)
+    start, total = len(counts) - 1, counts[-1]
+    while start > 0 and counts[start - 1] <= 2 * total:
+        start -= 1
+        total += counts[start]
+    if len(counts) - start >= MERGE_FANIN:
+        return start
+    if len(counts) > MAX_SEGMENTS:
+        return min(start, len(counts) - 2)
+    return len(counts)
+
+
+def segment_name(prefix: str, seq: int) -> str:
+    return f"{prefix}-{seq:08d}"
+
+
+@contextmanager
+def directory_lock(directory: Path):
+    """Hold the store directory exclusively, across processes, so a load
+    never opens files a save or merge is deleting"""
+    with open(directory / LOCK_NAME, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def claim_writer(directory: Path):
+    """The open writer lock file of a store directory, or None if another
+    process holds it; the claim lasts until the file is closed"""
+    lock_file = open(directory / WRITER_LOCK_NAME, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def read_manifest(directory: Path) -> Optional[Dict]:
+    path = directory / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(directory: Path, manifest: Dict):
+    """Atomically replace the manifest, then delete files it no longer references"""
+    path = directory / MANIFEST_NAME
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    with directory_lock(directory):
+        os.replace(tmp_path, path)
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        remove_unreferenced(directory, manifest)
+
+
+def referenced_files(manifest: Dict) -> List[str]:
+    files = [
+        segment["file"]
+        for segment in manifest["vectors"] + manifest.get("deleted", []) + manifest.get("attributes", [])
+    ]
+    for segment in manifest["metadata"]:
+        files += [segment["file"] + suffix for suffix in (".bin", ".idx.npy", ".ids.json")]
+    if manifest["base"]:
+        files.append(manifest["base"]["file"])
+    return files
+
+
+def remove_unreferenced(directory: Path, manifest: Dict):
+    """Delete segment and base files left by merges or interrupted saves"""
+    keep = set(referenced_files(manifest))
+    for pattern in ("base-*", "vectors-*", "meta-*", "deleted-*", "attrs-*"):
+        for path in directory.glob(pattern):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+
+def write_vectors(path: Path, count: int, dimension: int, chunks: Iterator[np.ndarray]) -> bool:
+    """Stream `count` float32 rows into a .npy file; False if `chunks` ran short"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype="float32", shape=(count, dimension))
+    written = 0
+    for chunk in chunks:
+        if chunk is None:
+            break
+        out[written:written + len(chunk)] = chunk
+        written += len(chunk)
+    out.flush()
+    del out
+    if written != count:
+        tmp_path.unlink(missing_ok=True)
+        return False
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return True
+
+
+def read_vectors(path: Path) -> np.ndarray:
+    """Rows of a vector segment, memory-mapped"""
+    return np.load(path, mmap_mode="r")
+
+
+def merge_vectors(directory: Path, segments: List[Dict], file: str, dimension: int) -> Dict:
+    """Concatenate consecutive vector segments into one"""
+    count = sum(segment["count"] for segment in segments)
+
+    def chunks():
+        for segment in segments:
+            rows = read_vectors(directory / segment["file"])
+            for start in range(0, len(rows), COPY_CHUNK):
+                yield rows[start:start + COPY_CHUNK]
+
+    write_vectors(directory / file, count, dimension, chunks())
+    return {"file": file, "start": segments[0]["start"], "count": count}
+
+
+def write_positions(path: Path, positions: np.ndarray):
+    """Write an int64 array of vector positions (tombstones)"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.asarray(positions, dtype="int64"))
+    _fsync_replace(tmp_path, path)
+
+
+def merge_positions(directory: Path, segments: List[Dict], file: str) -> Dict:
+    """Concatenate tombstone files into one"""
+    positions = np.concatenate([np.load(directory / segment["file"]) for segment in segments])
+    write_positions(directory / file, positions)
+    return {"file": file, "count": len(positions)}
+
+
+def write_columns(path: Path, columns: Dict[str, np.ndarray]):
+    """Write named arrays (an attribute segment) as one .npz file"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **columns)
+    _fsync_replace(tmp_path, path)
+
+
+def read_columns(path: Path) -> Dict[str, np.ndarray]:
+    with np.load(path) as columns:
+        return {name: columns[name] for name in columns.files}
+
+
+def _fsync_replace(tmp_path: Path, path: Path):
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class MetadataSegment:
+    """Offset-indexed, memory-mapped metadata rows of one segment file
+
+    `<file>.bin` holds the rows as compact JSON objects back to back and
+    `<file>.idx.npy` the int64 byte offset of each row plus the end, so a
+    row is decoded only when it is read. `<file>.ids.json`, if present,
+    lists the external id of each row (null for rows added without one).
+    """
+
+    def __init__(self, directory: Path, file: str, start: int, count: int):
+        self.file = file
+        self.start = start
+        self.count = count
+        self.offsets = np.load(directory / f"{file}.idx.npy", mmap_mode="r")
+        with open(directory / f"{file}.bin", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        ids_path = directory / f"{file}.ids.json"
+        if ids_path.exists():
+            with open(ids_path) as f:
+                self.ids: List[Optional[str]] = json.load(f)
+        else:
+            self.ids = [None] * count
+
+    def __getitem__(self, row: int) -> Dict:
+        return json.loads(self.data[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def raw(self, start: int, end: int) -> Tuple[bytes, np.ndarray]:
+        """Bytes and offsets (relative to the first) of rows start..end"""
+        offsets = np.asarray(self.offsets[start:end + 1], dtype="int64")
+        return self.data[int(offsets[0]):int(offsets[-1])], offsets - offsets[0]
+
+    def raw_rows(self, rows: np.ndarray) -> Tuple[bytes, np.ndarray]:
+        """Bytes and offsets of the given rows, back to back"""
+        starts = np.asarray(self.offsets[rows], dtype="int64")
+        ends = np.asarray(self.offsets[rows + 1], dtype="int64")
+        offsets = np.zeros(len(rows) + 1, dtype="int64")
+        np.cumsum(ends - starts, out=offsets[1:])
+        data = self.data
+        return b"".join(data[start:end] for start, end in zip(starts.tolist(), ends.tolist())), offsets
+
+    def entry(self) -> Dict:
+        return {"file": self.file, "start": self.start, "count": self.count}
+
+    @staticmethod
+    def write(directory: Path, file: str, rows: Iterator[Tuple[bytes, np.ndarray]], ids: List[Optional[str]]):
+        """Write rows given as (bytes, relative offsets) blocks, and their ids"""
+        bin_path = directory / f"{file}.bin"
+        idx_path = directory / f"{file}.idx.npy"
+        bin_tmp = bin_path.with_name(bin_path.name + ".tmp")
+        offsets = [np.zeros(1, dtype="int64")]
+        position = 0
+        with open(bin_tmp, "wb") as f:
+            for data, block_offsets in rows:
+                f.write(data)
+                offsets.append(block_offsets[1:] + position)
+                position += len(data)
+        idx_tmp = idx_path.with_name(idx_path.name + ".tmp")
+        with open(idx_tmp, "wb") as f:
+            np.save(f, np.concatenate(offsets))
+        if any(external_id is not None for external_id in ids):
+            ids_path = directory / f"{file}.ids.json"
+            ids_tmp = ids_path.with_name(ids_path.name + ".tmp")
+            with open(ids_tmp, "w") as f:
+                json.dump(ids, f, separators=(",", ":"))
+            _fsync_replace(ids_tmp, ids_path)
+        _fsync_replace(bin_tmp, bin_path)
+        _fsync_replace(idx_tmp, idx_path)
+
+
+def check_record(record: Dict):
+    """Raise ValueError unless a metadata record reads back unchanged from
+    JSON: str keys and dict, list, str, number, bool or None values only
+    (no datetimes, tuples or NaN)"""
+    try:
+        same = json.loads(json.dumps(record, allow_nan=False)) == record
+    except (TypeError, ValueError):
+        same = False
+    if not same:
+        raise ValueError(f"Vector metadata must be plain JSON values: {record!r}")
+
+
+def encode_rows(records: List[Dict]) -> Tuple[bytes, np.ndarray]:
+    """Compact JSON of each record, back to back, with their offsets
+
+    Records added to a store are checked by `check_record`; `default=str`
+    only applies to records converted from the legacy pickle.
+    """
+    encoded = [json.dumps(record, separators=(",", ":"), default=str).encode() for record in records]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(row) for row in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+class MetadataLog:
+    """The vector store's per-vector metadata: saved segments, then unsaved rows
+
+    Behaves like the list it replaces for reads and appends, and also keeps
+    the external id each row was added under (None for `add_vectors`). Saved
+    rows live in memory-mapped `MetadataSegment` files and are decoded on
+    access; rows added since the last save are kept as dicts until `flush`.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        segments: Sequence[Dict] = (),
+        pending: Tuple[List[Dict], List[Optional[str]]] = ((), ()),
+    ):
+        self.directory = directory
+        opened = [MetadataSegment(directory, s["file"], s["start"], s["count"]) for s in segments]
+        flushed = sum(segment.count for segment in opened)
+        # Swapped as a whole, so readers never see a half-applied flush or
+        # merge. Unsaved ids are extended before their rows, so every row
+        # a reader can see has its id.
+        self._state: Tuple[List[MetadataSegment], List[int], int, List[Dict], List[Optional[str]]] = (
+            opened, [segment.start for segment in opened], flushed, list(pending[0]), list(pending[1]),
+        )
+
+    def __len__(self) -> int:
+        _, _, flushed, pending, _ = self._state
+        return flushed + len(pending)
+
+    def __getitem__(self, position: int) -> Dict:
+        segments, starts, flushed, pending, _ = self._state
+        if position < 0:
+            position += flushed + len(pending)
+        if position >= flushed:
+            return pending[position - flushed]
+        segment = segments[bisect_right(starts, position) - 1]
+        return segment[position - segment.start]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def id_at(self, position: int) -> Optional[str]:
+        segments, starts, flushed, _, pending_ids = self._state
+        if position >= flushed:
+            return pending_ids[position - flushed]
+        segment = segments[bisect_right(starts, position) - 1]
+        return segment.ids[position - segment.start]
+
+    def ids(self) -> Iterator[Optional[str]]:
+        """The id of every row, in order"""
+        segments, _, flushed, pending, pending_ids = self._state
+        for segment in segments:
+            yield from segment.ids
+        yield from pending_ids[:len(pending)]
+
+    def extend(self, records: List[Dict], ids: Optional[List[Optional[str]]] = None):
+        self._state[4].extend(ids if ids is not None else [None] * len(records))
+        self._state[3].extend(records)
+
+    @property
+    def flushed(self) -> int:
+        return self._state[2]
+
+    def segments(self) -> List[Dict]:
+        return [segment.entry() for segment in self._state[0]]
+
+    def unflushed(self, start: int, end: int) -> Tuple[List[Dict], List[Optional[str]]]:
+        """Unsaved rows and their ids at positions start..end"""
+        _, _, flushed, pending, pending_ids = self._state
+        return pending[start - flushed:end - flushed], pending_ids[start - flushed:end - flushed]
+
+    def flush(self, file: str, end: int) -> Optional[Dict]:
+        """Write the unsaved rows up to `end` as a new segment; `adopt` it to serve them from it"""
+        records, ids = self.unflushed(self.flushed, end)
+        if not records:
+            return None
+        MetadataSegment.write(self.directory, file, iter([encode_rows(records)]), ids)
+        return {"file": file, "start": self.flushed, "count": len(records)}
+
+    def adopt(self, entries: List[Dict]):
+        """Serve saved rows from the segments in `entries`, which replace any
+        segments (merged) or unsaved rows (flushed) they cover"""
+        segments, starts, flushed, pending, pending_ids = self._state
+        end = max(entry["start"] + entry["count"] for entry in entries)
+        known = {segment.file: segment for segment in segments}
+        opened = [
+            known.get(entry["file"]) or MetadataSegment(self.directory, entry["file"], entry["start"], entry["count"])
+            for entry in entries
+        ]
+        drop = max(end - flushed, 0)
+        self._state = (opened, [segment.start for segment in opened], end, pending[drop:], pending_ids[drop:])
+
+    def merge(self, first: int, file: str) -> Dict:
+        """Write segments first.. as one segment file and return its entry"""
+        run = self._state[0][first:]
+        MetadataSegment.write(self.directory, file, (
+            segment.raw(start, min(start + COPY_CHUNK, segment.count))
+            for segment in run
+            for start in range(0, segment.count, COPY_CHUNK)
+        ), [external_id for segment in run for external_id in segment.ids])
+        return {"file": file, "start": run[0].start, "count": sum(segment.count for segment in run)}
+
+    def select(self, positions: np.ndarray) -> Tuple[List[Dict], List[Optional[str]]]:
+        """Rows and ids at `positions` (sorted), decoded"""
+        return [self[position] for position in positions.tolist()], [self.id_at(p) for p in positions.tolist()]
+
+    def write_selected(self, file: str, positions: np.ndarray) -> Dict:
+        """Write the rows at `positions` (sorted) as one segment starting at 0,
+        copying saved rows without decoding them"""
+        segments, starts, flushed, _, _ = self._state
+
+        def blocks():
+            saved = positions[positions < flushed]
+            owners = np.searchsorted(np.asarray(starts, dtype="int64"), saved, side="right") - 1
+            for owner in np.unique(owners).tolist():
+                segment = segments[owner]
+                rows = saved[owners == owner] - segment.start
+                for start in range(0, len(rows), COPY_CHUNK):
+                    yield segment.raw_rows(rows[start:start + COPY_CHUNK])
+            unsaved = positions[positions >= flushed]
+            if len(unsaved):
+                yield encode_rows(self.select(unsaved)[0])
+
+        MetadataSegment.write(self.directory, file, blocks(), [self.id_at(p) for p in positions.tolist()])
+        return {"file": file, "start": 0, "count": len(positions)}
@@ -1,9 +1,36 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
+from contextlib import nullcontext
 import numpy as np
 from pathlib import Path
+import math
 import pickle
+import threading
 import os
 
+from ..config import get_settings
+from ..observability.metrics import vector_filtered_searches, vector_index_promotions, vector_segment_merges
+from .vector_attributes import AttributeIndex, VectorFilter
+from .vector_segments import (
+    MANIFEST_NAME,
+    MetadataLog,
+    MetadataSegment,
+    check_record,
+    claim_writer,
+    directory_lock,
+    encode_rows,
+    merge_positions,
+    merge_run,
+    merge_vectors,
+    read_columns,
+    read_manifest,
+    read_vectors,
+    segment_name,
+    write_columns,
+    write_manifest,
+    write_positions,
+    write_vectors,
+)
+
 try:
     import faiss
     FAISS_AVAILABLE = True
@@ -11,106 +38,1207 @@ except ImportError:
     FAISS_AVAILABLE = False
     print("FAISS not available. Vector search will be disabled.")
 
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Default promotion ladder for index_type="auto": corpus size -> index type
+DEFAULT_TIERS = {"flat": 0, "ivf_flat": 50_000, "ivf_pq": 1_000_000}
+
+# IVF lists: about 4 * sqrt(n), each trained on up to TRAIN_POINTS_PER_LIST
+# vectors and never on fewer than MIN_POINTS_PER_LIST (k-means degenerates)
+MIN_IVF_LISTS = 16
+MAX_IVF_LISTS = 65536
+MIN_POINTS_PER_LIST = 39
+TRAIN_POINTS_PER_LIST = 64
+# PQ codebooks have 256 centroids per sub-quantizer
+PQ_BITS = 8
+MIN_PQ_TRAIN_POINTS = 39 * (1 << PQ_BITS)
+HNSW_EF_CONSTRUCTION = 80
+# ivf_pq re-ranks this many times k PQ candidates with 8-bit scalar-quantized
+# vectors; PQ codes alone cannot order close neighbours
+REFINE_K_FACTOR = 8
+
+# Vectors copied per step while promoting, so the old index is only locked briefly
+PROMOTE_CHUNK = 65536
+
+# Saved vectors after the base index are folded into a new base once they
+# reach this share of it (so each vector is rewritten a few times at most),
+# and no sooner than this many, which loading reads into memory
+BASE_MERGE_RATIO = 0.5
+MIN_BASE_MERGE_VECTORS = 65536
+
+# Deleted (and replaced) vectors are physically removed once they are this
+# share of the index, and at least this many
+COMPACT_RATIO = 0.2
+MIN_COMPACT_DELETED = 1024
+
+# Filtered searches: up to FILTER_EXACT_MAX matching vectors are read back
+# and scored exactly. An approximate index matched at least
+# POST_FILTER_FRACTION by the filter runs the plain search for
+# k / fraction * POST_FILTER_OVERFETCH hits and drops the others. Otherwise
+# the index skips non-matching vectors through an ID selector (a flat index
+# then only scores the matches), probing FILTER_PROBE_FACTOR / fraction
+# times more IVF lists or keeping FILTER_PROBE_FACTOR * k / fraction HNSW
+# candidates (scaled up to FILTER_MAX_SCALE), since the nearest matches lie
+# further out than the nearest vectors
+FILTER_EXACT_MAX = 8192
+POST_FILTER_FRACTION = 0.1
+POST_FILTER_OVERFETCH = 2
+FILTER_PROBE_FACTOR = 2
+FILTER_MAX_SCALE = 1024
+
+
+def index_type_of(index) -> str:
+    """The INDEX_TYPES name of a FAISS index"""
+    if isinstance(index, faiss.IndexRefine):
+        return index_type_of(faiss.downcast_index(index.base_index))
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
 
 class VectorStore:
-    """Vector database for semantic search of logs, incidents, and runbooks"""
+    """Vector database for semantic search of logs, incidents, and runbooks
+
+    The index is `index_type`: flat (exact, brute force), ivf_flat or
+    ivf_pq (inverted lists, trained; PQ compresses vectors to `pq_m`
+    bytes and re-ranks candidates with 8-bit scalar-quantized copies),
+    hnsw (graph, no training), or auto. Auto starts flat and
+    promotes along `tiers` (index type -> minimum corpus size) as vectors
+    are added; a fixed trained type also starts flat until there are
+    enough vectors to train it. Promotion trains and fills the new index
+    in a background thread while the current one keeps serving; vectors
+    added meanwhile are carried over before the swap. Indexes are never
+    demoted, and promoting out of ivf_pq re-encodes its lossy vectors.
+
+    Vectors are L2-normalized and indexed by inner product, so search
+    scores are cosine similarities. `nprobe` and `ef_search` are defaults
+    that each search can override; `search_batch` answers many queries in
+    one index call.
+
+    On disk (see `save`) the store is a base index file plus append-only
+    segments of the vectors and offset-indexed JSON metadata saved after
+    it. Loading maps the base read-only, so startup does not wait for it
+    to be read; vectors added after that go to an in-memory flat tail that
+    searches merge in, until a merge or promotion replaces the base. A
+    background merge (see `merge`) combines runs of small segments and
+    folds the vectors saved after the base into a new one. Only one
+    process saves a directory, the first to open it; stores other
+    processes (other API workers) open on it load it but keep what they
+    add in memory.
+
+    Vectors added with `upsert` are kept under an external id (an
+    incident, event or runbook id): upserting the id again replaces its
+    vector and `delete` removes it. Replaced and deleted vectors are
+    tombstoned in a bitmap, excluded from searches inside FAISS by an ID
+    selector, saved as small tombstone segments, and dropped by a
+    background compaction once they reach COMPACT_RATIO of the index.
+
+    Severity, service, tags and timestamp are indexed from each entry's
+    metadata (see `AttributeIndex`, saved as segments alongside it), so
+    searches can take a `VectorFilter`. A filter matching few entries is
+    answered by scoring them exactly, a mid-selectivity one inside FAISS
+    through an ID selector over the matches (combined with the
+    tombstones), and a broad one by over-fetching and dropping the
+    non-matches, so latency does not grow as filters narrow. Metadata is
+    saved as JSON, so it must hold plain JSON values only (timestamps as
+    ISO strings); adding anything else raises ValueError.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 384,
+        index_path: str = "./faiss_index",
+        index_type: str = "auto",
+        tiers: Optional[Dict[str, int]] = None,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        hnsw_m: int = 32,
+        pq_m: int = 48,
+        background: bool = True,
+    ):
+        if index_type != "auto" and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown vector index type: {index_type}")
+        tiers = dict(DEFAULT_TIERS if tiers is None else tiers)
+        unknown = set(tiers) - set(INDEX_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown vector index types in tiers: {', '.join(sorted(unknown))}")
+        if dimension % pq_m:
+            raise ValueError(f"pq_m ({pq_m}) must divide the dimension ({dimension})")
 
-    def __init__(self, dimension: int = 384, index_path: str = "./faiss_index"):
         self.dimension = dimension
         self.index_path = Path(index_path)
         self.index_path.mkdir(exist_ok=True)
+        self._writer_lock = claim_writer(self.index_path)
+        if self._writer_lock is None:
+            print(f"Vector store {self.index_path} is saved by another process; not saving from this one")
+        self.configured_type = index_type
+        # (minimum size, index type), in promotion order
+        if index_type == "auto":
+            self.tiers = sorted((size, name) for name, size in tiers.items())
+        else:
+            self.tiers = [(0, "flat"), (0, index_type)] if index_type != "flat" else [(0, "flat")]
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.pq_m = pq_m
+        self.background = background
+
+        # Guards the index reference, adds to it and reads of it while promoting
+        self._lock = threading.Lock()
+        self._promotion: Optional[threading.Thread] = None
+        self._generation = 0  # bumped by clear() so a running promotion is discarded
+        # Held for a whole promotion or compaction, which both rebuild the index
+        self._rebuild_lock = threading.Lock()
+
+        # External id -> position of its live vector, and a bitmap of the
+        # positions that were deleted or replaced
+        self._ids: Dict[str, int] = {}
+        self._deleted_bits = np.zeros(0, dtype=np.uint8)
+        self._deleted_count = 0
+        self._unsaved_deletes: List[int] = []
+        # Ids upserted or deleted while a compaction runs, to remap at its swap
+        self._journal: Optional[set] = None
 
         # Initialize FAISS index
         if FAISS_AVAILABLE:
-            self.index = faiss.IndexFlatL2(dimension)
+            self.index = self._build_index(self._target_type(0), 0)
         else:
             self.index = None
+        # When the index is the memory-mapped base file it is read-only, and
+        # vectors added after it go to this flat index
+        self._mapped = False
+        self._tail = None
 
-        # Store metadata for each vector
-        self.metadata: List[Dict] = []
+        # Store metadata for each vector, and the attributes filters match on
+        self.metadata = MetadataLog(self.index_path)
+        self.attributes = AttributeIndex()
+
+        # Saved state: the manifest last written, the vectors it covers and
+        # the generation they belong to. Saves and merges take _save_lock.
+        self._save_lock = threading.Lock()
+        self._merging: Optional[threading.Thread] = None
+        self._manifest: Optional[Dict] = None
+        self._saved = 0
+        self._disk_generation = 0
 
         # Load existing index if available
         self.load()
 
+    @property
+    def index_type(self) -> Optional[str]:
+        return index_type_of(self.index) if self.index is not None else None
+
+    @property
+    def writable(self) -> bool:
+        """Whether this process saves the store directory"""
+        return self._writer_lock is not None
+
+    @property
+    def unsaved(self) -> int:
+        """Vectors added and deleted since the last save"""
+        with self._lock:
+            if self.index is None:
+                return 0
+            saved, attributes = self._saved, self._attributes_saved()
+            if self._disk_generation != self._generation:
+                saved = attributes = 0
+            return self._count() - min(saved, attributes) + len(self._unsaved_deletes)
+
+    @property
+    def deleted(self) -> int:
+        """Tombstoned vectors not yet removed by compaction"""
+        return self._deleted_count
+
+    def __len__(self) -> int:
+        """Live vectors"""
+        with self._lock:
+            return (self._count() if self.index is not None else 0) - self._deleted_count
+
+    def __contains__(self, vector_id: str) -> bool:
+        return vector_id in self._ids
+
     def add_vectors(self, vectors: np.ndarray, metadata: List[Dict]):
         """Add vectors with metadata to the index"""
+        self._add(vectors, metadata, None)
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, metadata: List[Dict]):
+        """Add vectors under external ids, replacing any stored under the same ids"""
+        self._add(vectors, metadata, list(ids))
+
+    def delete(self, ids: List[str]) -> int:
+        """Remove the vectors stored under `ids`; returns how many there were"""
+        removed = 0
+        with self._lock:
+            for vector_id in ids:
+                position = self._ids.pop(vector_id, None)
+                if position is not None:
+                    self._tombstone(position)
+                    removed += 1
+            if self._journal is not None:
+                self._journal.update(ids)
+        if removed:
+            self._maybe_compact()
+        return removed
+
+    def _add(self, vectors: np.ndarray, metadata: List[Dict], ids: Optional[List[str]]):
         if not FAISS_AVAILABLE or self.index is None:
             return
 
         # Ensure vectors are float32
-        vectors = vectors.astype('float32')
+        vectors = np.array(vectors, dtype='float32').reshape(-1, self.dimension)
+        if len(metadata) != len(vectors) or (ids is not None and len(ids) != len(vectors)):
+            raise ValueError("vectors, metadata and ids must have the same length")
+        for record in metadata:
+            check_record(record)
 
         # Normalize vectors for cosine similarity
         faiss.normalize_L2(vectors)
 
         # Add to index
-        self.index.add(vectors)
-        self.metadata.extend(metadata)
+        with self._lock:
+            start = self._count()
+            if self._mapped:
+                if self._tail is None:
+                    self._tail = faiss.IndexFlatIP(self.dimension)
+                self._tail.add(vectors)
+            else:
+                self.index.add(vectors)
+            self.metadata.extend(metadata, ids)
+            self.attributes.extend(metadata)
+            self._reserve_bits(start + len(vectors))
+            if ids is not None:
+                for position, vector_id in enumerate(ids, start):
+                    replaced = self._ids.get(vector_id)
+                    if replaced is not None:
+                        self._tombstone(replaced)
+                    self._ids[vector_id] = position
+                if self._journal is not None:
+                    self._journal.update(ids)
+        self._maybe_promote()
+        if ids is not None:
+            self._maybe_compact()
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        vector_filter: Optional[VectorFilter] = None,
+    ) -> List[Dict]:
+        """Search for similar vectors.
 
-    def search(self, query_vector: np.ndarray, k: int = 5) -> List[Dict]:
-        """Search for similar vectors"""
+        Results carry their metadata plus `similarity` (cosine) and
+        `distance` (1 - similarity), best first. `nprobe` (IVF lists
+        scanned) and `ef_search` (HNSW candidate list size) trade recall
+        for latency on this query; they default to the store's settings
+        and are ignored by index types they do not apply to.
+        `vector_filter` restricts results to entries whose severity,
+        service, tags or timestamp match.
+        """
+        return self.search_batch(
+            np.asarray(query_vector).reshape(1, -1), k, nprobe, ef_search, vector_filter
+        )[0]
+
+    def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        vector_filter: Optional[VectorFilter] = None,
+    ) -> List[List[Dict]]:
+        """`search` for each row of `query_vectors`, in one index call"""
+        query_vectors = np.array(query_vectors, dtype='float32').reshape(-1, self.dimension)
         if not FAISS_AVAILABLE or self.index is None:
-            return []
+            return [[] for _ in range(len(query_vectors))]
+        faiss.normalize_L2(query_vectors)
 
-        # Ensure query is float32 and normalized
-        query_vector = query_vector.astype('float32').reshape(1, -1)
-        faiss.normalize_L2(query_vector)
+        with self._lock:
+            index, tail, metadata = self.index, self._tail, self.metadata
+            # A mapped (or compacted) base is never added to again
+            frozen = self._mapped
+            generation, offset = self._generation, index.ntotal
+            bits, deleted = self._deleted_bits, self._deleted_count
+            allowed = None
+            if vector_filter is not None and not vector_filter.empty:
+                count = self._count()
+                allowed = self.attributes.mask(vector_filter, count)
+                if deleted:
+                    allowed &= ~self._deleted_mask(count)
 
-        # Search
-        distances, indices = self.index.search(query_vector, k)
+        if allowed is not None:
+            scores, indices = self._search_filtered(
+                generation, index, frozen, tail, query_vectors, k, nprobe, ef_search, allowed, bits, deleted
+            )
+        else:
+            # Tombstones are skipped inside the index
+            selector = (
+                faiss.IDSelectorNot(faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))) if deleted else None
+            )
+            tail_selector = tail_bits = None
+            if deleted and tail is not None:
+                tail_selector, tail_bits = self._selector(~self._tail_deleted(bits, offset, tail.ntotal))
+            scores, indices = self._search_index(
+                index, frozen, tail, query_vectors, k, nprobe, ef_search, selector, tail_selector
+            )
 
-        # Return results with metadata
+        # Positions past the metadata are vectors still being added; -1 pads short result lists
+        valid = (indices >= 0) & (indices < len(metadata))
+        if deleted:
+            valid &= ~self._is_deleted(bits, indices)
+        similarities = np.clip(scores, -1.0, 1.0).tolist()
         results = []
-        for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
-                result = self.metadata[idx].copy()
-                result['distance'] = float(distances[0][i])
-                result['similarity'] = 1.0 / (1.0 + result['distance'])
-                results.append(result)
-
+        for row_ids, row_scores, row_valid in zip(indices.tolist(), similarities, valid.tolist()):
+            hits = []
+            for idx, similarity, ok in zip(row_ids, row_scores, row_valid):
+                if ok:
+                    hit = {**metadata[idx], 'similarity': similarity, 'distance': 1.0 - similarity}
+                    vector_id = metadata.id_at(idx)
+                    if vector_id is not None:
+                        hit['vector_id'] = vector_id
+                    hits.append(hit)
+            results.append(hits)
         return results
 
+    def _search_index(self, index, frozen: bool, tail, queries: np.ndarray, k: int, nprobe: Optional[int],
+                      ef_search: Optional[int], selector=None, tail_selector=None):
+        """Top-k scores and positions over the index and the tail.
+
+        FAISS indexes are not safe to search while vectors are added to
+        them, so an index that is still added to (unless `frozen`) and the
+        tail are searched under the lock; a frozen base is searched without
+        it, so long searches do not hold up adds.
+        """
+        offset = index.ntotal
+        params = self._search_params(index, nprobe, ef_search, selector)
+        with nullcontext() if frozen else self._lock:
+            scores, indices = index.search(queries, k, params=params)
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            # Index saved before inner-product scoring: squared L2 between unit vectors is 2 - 2cos
+            scores = 1.0 - scores / 2.0
+        tail_scores = None
+        if tail is not None:
+            tail_params = self._search_params(tail, None, None, tail_selector)
+            with self._lock:
+                if tail.ntotal:
+                    tail_scores, tail_indices = tail.search(queries, k, params=tail_params)
+        if tail_scores is not None:
+            scores = np.hstack([scores, tail_scores])
+            indices = np.hstack([indices, np.where(tail_indices >= 0, tail_indices + offset, -1)])
+            order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+            scores = np.take_along_axis(scores, order, axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        return scores, indices
+
+    def _search_filtered(self, generation: int, index, frozen: bool, tail, queries: np.ndarray, k: int,
+                         nprobe: Optional[int], ef_search: Optional[int], allowed: np.ndarray,
+                         bits: np.ndarray, deleted: int):
+        """`_search_index` restricted to the positions `allowed` (live, matching) marks.
+
+        Few matches are scored exactly, a broad filter on an approximate
+        index is applied to an over-fetched plain search, and anything else
+        is filtered inside the index (see FILTER_EXACT_MAX).
+        """
+        matches = np.count_nonzero(allowed)
+        if matches <= FILTER_EXACT_MAX:
+            vector_filtered_searches.labels(strategy="exact").inc()
+            return self._search_exact(generation, queries, k, np.flatnonzero(allowed))
+
+        offset = index.ntotal
+        fraction = matches / len(allowed)
+        rows = np.arange(len(queries))
+        if fraction >= POST_FILTER_FRACTION and not isinstance(index, faiss.IndexFlat):
+            vector_filtered_searches.labels(strategy="postfilter").inc()
+            fetch = math.ceil(k / fraction * POST_FILTER_OVERFETCH)
+            selector = (
+                faiss.IDSelectorNot(faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))) if deleted else None
+            )
+            found_scores, found = self._search_index(
+                index, frozen, tail, queries, fetch, nprobe, ef_search, selector
+            )
+            keep = (found >= 0) & (found < len(allowed))
+            keep[keep] = allowed[found[keep]]
+            found_scores = np.where(keep, found_scores, -np.inf)
+            order = np.argsort(-found_scores, axis=1, kind='stable')[:, :k]
+            scores = np.take_along_axis(found_scores, order, axis=1)
+            indices = np.where(np.isfinite(scores), np.take_along_axis(found, order, axis=1), -1)
+            # Queries whose neighbourhood the filter happens to exclude fall back to filtering in the index
+            rows = np.flatnonzero(keep.sum(axis=1) < k)
+            if not len(rows):
+                return scores, indices
+        else:
+            vector_filtered_searches.labels(strategy="prefilter").inc()
+            scores = np.full((len(queries), k), -np.inf, dtype='float32')
+            indices = np.full((len(queries), k), -1, dtype='int64')
+
+        scale = min(FILTER_PROBE_FACTOR / fraction, FILTER_MAX_SCALE)
+        selector, index_bits = self._selector(allowed[:offset])
+        tail_selector = tail_bits = None
+        if tail is not None:
+            tail_selector, tail_bits = self._selector(allowed[offset:offset + tail.ntotal])
+        scores[rows], indices[rows] = self._search_index(
+            index, frozen, tail, queries[rows], k,
+            math.ceil((nprobe or self.nprobe) * scale),
+            max(ef_search or self.ef_search, math.ceil(k * scale)),
+            selector, tail_selector,
+        )
+        return scores, indices
+
+    def _search_exact(self, generation: int, queries: np.ndarray, k: int, positions: np.ndarray):
+        """Top-k scores and positions among `positions`, by reading their vectors back"""
+        scores = np.full((len(queries), k), -np.inf, dtype='float32')
+        indices = np.full((len(queries), k), -1, dtype='int64')
+        vectors = self._read(generation, positions) if len(positions) else None
+        if vectors is None:
+            return scores, indices
+        similarities = queries @ vectors.T
+        found = min(k, len(positions))
+        top = np.argpartition(-similarities, found - 1, axis=1)[:, :found]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        scores[:, :found] = np.take_along_axis(top_scores, order, axis=1)
+        indices[:, :found] = positions[np.take_along_axis(top, order, axis=1)]
+        return scores, indices
+
+    def promote(self, index_type: Optional[str] = None) -> bool:
+        """Rebuild the index as `index_type` (default: the tier its size calls for).
+
+        Runs in the calling thread; returns False if the index already has
+        that type, there are too few vectors to train it, or the store was
+        cleared meanwhile.
+        """
+        with self._rebuild_lock:
+            return self._promote(index_type)
+
+    def _promote(self, index_type: Optional[str]) -> bool:
+        with self._lock:
+            generation, current, count = self._generation, self.index_type, self._count()
+        index_type = index_type or self._target_type(count)
+        if index_type == current or not self._trainable(index_type, count):
+            return False
+
+        index = self._build_index(index_type, count)
+        if not index.is_trained:
+            sample = self._read(generation, self._training_ids(index, count))
+            if sample is None:
+                return False
+            index.train(sample)
+        copied = 0
+        while True:
+            with self._lock:
+                if self._generation != generation:
+                    return False
+                total = self._count()
+                if copied == total:
+                    # Caught up with adds made meanwhile: swap under the lock
+                    self.index, self._tail, self._mapped = index, None, False
+                    break
+                end = min(copied + PROMOTE_CHUNK, total)
+                chunk = self._reconstruct(copied, end)
+            index.add(chunk)
+            copied = end
+
+        vector_index_promotions.labels(index_type=index_type).inc()
+        print(f"Vector index promoted to {index_type} ({copied} vectors)")
+        return True
+
+    def wait_for_promotion(self, timeout: Optional[float] = None):
+        """Block until a background promotion (and any it chains into) finishes"""
+        if self._promotion is not None:
+            self._promotion.join(timeout)
+
+    def wait_for_merge(self, timeout: Optional[float] = None):
+        """Block until a background segment merge (and any it chains into) finishes"""
+        if self._merging is not None:
+            self._merging.join(timeout)
+
     def save(self):
-        """Save index and metadata to disk"""
-        if not FAISS_AVAILABLE or self.index is None:
+        """Persist the vectors and metadata added since the last save.
+
+        They are written as one new vector segment and one metadata segment
+        and a new manifest is swapped in, so the cost follows what was
+        added rather than the corpus size. Merging segments afterwards runs
+        in the background (see `merge`).
+        """
+        if not FAISS_AVAILABLE or self.index is None or not self.writable:
             return
+        with self._save_lock:
+            self._save_locked()
+        self._maybe_merge()
 
-        # Save FAISS index
-        index_file = self.index_path / "index.faiss"
-        faiss.write_index(self.index, str(index_file))
+    def merge(self) -> bool:
+        """Do one step of background maintenance on the saved segments.
 
-        # Save metadata
-        metadata_file = self.index_path / "metadata.pkl"
-        with open(metadata_file, 'wb') as f:
-            pickle.dump(self.metadata, f)
+        Compacts the index if enough of it is deleted; otherwise rewrites
+        the base index once the vectors saved after it are a large enough
+        share of it (or the index was promoted since), or merges a trailing
+        run of small vector, metadata or tombstone segments. Runs in the
+        calling thread; returns False if nothing was due.
+        """
+        if not FAISS_AVAILABLE or not self.writable:
+            return False
+        if self._compaction_due():
+            return self.compact()
+        with self._save_lock:
+            manifest = self._manifest
+            with self._lock:
+                if manifest is None or self._disk_generation != self._generation:
+                    return False
+                mapped, live_type = self._mapped, self.index_type
+            base = manifest["base"]
+            base_count = base["count"] if base else 0
+            base_type = base["type"] if base else self._target_type(0)
+            if (self._saved - base_count >= max(MIN_BASE_MERGE_VECTORS, BASE_MERGE_RATIO * base_count)
+                    or (not mapped and live_type != base_type)):
+                return self._rewrite_base()
+            for kind in ("vectors", "metadata", "deleted", "attributes"):
+                first = merge_run([segment["count"] for segment in manifest.get(kind, [])])
+                if first < len(manifest.get(kind, [])):
+                    return self._merge_segments(kind, first)
+            return False
 
     def load(self):
-        """Load index and metadata from disk"""
+        """Open the saved store: the base index memory-mapped, the vector
+        segments after it read into memory and metadata mapped by segment"""
+        if not FAISS_AVAILABLE:
+            return
+
+        try:
+            if self.writable:
+                self._migrate_legacy()
+            with directory_lock(self.index_path):
+                manifest = read_manifest(self.index_path)
+                if manifest is None:
+                    return
+                if manifest["dimension"] != self.dimension:
+                    raise ValueError(f"saved dimension {manifest['dimension']} differs from {self.dimension}")
+                metadata = MetadataLog(self.index_path, manifest["metadata"])
+                base = manifest["base"]
+                if base:
+                    index = faiss.read_index(str(self.index_path / base["file"]), faiss.IO_FLAG_MMAP_IFC)
+                    if isinstance(index, faiss.IndexIVF):
+                        index.make_direct_map()
+                    tail = faiss.IndexFlatIP(self.dimension)
+                else:
+                    index = self._build_index(self._target_type(0), 0)
+                    tail = None
+                target = tail if tail is not None else index
+                for segment in manifest["vectors"]:
+                    rows = read_vectors(self.index_path / segment["file"])
+                    rows = rows[max((base["count"] if base else 0) - segment["start"], 0):]
+                    for start in range(0, len(rows), PROMOTE_CHUNK):
+                        target.add(np.ascontiguousarray(rows[start:start + PROMOTE_CHUNK]))
+
+                bits = np.zeros((len(metadata) + 7) // 8, dtype=np.uint8)
+                for segment in manifest.get("deleted", []):
+                    self._set_bits(bits, np.load(self.index_path / segment["file"]))
+                ids = {
+                    vector_id: position
+                    for position, vector_id in enumerate(metadata.ids())
+                    if vector_id is not None and not (bits[position >> 3] >> (position & 7)) & 1
+                }
+                attributes = AttributeIndex()
+                for segment in manifest.get("attributes", []):
+                    attributes.append_columns(read_columns(self.index_path / segment["file"]))
+                if len(attributes) < len(metadata):
+                    # Saved before attributes were indexed: read them from the metadata once
+                    attributes.extend(metadata[position] for position in range(len(attributes), len(metadata)))
+
+            with self._lock:
+                self.index, self._tail, self._mapped = index, tail, base is not None
+                self.metadata, self.attributes = metadata, attributes
+                self._ids, self._deleted_bits = ids, bits
+                self._deleted_count = int(np.unpackbits(bits).sum())
+                self._manifest, self._saved, self._disk_generation = manifest, len(metadata), self._generation
+            print(f"Loaded vector store with {len(self.metadata)} entries ({self.index_type} index, "
+                  f"{len(manifest['vectors'])} vector segments)")
+        except Exception as e:
+            print(f"Error loading vector store: {e}")
+        self._maybe_promote()
+
+    def clear(self):
+        """Clear all data from the index; the next save drops the saved files"""
+        with self._lock:
+            self._generation += 1
+            if FAISS_AVAILABLE:
+                self.index = self._build_index(self._target_type(0), 0)
+            self._tail, self._mapped = None, False
+            self.metadata = MetadataLog(self.index_path)
+            self.attributes = AttributeIndex()
+            self._ids = {}
+            self._deleted_bits = np.zeros(0, dtype=np.uint8)
+            self._deleted_count = 0
+            self._unsaved_deletes = []
+
+    def compact(self) -> bool:
+        """Rebuild the index without its deleted and replaced vectors.
+
+        The live vectors are copied into a new index of the current type
+        (trained again if it needs training) while the current one keeps
+        serving, and are renumbered; vectors added meanwhile are carried
+        over and ids upserted or deleted meanwhile are remapped before the
+        swap. A saved store is rewritten as a new base index and a single
+        metadata segment. Runs in the calling thread; returns False if
+        nothing was deleted or the store was cleared meanwhile.
+        """
         if not FAISS_AVAILABLE:
+            return False
+        with self._rebuild_lock, self._save_lock:
+            with self._lock:
+                generation, metadata, total = self._generation, self.metadata, self._count()
+                if not self._deleted_count:
+                    return False
+                live = np.flatnonzero(~self._deleted_mask(total))
+                ids = dict(self._ids)
+                columns = self.attributes.columns(0, total)
+                current, mapped = self.index_type, self._mapped
+                self._journal = set()
+            try:
+                return self._compact(generation, metadata, columns, total, live, ids, current, mapped)
+            finally:
+                with self._lock:
+                    self._journal = None
+
+    def _compact(self, generation: int, metadata: MetadataLog, columns: Dict[str, np.ndarray], total: int,
+                 live: np.ndarray, ids: Dict[str, int], current: str, mapped: bool) -> bool:
+        index_type = current if self._trainable(current, len(live)) else self._target_type(len(live))
+        index = self._build_index(index_type, len(live))
+        if not index.is_trained:
+            sample = self._read(generation, live[self._training_ids(index, len(live))])
+            if sample is None:
+                return False
+            index.train(sample)
+        for start in range(0, len(live), PROMOTE_CHUNK):
+            chunk = self._read(generation, live[start:start + PROMOTE_CHUNK])
+            if chunk is None:
+                return False
+            index.add(chunk)
+
+        # New position of every position below `total`, -1 for removed ones
+        mapping = np.full(total, -1, dtype=np.int64)
+        mapping[live] = np.arange(len(live))
+        new_ids = {vector_id: int(mapping[position]) for vector_id, position in ids.items()}
+        columns = AttributeIndex.select(columns, live)
+
+        manifest = None
+        with self._lock:
+            persisted = self.writable and self._manifest is not None and self._disk_generation == generation
+        if persisted:
+            seq = self._manifest["seq"] + 1
+            base_file = segment_name("base", seq) + ".faiss"
+            faiss.write_index(index, str(self.index_path / f"{base_file}.tmp"))
+            with open(self.index_path / f"{base_file}.tmp", "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(self.index_path / f"{base_file}.tmp", self.index_path / base_file)
+            manifest = {
+                "dimension": self.dimension,
+                "seq": seq,
+                "base": {"file": base_file, "count": len(live), "type": index_type},
+                "vectors": [],
+                "metadata": [metadata.write_selected(segment_name("meta", seq), live)] if len(live) else [],
+                "deleted": [],
+                "attributes": [],
+            }
+            if len(live):
+                attributes_file = segment_name("attrs", seq) + ".npz"
+                write_columns(self.index_path / attributes_file, columns)
+                manifest["attributes"] = [{"file": attributes_file, "start": 0, "count": len(live)}]
+            compacted = MetadataLog(self.index_path, manifest["metadata"])
+        else:
+            compacted = MetadataLog(self.index_path, pending=metadata.select(live))
+        attributes = AttributeIndex.from_columns(columns)
+
+        tail = None
+        if manifest is not None and mapped:
+            # Keep serving a saved store from the mapped file; vectors added
+            # meanwhile go to a fresh tail at the swap
+            index = faiss.read_index(str(self.index_path / base_file), faiss.IO_FLAG_MMAP_IFC)
+            if isinstance(index, faiss.IndexIVF):
+                index.make_direct_map()
+            tail = faiss.IndexFlatIP(self.dimension)
+        else:
+            copied = total
+            while True:
+                with self._lock:
+                    if self._generation != generation:
+                        return False
+                    now = self._count()
+                    if copied == now:
+                        break
+                    end = min(copied + PROMOTE_CHUNK, now)
+                    chunk = self._reconstruct(copied, end)
+                index.add(chunk)
+                copied = end
+
+        if manifest is not None:
+            write_manifest(self.index_path, manifest)
+        with self._lock:
+            if self._generation != generation:
+                return False
+            # Vectors added meanwhile follow the live ones in order
+            now = self._count()
+            if tail is not None and now > total:
+                tail.add(self._reconstruct(total, now))
+            elif tail is None and now > index.ntotal - len(live) + total:
+                index.add(self._reconstruct(index.ntotal - len(live) + total, now))
+            if now > total:
+                records, added_ids = metadata.unflushed(total, now)
+                compacted.extend(records, added_ids)
+                attributes.extend(records)
+
+            def renumber(position: int) -> int:
+                return int(mapping[position]) if position < total else len(live) + position - total
+
+            for vector_id in self._journal:
+                position = self._ids.get(vector_id)
+                if position is None:
+                    new_ids.pop(vector_id, None)
+                else:
+                    new_ids[vector_id] = renumber(position)
+            # Tombstones set since the snapshot, on vectors that were kept
+            still_deleted = np.flatnonzero(self._deleted_mask(now))
+            renumbered = np.array([renumber(position) for position in still_deleted.tolist()], dtype=np.int64)
+            renumbered = renumbered[renumbered >= 0]
+
+            self.index, self._tail, self._mapped = index, tail, tail is not None
+            self.metadata, self.attributes = compacted, attributes
+            self._ids = new_ids
+            self._deleted_bits = np.zeros(0, dtype=np.uint8)
+            self._reserve_bits(len(live) + now - total)
+            self._set_bits(self._deleted_bits, renumbered)
+            self._deleted_count = len(renumbered)
+            self._unsaved_deletes = renumbered.tolist()
+            if manifest is not None:
+                self._manifest, self._saved = manifest, len(live)
+            else:
+                self._manifest, self._saved = None, 0
+
+        vector_segment_merges.labels(kind="compaction").inc()
+        print(f"Vector index compacted: {total - len(live)} deleted vectors removed, {len(live)} kept")
+        return True
+
+    def _tombstone(self, position: int):
+        """Mark a position deleted (lock held)"""
+        byte, bit = position >> 3, 1 << (position & 7)
+        if not self._deleted_bits[byte] & bit:
+            self._deleted_bits[byte] |= bit
+            self._deleted_count += 1
+            self._unsaved_deletes.append(position)
+
+    def _reserve_bits(self, count: int):
+        """Grow the tombstone bitmap to cover `count` positions (lock held).
+
+        Grows by doubling into a new array, so a search holding the old one
+        keeps a consistent (if slightly stale) view.
+        """
+        needed = (count + 7) // 8
+        if needed > len(self._deleted_bits):
+            bits = np.zeros(max(needed, 2 * len(self._deleted_bits)), dtype=np.uint8)
+            bits[:len(self._deleted_bits)] = self._deleted_bits
+            self._deleted_bits = bits
+
+    def _deleted_mask(self, count: int) -> np.ndarray:
+        """Tombstones of positions 0..count as booleans (lock held)"""
+        return np.unpackbits(self._deleted_bits, bitorder='little')[:count].astype(bool)
+
+    @staticmethod
+    def _set_bits(bits: np.ndarray, positions: np.ndarray):
+        positions = np.asarray(positions, dtype=np.int64)
+        np.bitwise_or.at(bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+
+    @staticmethod
+    def _is_deleted(bits: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Which of `positions` (-1 and past the bitmap count as live) are tombstoned"""
+        byte = positions >> 3
+        inside = (positions >= 0) & (byte < len(bits))
+        flags = np.zeros(positions.shape, dtype=bool)
+        flags[inside] = (bits[byte[inside]] >> (positions[inside] & 7)) & 1 == 1
+        return flags
+
+    @staticmethod
+    def _tail_deleted(bits: np.ndarray, offset: int, count: int) -> np.ndarray:
+        """Tombstones of positions offset..offset+count as booleans"""
+        return np.unpackbits(bits[offset >> 3:], bitorder='little')[offset & 7:(offset & 7) + count].astype(bool)
+
+    @staticmethod
+    def _selector(allowed: np.ndarray):
+        """An ID selector for the positions `allowed` marks, and the bitmap it reads (keep it alive)"""
+        packed = np.packbits(allowed, bitorder='little') if len(allowed) else np.zeros(1, dtype=np.uint8)
+        return faiss.IDSelectorBitmap(len(packed), faiss.swig_ptr(packed)), packed
+
+    def _attributes_saved(self) -> int:
+        """Entries whose attributes are saved (lock held)"""
+        segments = self._manifest.get("attributes", []) if self._manifest else []
+        return segments[-1]["start"] + segments[-1]["count"] if segments else 0
+
+    def _compaction_due(self) -> bool:
+        with self._lock:
+            if self.index is None:
+                return False
+            return self._deleted_count >= max(MIN_COMPACT_DELETED, COMPACT_RATIO * self._count())
+
+    def _maybe_compact(self):
+        if self._compaction_due():
+            self._maybe_merge()
+
+    def _count(self) -> int:
+        """Vectors in the index and its tail (lock held)"""
+        return self.index.ntotal + (self._tail.ntotal if self._tail is not None else 0)
+
+    def _reconstruct(self, start: int, end: int) -> np.ndarray:
+        """Vectors at positions start..end across the index and its tail (lock held)"""
+        split = self.index.ntotal
+        parts = []
+        if start < split:
+            parts.append(self.index.reconstruct_n(start, min(end, split) - start))
+        if end > split:
+            first = max(start, split)
+            parts.append(self._tail.reconstruct_n(first - split, end - first))
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _chunks(self, generation: int, start: int, end: int) -> Iterator[Optional[np.ndarray]]:
+        """Vectors start..end read in chunks under the lock; None once cleared"""
+        for chunk_start in range(start, end, PROMOTE_CHUNK):
+            with self._lock:
+                if self._generation != generation:
+                    yield None
+                    return
+                chunk = self._reconstruct(chunk_start, min(chunk_start + PROMOTE_CHUNK, end))
+            yield chunk
+
+    def _save_locked(self) -> bool:
+        """`save` with _save_lock held; False if the store was cleared meanwhile"""
+        with self._lock:
+            generation, metadata = self._generation, self.metadata
+            reset = self._manifest is None or self._disk_generation != generation
+            if reset:
+                seq = self._manifest["seq"] if self._manifest else 0
+                self._manifest = {
+                    "dimension": self.dimension, "seq": seq, "base": None,
+                    "vectors": [], "metadata": [], "deleted": [], "attributes": [],
+                }
+                self._saved, self._disk_generation = 0, generation
+            start, end = self._saved, self._count()
+            deletes = list(self._unsaved_deletes)
+            covered = self._attributes_saved()
+        if start == end and covered == end and not deletes and not reset:
+            return True
+
+        manifest = dict(self._manifest)
+        if end > start or covered < end or deletes:
+            seq = manifest["seq"] = manifest["seq"] + 1
+        if end > start:
+            file = segment_name("vectors", seq) + ".npy"
+            if not write_vectors(self.index_path / file, end - start, self.dimension,
+                                 self._chunks(generation, start, end)):
+                return False
+            manifest["vectors"] = manifest["vectors"] + [{"file": file, "start": start, "count": end - start}]
+            manifest["metadata"] = manifest["metadata"] + [metadata.flush(segment_name("meta", seq), end)]
+        if deletes:
+            file = segment_name("deleted", seq) + ".npy"
+            write_positions(self.index_path / file, np.array(deletes))
+            manifest["deleted"] = manifest.get("deleted", []) + [{"file": file, "count": len(deletes)}]
+        if covered < end:
+            with self._lock:
+                if self._generation != generation:
+                    return False
+                columns = self.attributes.columns(covered, end)
+            file = segment_name("attrs", seq) + ".npz"
+            write_columns(self.index_path / file, columns)
+            manifest["attributes"] = manifest.get("attributes", []) + [
+                {"file": file, "start": covered, "count": end - covered}
+            ]
+
+        with self._lock:
+            if self._generation != generation:
+                return False
+        write_manifest(self.index_path, manifest)
+        with self._lock:
+            if self._generation != generation:
+                return False
+            if manifest["metadata"]:
+                metadata.adopt(manifest["metadata"])
+            self._manifest, self._saved = manifest, end
+            del self._unsaved_deletes[:len(deletes)]
+        return True
+
+    def _rewrite_base(self) -> bool:
+        """Write every saved vector to a new base index file (_save_lock held).
+
+        An in-memory index is copied under the lock and written as it is; a
+        mapped base is read back whole, the saved vector segments are added
+        to it and the store then maps the new file instead.
+        """
+        with self._lock:
+            generation, mapped = self._generation, self._mapped
+            snapshot = None if mapped else faiss.clone_index(self.index)
+        if snapshot is not None:
+            # The base must not cover vectors whose metadata is unsaved
+            if not self._save_locked():
+                return False
+            index = snapshot
+        else:
+            base = self._manifest["base"]
+            index = faiss.read_index(str(self.index_path / base["file"]))
+            for segment in self._manifest["vectors"]:
+                rows = read_vectors(self.index_path / segment["file"])[max(base["count"] - segment["start"], 0):]
+                for start in range(0, len(rows), PROMOTE_CHUNK):
+                    index.add(np.ascontiguousarray(rows[start:start + PROMOTE_CHUNK]))
+
+        count = index.ntotal
+        seq = self._manifest["seq"] + 1
+        file = segment_name("base", seq) + ".faiss"
+        faiss.write_index(index, str(self.index_path / f"{file}.tmp"))
+        with open(self.index_path / f"{file}.tmp", "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(self.index_path / f"{file}.tmp", self.index_path / file)
+        index_type = index_type_of(index)
+        del index, snapshot
+
+        manifest = {
+            **self._manifest,
+            "seq": seq,
+            "base": {"file": file, "count": count, "type": index_type},
+            "vectors": [s for s in self._manifest["vectors"] if s["start"] + s["count"] > count],
+        }
+        with self._lock:
+            if self._generation != generation:
+                return False
+        write_manifest(self.index_path, manifest)
+        self._manifest = manifest
+        vector_segment_merges.labels(kind="base").inc()
+
+        if mapped:
+            index = faiss.read_index(str(self.index_path / file), faiss.IO_FLAG_MMAP_IFC)
+            if isinstance(index, faiss.IndexIVF):
+                index.make_direct_map()
+            with self._lock:
+                if self._generation == generation and self._mapped:
+                    # Vectors past the new base stay in a (shorter) tail
+                    tail = faiss.IndexFlatIP(self.dimension)
+                    total = self._count()
+                    if total > count:
+                        tail.add(self._reconstruct(count, total))
+                    self.index, self._tail = index, tail
+        return True
+
+    def _merge_segments(self, kind: str, first: int) -> bool:
+        """Replace the `kind` segments from `first` on with one (_save_lock held)"""
+        with self._lock:
+            generation, metadata = self._generation, self.metadata
+        seq = self._manifest["seq"] + 1
+        segments = self._manifest.get(kind, [])
+        if kind == "vectors":
+            merged = merge_vectors(self.index_path, segments[first:], segment_name("vectors", seq) + ".npy",
+                                   self.dimension)
+        elif kind == "deleted":
+            merged = merge_positions(self.index_path, segments[first:], segment_name("deleted", seq) + ".npy")
+        elif kind == "attributes":
+            start, end = segments[first]["start"], segments[-1]["start"] + segments[-1]["count"]
+            with self._lock:
+                if self._generation != generation:
+                    return False
+                columns = self.attributes.columns(start, end)
+            merged = {"file": segment_name("attrs", seq) + ".npz", "start": start, "count": end - start}
+            write_columns(self.index_path / merged["file"], columns)
+        else:
+            merged = metadata.merge(first, segment_name("meta", seq))
+        manifest = {**self._manifest, "seq": seq, kind: segments[:first] + [merged]}
+
+        with self._lock:
+            if self._generation != generation:
+                return False
+        write_manifest(self.index_path, manifest)
+        with self._lock:
+            if self._generation != generation:
+                return False
+            if kind == "metadata":
+                metadata.adopt(manifest["metadata"])
+            self._manifest = manifest
+        vector_segment_merges.labels(kind=kind).inc()
+        return True
+
+    def _maybe_merge(self):
+        if self._merging is not None and self._merging.is_alive():
+            return
+        if not self.background:
+            self._merge_loop()
             return
+        self._merging = threading.Thread(target=self._merge_loop, name="vector-merge", daemon=True)
+        self._merging.start()
 
+    def _merge_loop(self):
+        try:
+            while self.merge():
+                pass
+        except Exception as e:
+            print(f"Vector segment merge error: {e}")
+
+    def _migrate_legacy(self):
+        """Convert the index.faiss + metadata.pkl pair older versions saved"""
         index_file = self.index_path / "index.faiss"
         metadata_file = self.index_path / "metadata.pkl"
+        if (self.index_path / MANIFEST_NAME).exists() or not (index_file.exists() and metadata_file.exists()):
+            return
 
-        if index_file.exists() and metadata_file.exists():
-            try:
-                # Load FAISS index
-                self.index = faiss.read_index(str(index_file))
+        with open(metadata_file, 'rb') as f:
+            records = pickle.load(f)
+        index = faiss.read_index(str(index_file), faiss.IO_FLAG_MMAP_IFC)
+        base = {"file": segment_name("base", 1) + ".faiss", "count": index.ntotal, "type": index_type_of(index)}
+        del index
+        meta_file = segment_name("meta", 2)
+        MetadataSegment.write(self.index_path, meta_file, iter([encode_rows(records)]), [])
+        os.link(index_file, self.index_path / base["file"])
+        write_manifest(self.index_path, {
+            "dimension": self.dimension,
+            "seq": 2,
+            "base": base,
+            "vectors": [],
+            "metadata": [{"file": meta_file, "start": 0, "count": len(records)}],
+            "deleted": [],
+            "attributes": [],
+        })
+        index_file.unlink()
+        metadata_file.unlink()
+        print(f"Converted saved vector store to segments ({len(records)} entries)")
 
-                # Load metadata
-                with open(metadata_file, 'rb') as f:
-                    self.metadata = pickle.load(f)
+    def _target_type(self, count: int) -> str:
+        """The last tier the corpus size reaches and that can be trained on it"""
+        target = self.tiers[0][1]
+        for size, index_type in self.tiers:
+            if count >= size and self._trainable(index_type, count):
+                target = index_type
+        return target
 
-                print(f"Loaded vector store with {len(self.metadata)} entries")
-            except Exception as e:
-                print(f"Error loading vector store: {e}")
+    def _trainable(self, index_type: str, count: int) -> bool:
+        if index_type == "ivf_flat":
+            return count >= MIN_IVF_LISTS * MIN_POINTS_PER_LIST
+        if index_type == "ivf_pq":
+            return count >= max(MIN_IVF_LISTS * MIN_POINTS_PER_LIST, MIN_PQ_TRAIN_POINTS)
+        return True
 
-    def clear(self):
-        """Clear all data from the index"""
-        if FAISS_AVAILABLE:
-            self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+    def _maybe_promote(self):
+        """Start promoting if the corpus reached a later tier than the current index"""
+        if self.index is None or (self._promotion is not None and self._promotion.is_alive()):
+            return
+        ranks = [index_type for _, index_type in self.tiers]
+        with self._lock:
+            current, count = self.index_type, self._count()
+        target = self._target_type(count)
+        if current in ranks and ranks.index(target) <= ranks.index(current):
+            return
+        if current not in ranks and target == "flat":
+            return
+        if not self.background:
+            self.promote(target)
+            return
+        self._promotion = threading.Thread(target=self._promote_loop, name="vector-promotion", daemon=True)
+        self._promotion.start()
+
+    def _promote_loop(self):
+        try:
+            while self.promote():
+                pass
+        except Exception as e:
+            print(f"Vector index promotion error: {e}")
+
+    def _build_index(self, index_type: str, count: int):
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = self.ef_search
+            return index
+        if index_type in ("ivf_flat", "ivf_pq"):
+            nlist = int(min(MAX_IVF_LISTS, max(MIN_IVF_LISTS, 4 * math.sqrt(count)), count // MIN_POINTS_PER_LIST))
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            if index_type == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFPQ(
+                    quantizer, self.dimension, nlist, self.pq_m, PQ_BITS, faiss.METRIC_INNER_PRODUCT
+                )
+            index.own_fields = True
+            quantizer.this.disown()
+            index.nprobe = self.nprobe
+            if index_type == "ivf_flat":
+                # Lets a later promotion read its vectors back by position
+                index.set_direct_map_type(faiss.DirectMap.Array)
+                return index
+            refine = faiss.IndexScalarQuantizer(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+            refined = faiss.IndexRefine(index, refine)
+            refined.k_factor = REFINE_K_FACTOR
+            refined.own_fields = True
+            refined.own_refine_index = True
+            index.this.disown()
+            refine.this.disown()
+            return refined
+        return faiss.IndexFlatIP(self.dimension)
+
+    def _training_ids(self, index, count: int) -> np.ndarray:
+        sample = count
+        if isinstance(index, faiss.IndexRefine):
+            index = faiss.downcast_index(index.base_index)
+        if isinstance(index, faiss.IndexIVF):
+            sample = min(count, max(index.nlist * TRAIN_POINTS_PER_LIST, MIN_PQ_TRAIN_POINTS))
+        if sample >= count:
+            return np.arange(count, dtype='int64')
+        return np.sort(np.random.default_rng(0).choice(count, sample, replace=False)).astype('int64')
+
+    def _read(self, generation: int, ids: np.ndarray) -> Optional[np.ndarray]:
+        """Vectors at `ids`, read in chunks under the lock; None once cleared"""
+        parts = []
+        for start in range(0, len(ids), PROMOTE_CHUNK):
+            with self._lock:
+                if self._generation != generation:
+                    return None
+                chunk = ids[start:start + PROMOTE_CHUNK]
+                split = self.index.ntotal
+                if chunk[0] < split:
+                    parts.append(self.index.reconstruct_batch(chunk[chunk < split]))
+                if chunk[-1] >= split:
+                    parts.append(self._tail.reconstruct_batch(chunk[chunk >= split] - split))
+        return np.concatenate(parts)
+
+    def _search_params(self, index, nprobe: Optional[int], ef_search: Optional[int], selector=None):
+        if isinstance(index, faiss.IndexRefine):
+            return faiss.IndexRefineSearchParameters(
+                k_factor=REFINE_K_FACTOR,
+                base_index_params=self._search_params(
+                    faiss.downcast_index(index.base_index), nprobe, ef_search, selector
+                ),
+            )
+        if isinstance(index, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF(nprobe=nprobe or self.nprobe)
+        elif isinstance(index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or self.ef_search)
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if selector is not None:
+            params.sel = selector
+        return params
+
+
+def create_vector_store(settings) -> VectorStore:
+    """Build the vector store from application settings"""
+    return VectorStore(
+        index_path=settings.vector_db_path,
+        index_type=settings.vector_index_type,
+        tiers=settings.vector_index_tiers,
+        nprobe=settings.vector_nprobe,
+        ef_search=settings.vector_ef_search,
+        hnsw_m=settings.vector_hnsw_m,
+        pq_m=settings.vector_pq_m,
+    )
 
 
 # Global vector store instance
-vector_store = VectorStore()
+vector_store = create_vector_store(get_settings())
@@ -0,0 +1,219 @@
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+# Record layout: payload length, crc32 of (op, payload), op code, payload
+RECORD_HEADER = struct.Struct("<IIB")
+
+# Record op codes. Every record is a full upsert of one model, so replay is
+# idempotent and a snapshot is just the same records for the current state.
+OP_INCIDENT = 1
+OP_EVENT = 2
+OP_TIMELINE = 3
+OP_ACTION = 4
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def encode_record(op: int, payload: bytes) -> bytes:
+    """Frame a payload as a length-prefixed, checksummed record"""
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload, op), op) + payload
+
+
+def decode_records(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    """Yield (op, payload) records from an in-memory buffer of records"""
+    offset = 0
+    view = memoryview(data)
+    while offset + RECORD_HEADER.size <= len(data):
+        length, crc, op = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        payload = bytes(view[offset:offset + length])
+        if len(payload) < length or zlib.crc32(payload, op) != crc:
+            raise ValueError("Corrupt record")
+        offset += length
+        yield op, payload
+
+
+def read_records(path: Path, truncate: bool = False) -> Iterator[Tuple[int, bytes]]:
+    """Yield (op, payload) records from a log or snapshot file.
+
+    Reading stops at the first torn or corrupt record. With `truncate`, the
+    file is cut back to the last good record so new appends follow it.
+    """
+    good_offset = 0
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            length, crc, op = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload, op) != crc:
+                break
+            good_offset += RECORD_HEADER.size + length
+            yield op, payload
+
+    if truncate and good_offset < path.stat().st_size:
+        print(f"Truncating torn write-ahead log tail in {path.name} at byte {good_offset}")
+        with open(path, "r+b") as f:
+            f.truncate(good_offset)
+
+
+class WriteAheadLog:
+    """Append-only log of storage mutations with group commit and snapshots
+
+    Records are buffered in memory and written out by a background flusher
+    every `flush_interval` seconds (or once `buffer_bytes` accumulate), so
+    many writes share one write/fsync. The fsync policy is one of:
+
+    - "always": write and fsync on every append
+    - "interval": fsync on each group commit
+    - "never": write on each group commit and leave fsync to the OS
+
+    The log is split into numbered segments. A snapshot with number N holds
+    the state produced by all segments before N, which are then deleted.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: str = "interval",
+        flush_interval: float = 0.05,
+        buffer_bytes: int = 1024 * 1024,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.buffer_bytes = buffer_bytes
+
+        # Bytes appended since the last snapshot, used to trigger compaction
+        self.bytes_since_snapshot = 0
+
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._file = None
+        self._segment = 0
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def _files(self, prefix: str) -> List[Tuple[int, Path]]:
+        files = []
+        for path in self.directory.glob(f"{prefix}-*"):
+            try:
+                files.append((int(path.stem.split("-")[1]), path))
+            except (IndexError, ValueError):
+                continue
+        return sorted(files)
+
+    def _segment_path(self, seq: int) -> Path:
+        return self.directory / f"wal-{seq:08d}.log"
+
+    def recover(self) -> Iterator[Tuple[int, bytes]]:
+        """Yield the records of the newest snapshot, then the WAL tail after it"""
+        base = 0
+        snapshots = self._files("snapshot")
+        if snapshots:
+            base, path = snapshots[-1]
+            yield from read_records(path)
+
+        for seq, path in self._files("wal"):
+            if seq >= base:
+                self.bytes_since_snapshot += path.stat().st_size
+                yield from read_records(path, truncate=True)
+
+    def open(self):
+        """Open the newest segment for appending and start the flusher"""
+        seqs = [seq for seq, _ in self._files("wal") + self._files("snapshot")]
+        self._segment = max(seqs, default=1)
+        self._file = open(self._segment_path(self._segment), "ab")
+
+        if self.fsync != "always":
+            self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+            self._flusher.start()
+
+    def append(self, op: int, payload: bytes):
+        """Append a record; durable according to the fsync policy"""
+        record = encode_record(op, payload)
+        with self._lock:
+            self._buffer += record
+            self.bytes_since_snapshot += len(record)
+            if self.fsync == "always" or len(self._buffer) >= self.buffer_bytes:
+                self._flush_locked()
+
+    def flush(self):
+        """Write out buffered records now"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer or self._file is None:
+            return
+        self._file.write(self._buffer)
+        self._buffer.clear()
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def rotate(self) -> int:
+        """Start a new segment and return its number.
+
+        A snapshot of the state at the moment of rotation should then be
+        written with `write_snapshot` under the returned number.
+        """
+        with self._lock:
+            self._flush_locked()
+            self._file.close()
+            self._segment += 1
+            self._file = open(self._segment_path(self._segment), "ab")
+            self.bytes_since_snapshot = 0
+            return self._segment
+
+    def write_snapshot(self, seq: int, records: Iterable[Tuple[int, bytes]]):
+        """Atomically write snapshot `seq` and drop the files it supersedes"""
+        path = self.directory / f"snapshot-{seq:08d}.snap"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            batch = bytearray()
+            for op, payload in records:
+                batch += encode_record(op, payload)
+                if len(batch) >= self.buffer_bytes:
+                    f.write(batch)
+                    batch.clear()
+            f.write(batch)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._fsync_directory()
+
+        for old_seq, old_path in self._files("wal") + self._files("snapshot"):
+            if old_seq < seq:
+                old_path.unlink(missing_ok=True)
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Stop the flusher and write out anything still buffered"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
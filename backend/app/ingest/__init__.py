@@ -0,0 +1 @@
+"""Ingest pipeline between the API handlers and storage"""
@@ -0,0 +1,164 @@
+import zlib
+from typing import Any, Iterator, List, Optional
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+# Decoded bytes produced per decompression step. gzip stops exactly there;
+# zstd is fed compressed input in small slices instead, which bounds how
+# far a single step of a decompression bomb can get past the size limit.
+DECODE_PIECE_BYTES = 64 * 1024
+ZSTD_INPUT_SLICE_BYTES = 1024
+
+DECODE_ERRORS = (zlib.error, ValueError) + ((zstandard.ZstdError,) if ZSTD_AVAILABLE else ())
+
+
+class UnsupportedMediaType(Exception):
+    """The body's content type or encoding cannot be decoded here"""
+
+
+class BodyTooLarge(Exception):
+    """The body decodes to more bytes than allowed"""
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    """Whether a Content-Type header names MessagePack"""
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    if media_type not in MSGPACK_TYPES:
+        return False
+    if not MSGPACK_AVAILABLE:
+        raise UnsupportedMediaType("MessagePack bodies require the msgpack package")
+    return True
+
+
+def unpack(data: bytes) -> Any:
+    """Decode one MessagePack document; raises ValueError if it is malformed"""
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except (msgpack.UnpackException, ValueError) as e:
+        raise ValueError(f"Invalid MessagePack body: {e}") from None
+
+
+class MsgpackStream:
+    """Incremental decoder of concatenated MessagePack documents"""
+
+    def __init__(self, max_item_bytes: int):
+        self.max_item_bytes = max_item_bytes
+        self._unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max_item_bytes + DECODE_PIECE_BYTES)
+        self._fed = 0
+        self._consumed = 0  # bytes up to the end of the last complete document
+
+    def feed(self, data: bytes) -> Iterator[Any]:
+        """Yield the documents completed by `data`; raises ValueError on corrupt input"""
+        for start in range(0, len(data), DECODE_PIECE_BYTES):
+            try:
+                piece = data[start:start + DECODE_PIECE_BYTES]
+                self._unpacker.feed(piece)
+                self._fed += len(piece)
+                for document in self._unpacker:
+                    self._consumed = self._unpacker.tell()
+                    yield document
+            except msgpack.BufferFull:
+                raise ValueError(f"Item exceeds {self.max_item_bytes} bytes") from None
+            except (msgpack.UnpackException, ValueError) as e:
+                raise ValueError(f"Invalid MessagePack data: {e}") from None
+
+    def finish(self):
+        """Raise ValueError if the stream ended inside a document"""
+        if self._consumed < self._fed:
+            raise ValueError("Truncated MessagePack data")
+
+
+class BodyDecoder:
+    """Incremental Content-Encoding decoder with an optional decoded size cap
+
+    Supports identity, gzip (and zlib-wrapped deflate) and, when the
+    zstandard package is installed, zstd. Concatenated gzip members and
+    zstd frames are decoded in sequence.
+    """
+
+    def __init__(self, content_encoding: Optional[str], max_bytes: Optional[int] = None):
+        self.encoding = (content_encoding or "identity").strip().lower()
+        if self.encoding in ("gzip", "x-gzip", "deflate"):
+            self._new = lambda: zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)  # gzip or zlib header
+        elif self.encoding == "zstd":
+            if not ZSTD_AVAILABLE:
+                raise UnsupportedMediaType("zstd bodies require the zstandard package")
+            self._new = zstandard.ZstdDecompressor().decompressobj
+        elif self.encoding == "identity":
+            self._new = None
+        else:
+            raise UnsupportedMediaType(f"Unsupported Content-Encoding: {self.encoding}")
+
+        self.max_bytes = max_bytes
+        self.decoded = 0
+        self._obj = self._new() if self._new else None
+        self._started = False
+
+    def decode(self, chunk: bytes) -> Iterator[bytes]:
+        """Yield the decoded bytes of one body chunk"""
+        if not chunk:
+            return
+        if self._obj is None:
+            yield self._count(chunk)
+            return
+        try:
+            if self.encoding == "zstd":
+                for start in range(0, len(chunk), ZSTD_INPUT_SLICE_BYTES):
+                    yield from self._decode_zstd(chunk[start:start + ZSTD_INPUT_SLICE_BYTES])
+            else:
+                yield from self._decode_zlib(chunk)
+        except DECODE_ERRORS as e:
+            raise ValueError(f"Corrupt {self.encoding} body: {e}") from None
+
+    def _decode_zlib(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            if self._obj.eof:
+                self._obj = self._new()
+            self._started = True
+            out = self._obj.decompress(data, DECODE_PIECE_BYTES)
+            data = self._obj.unconsumed_tail or (self._obj.unused_data if self._obj.eof else b"")
+            if out:
+                yield self._count(out)
+
+    def _decode_zstd(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            if self._obj.eof:
+                self._obj = self._new()
+            self._started = True
+            out = self._obj.decompress(data)
+            data = self._obj.unused_data if self._obj.eof else b""
+            if out:
+                yield self._count(out)
+
+    def _count(self, data: bytes) -> bytes:
+        self.decoded += len(data)
+        if self.max_bytes is not None and self.decoded > self.max_bytes:
+            raise BodyTooLarge(f"Body exceeds {self.max_bytes} bytes once decoded")
+        return data
+
+    def finish(self):
+        """Raise ValueError if the body ended inside a compressed member"""
+        if self._obj is not None and self._started and not self._obj.eof:
+            raise ValueError(f"Truncated {self.encoding} body")
+
+
+async def read_body(request, max_bytes: Optional[int] = None) -> bytes:
+    """Read a whole request body, undoing its Content-Encoding"""
+    decoder = BodyDecoder(request.headers.get("content-encoding"), max_bytes)
+    parts: List[bytes] = []
+    async for chunk in request.stream():
+        parts.extend(decoder.decode(chunk))
+    decoder.finish()
+    return b"".join(parts)
@@ -0,0 +1,111 @@
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Any, List, Tuple, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from ..ai.correlation import event_correlator
+from ..ai.detector import anomaly_detector, open_incident
+from ..models import Event, EventCreate
+from ..db.storage import storage, run_storage
+from ..observability.metrics import events_ingested
+from .pipeline import ingest_pipeline
+from .sampler import event_sampler
+
+# Builds a whole list of events in one call into pydantic-core
+events_adapter = TypeAdapter(List[Event])
+# Validates a whole batch of request events in one call
+event_creates_adapter = TypeAdapter(List[EventCreate])
+
+
+def sample_events(events_data: List[Union[EventCreate, Event]]) -> List[Union[EventCreate, Event]]:
+    """Events kept by the adaptive sampler (all of them when it is disabled)"""
+    if event_sampler is None:
+        return events_data
+    return event_sampler.sample(events_data)
+
+
+async def attach_incidents(events: List[Event]) -> Tuple[List[Event], int]:
+    """Feed events to anomaly detection and keep those with an incident.
+
+    Opens an incident for each anomaly detected, then feeds the events to
+    correlation. Returns the events to store, including earlier pending
+    events the anomalies attached, and the number of events left without
+    an incident (not stored).
+    """
+    anomalies = anomaly_detector.observe(events) if anomaly_detector is not None else []
+    backlog = []
+    if anomalies:
+        batch = {id(event) for event in events}
+        for anomaly in anomalies:
+            await open_incident(anomaly)
+            backlog.extend(event for event in anomaly.events if id(event) not in batch)
+    if event_correlator is not None:
+        event_correlator.observe(events)
+    attached = [event for event in events if event.incident_id is not None]
+    return backlog + attached, len(events) - len(attached)
+
+
+def build_events(events_data: List[EventCreate], timestamp: datetime) -> List[Event]:
+    """Events for validated request models, built in a single pass"""
+    return events_adapter.validate_python([
+        {**event_data.__dict__, "id": event_id, "timestamp": timestamp}
+        for event_data, event_id in zip(events_data, uuid4_strings(len(events_data)))
+    ])
+
+
+def events_from_objects(objects: Any, timestamp: datetime) -> List[Event]:
+    """Events validated straight from a decoded list of request objects.
+
+    Skips the intermediate `EventCreate` models: each object gets its
+    server-assigned id and timestamp (in place) and the whole list is
+    validated as events in one call. Raises ValidationError like
+    validating request models would.
+    """
+    if isinstance(objects, list):
+        for item, event_id in zip(objects, uuid4_strings(len(objects))):
+            if isinstance(item, dict):
+                item["id"] = event_id
+                item["timestamp"] = timestamp
+                item.pop("embedding", None)
+    try:
+        return events_adapter.validate_python(objects)
+    except ValidationError:
+        if not isinstance(objects, list):
+            raise
+        # Report errors against the request objects as sent
+        for item in objects:
+            if isinstance(item, dict):
+                item.pop("id", None)
+                item.pop("timestamp", None)
+        event_creates_adapter.validate_python(objects)
+        raise
+
+
+def uuid4_strings(count: int) -> List[str]:
+    """`count` random UUID4 strings from one read of the OS random source"""
+    raw = bytearray(os.urandom(16 * count))
+    raw[6::16] = bytes((b & 0x0F) | 0x40 for b in raw[6::16])  # version 4
+    raw[8::16] = bytes((b & 0x3F) | 0x80 for b in raw[8::16])  # RFC 4122 variant
+    h = raw.hex()
+    return [f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+            for i in range(0, 32 * count, 32)]
+
+
+async def store_events(events: List[Event], wait: bool = False) -> int:
+    """Store events in one bulk insert and count them, one metric update per label set.
+
+    With the ingest pipeline running, events are queued for its writers
+    instead; a full queue raises IngestQueueFull (and a batch larger than
+    the queue IngestBatchTooLarge), or with `wait` waits until there is room.
+    """
+    if not ingest_pipeline.running:
+        await run_storage(storage.create_events, events)
+    elif wait:
+        await ingest_pipeline.put(events)
+    else:
+        ingest_pipeline.submit(events)
+    for (event_type, source), count in Counter((e.event_type.value, e.source) for e in events).items():
+        events_ingested.labels(event_type=event_type, source=source).inc(count)
+    return len(events)
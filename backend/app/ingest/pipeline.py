@@ -0,0 +1,151 @@
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from ..config import get_settings
+from ..models import Event
+from ..observability.metrics import (
+    ingest_batch_size,
+    ingest_commit_latency,
+    ingest_dropped,
+    ingest_queue_depth,
+    ingest_rejected,
+)
+
+# Weight of the newest batch in the drain rate estimate used for Retry-After
+DRAIN_RATE_SMOOTHING = 0.2
+
+
+class IngestQueueFull(Exception):
+    """The ingest queue has no room; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Ingest queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class IngestBatchTooLarge(Exception):
+    """The batch holds more events than the ingest queue, so it can never fit"""
+
+
+class IngestPipeline:
+    """Bounded queue of events drained into storage by batching writer tasks
+
+    Handlers enqueue events and return without waiting for storage. Each
+    writer takes events off the queue until it has `batch_size` of them or
+    `flush_interval` seconds have passed since the first, then writes them
+    with one call. When the queue is full, `submit` raises IngestQueueFull
+    so the caller can shed load, while `put` waits for room. A batch larger
+    than the whole queue raises IngestBatchTooLarge instead, since retrying
+    it could never succeed.
+    """
+
+    def __init__(self, max_events: int, batch_size: int, flush_interval: float, writers: int = 1):
+        self.max_events = max_events
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writers = writers
+
+        self.queue: Optional[asyncio.Queue] = None
+        self._write: Optional[Callable[[List[Event]], Awaitable]] = None
+        self._tasks: List[asyncio.Task] = []
+        self._drain_rate = 0.0  # events/s
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, write: Callable[[List[Event]], Awaitable]):
+        """Start the writer tasks; `write` stores one batch of events"""
+        self.queue = asyncio.Queue(maxsize=self.max_events)
+        self._write = write
+        self._tasks = [asyncio.create_task(self._writer()) for _ in range(self.writers)]
+        ingest_queue_depth.set_function(self.queue.qsize)
+
+    async def close(self, timeout: float = 10.0):
+        """Write out queued events, then stop the writers"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            ingest_dropped.labels(reason="shutdown").inc(self.queue.qsize())
+            print(f"Ingest pipeline closed with {self.queue.qsize()} events still queued")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def submit(self, events: List[Event]):
+        """Enqueue all of `events` or, if they do not fit, none of them"""
+        if len(events) > self.max_events:
+            ingest_rejected.inc(len(events))
+            raise IngestBatchTooLarge(
+                f"Batch of {len(events)} events exceeds the ingest queue size of {self.max_events}"
+            )
+        if self.max_events - self.queue.qsize() < len(events):
+            ingest_rejected.inc(len(events))
+            raise IngestQueueFull(self.retry_after())
+        enqueued_at = time.monotonic()
+        for event in events:
+            self.queue.put_nowait((event, enqueued_at))
+
+    async def put(self, events: List[Event]):
+        """Enqueue `events`, waiting for room as needed"""
+        enqueued_at = time.monotonic()
+        for event in events:
+            await self.queue.put((event, enqueued_at))
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog is expected to drain"""
+        return max(1, math.ceil(self.queue.qsize() / max(self._drain_rate, 1.0)))
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            started = time.monotonic()
+            try:
+                await self._write([event for event, _ in batch])
+            except Exception as e:
+                ingest_dropped.labels(reason="write_error").inc(len(batch))
+                print(f"Ingest write error, dropped {len(batch)} events: {e}")
+            finally:
+                committed = time.monotonic()
+                rate = len(batch) / max(committed - started, 1e-6)
+                self._drain_rate += DRAIN_RATE_SMOOTHING * (rate - self._drain_rate)
+                ingest_batch_size.observe(len(batch))
+                # Events from one request share an enqueue time; observe once per request
+                for enqueued_at in {enqueued_at for _, enqueued_at in batch}:
+                    ingest_commit_latency.observe(committed - enqueued_at)
+                for _ in batch:
+                    self.queue.task_done()
+
+
+def create_pipeline(settings) -> IngestPipeline:
+    """Build the ingest pipeline from application settings"""
+    return IngestPipeline(
+        max_events=settings.ingest_queue_size,
+        batch_size=settings.ingest_batch_size,
+        flush_interval=settings.ingest_flush_interval_ms / 1000,
+        writers=settings.ingest_writers,
+    )
+
+
+# Global pipeline; started on application startup when enabled
+ingest_pipeline = create_pipeline(get_settings())
@@ -0,0 +1,110 @@
+import time
+from collections import Counter, OrderedDict
+from typing import List, Optional, Tuple, Union
+
+from ..config import get_settings
+from ..models import Event, EventCreate, EventType
+from ..observability.metrics import events_sampled_out
+
+# Events at these levels, and all alerts, are never sampled out
+ALWAYS_KEEP_LEVELS = frozenset({"error", "critical", "fatal"})
+
+# Tokens an event costs by level: during a storm debug lines are thinned
+# out faster than info lines, and warnings slower
+LEVEL_COSTS = {"debug": 2.0, "info": 1.0, "warning": 0.5, "warn": 0.5}
+
+# Metadata key on kept events: events of the same incident and source
+# dropped since the previous kept one
+SAMPLED_OUT_KEY = "sampled_out"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "dropped", "sampling")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.dropped = 0
+        # Dropping events since the bucket was last full
+        self.sampling = False
+
+
+class AdaptiveSampler:
+    """Token-bucket sampling of low-severity events per (incident, source)
+
+    Each incident and source pair gets a bucket refilled at `rate` tokens
+    per second up to `burst`. Below that rate every event is kept; above it
+    low-severity events are kept only while tokens last, so the share kept
+    shrinks as the storm grows. Error, critical and alert events are always
+    kept. The next kept event of a pair records how many were dropped
+    before it in `metadata["sampled_out"]`, so totals can be reconstructed.
+    A warning is logged when a pair starts being sampled, and dropped events
+    are counted in `events_sampled_out_total`. At most `max_keys` buckets
+    are kept; the least recently used one makes room for a new pair.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def sample(self, events: List[Union[EventCreate, Event]]) -> List[Union[EventCreate, Event]]:
+        """The events to keep, in order"""
+        now = time.monotonic()
+        kept = []
+        dropped = Counter()
+        for event in events:
+            if self._keep(event, now):
+                kept.append(event)
+            else:
+                dropped[event.level] += 1
+        for level, count in dropped.items():
+            events_sampled_out.labels(level=level).inc(count)
+        return kept
+
+    def _keep(self, event: Union[EventCreate, Event], now: float) -> bool:
+        key = (event.incident_id, event.source)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            if bucket.tokens >= self.burst:
+                bucket.sampling = False
+
+        level = event.level.lower()
+        if level not in ALWAYS_KEEP_LEVELS and event.event_type != EventType.ALERT:
+            cost = LEVEL_COSTS.get(level, 1.0)
+            if bucket.tokens < cost:
+                if not bucket.sampling:
+                    bucket.sampling = True
+                    print(f"Sampling {level} events of incident {event.incident_id} from {event.source}: "
+                          f"over {self.rate} events/s")
+                bucket.dropped += 1
+                return False
+            bucket.tokens -= cost
+
+        if bucket.dropped:
+            # Add to a count the sender already set; overwrite anything else
+            previous = event.metadata.get(SAMPLED_OUT_KEY)
+            if not isinstance(previous, int) or isinstance(previous, bool):
+                previous = 0
+            event.metadata[SAMPLED_OUT_KEY] = previous + bucket.dropped
+            bucket.dropped = 0
+        return True
+
+
+def create_sampler(settings) -> Optional[AdaptiveSampler]:
+    """Build the event sampler from application settings, or None if disabled"""
+    if not settings.sampling_enabled:
+        return None
+    return AdaptiveSampler(rate=settings.sampling_rate_per_second, burst=settings.sampling_burst)
+
+
+# Global sampler used by the ingestion endpoints
+event_sampler = create_sampler(get_settings())
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import re
+import socket
+from collections import Counter
+from datetime import datetime
+from fnmatch import translate
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic import ValidationError
+
+from ..config import get_settings
+from ..models import EventCreate
+from ..db.storage import storage, run_storage
+from ..observability.metrics import syslog_lines
+from ..ai.detector import anomaly_detector
+from .events import attach_incidents, build_events, event_creates_adapter, sample_events, store_events
+
+# Syslog severity (PRI & 7) to event level: emerg, alert, crit, err,
+# warning, notice, info, debug
+SEVERITY_LEVELS = ("critical", "critical", "critical", "error", "warning", "info", "info", "debug")
+
+# Syslog facility (PRI >> 3) names
+FACILITIES = (
+    "kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news",
+    "uucp", "cron", "authpriv", "ftp", "ntp", "audit", "alert", "clock",
+    "local0", "local1", "local2", "local3", "local4", "local5", "local6", "local7",
+)
+
+# <PRI>1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID STRUCTURED-DATA [MSG]
+RFC5424_LINE = re.compile(
+    r"<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\\]|\\.)*\])+) ?(.*)", re.DOTALL
+)
+# <PRI>Mmm dd hh:mm:ss HOSTNAME TAG[PID]: MSG
+RFC3164_LINE = re.compile(
+    r"<(\d{1,3})>([A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d) (\S+) ([^\s:\[]+)(?:\[([^\]]*)\])?: ?(.*)", re.DOTALL
+)
+# Anything else with a priority prefix
+PRI_PREFIX = re.compile(r"<(\d{1,3})>(.*)", re.DOTALL)
+
+# Fields routing rules can match on
+ROUTE_FIELDS = ("host", "service", "level", "facility")
+
+# Longest accepted line on a TCP connection; the rest of a longer line is dropped
+MAX_LINE_BYTES = 64 * 1024
+# Requested UDP socket receive buffer, so bursts survive a flush (the
+# kernel may cap it at net.core.rmem_max)
+UDP_RECEIVE_BUFFER_BYTES = 8 * 1024 * 1024
+# Distinct (host, service, level, facility) route decisions remembered
+MAX_ROUTE_CACHE = 100_000
+
+
+def parse_line(line: str, peer: str) -> Optional[Dict[str, Any]]:
+    """Map one RFC5424, RFC3164 or JSON line onto `EventCreate` fields.
+
+    JSON lines are event objects as accepted by the REST endpoints and may
+    omit `incident_id` to be routed like syslog lines. Events are stamped
+    with their arrival time like REST events, so the sender's timestamp is
+    not kept. Lines without a hostname are attributed to the sending
+    address. Returns None for lines that cannot be used, including JSON
+    lines whose `incident_id` is not a string.
+    """
+    if line.startswith("{"):
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(event, dict) or not isinstance(event.get("incident_id"), (str, type(None))):
+            return None
+        event.setdefault("event_type", "log")
+        event.setdefault("source", peer)
+        if not isinstance(event.setdefault("metadata", {}), dict):
+            return None
+        return event
+
+    metadata: Dict[str, Any] = {}
+    host = peer
+    if (match := RFC5424_LINE.match(line)) is not None:
+        pri, _, hostname, app, procid, msgid, structured_data, message = match.groups()
+        for key, value in (("service", app), ("procid", procid), ("msgid", msgid),
+                           ("structured_data", structured_data)):
+            if value != "-":
+                metadata[key] = value
+        if hostname != "-":
+            host = hostname
+        message = message.lstrip("\ufeff")
+    elif (match := RFC3164_LINE.match(line)) is not None:
+        pri, _, host, tag, procid, message = match.groups()
+        metadata["service"] = tag
+        if procid:
+            metadata["procid"] = procid
+    elif (match := PRI_PREFIX.match(line)) is not None:
+        pri, message = match.groups()
+    else:
+        pri, message = None, line
+
+    level = "info"
+    if pri is not None:
+        pri = int(pri)
+        if pri > 191:
+            return None
+        level = SEVERITY_LEVELS[pri & 7]
+        metadata["facility"] = FACILITIES[pri >> 3]
+
+    return {"event_type": "log", "message": message, "level": level, "source": host, "metadata": metadata}
+
+
+class SyslogRouter:
+    """Routes lines to incidents by the first matching rule
+
+    Each rule names an `incident_id` and glob patterns for any of the
+    route fields (host, service, level, facility); a rule matches when all
+    its patterns do. Lines no rule matches go to `default_incident_id`;
+    without one they are left to anomaly detection, or dropped when it is
+    disabled.
+    """
+
+    def __init__(self, rules: List[Dict[str, str]], default_incident_id: str = ""):
+        self.rules = []
+        for rule in rules:
+            rule = dict(rule)
+            incident_id = rule.pop("incident_id", None)
+            if not incident_id:
+                raise ValueError(f"Syslog route without incident_id: {rule}")
+            unknown = set(rule) - set(ROUTE_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown syslog route fields: {', '.join(sorted(unknown))}")
+            self.rules.append((incident_id, [
+                (ROUTE_FIELDS.index(field), re.compile(translate(pattern)).match)
+                for field, pattern in rule.items()
+            ]))
+        self.default_incident_id = default_incident_id or None
+        self._cache: Dict[tuple, Optional[str]] = {}
+
+    def route(self, host: str, service: Optional[str], level: str, facility: Optional[str]) -> Optional[str]:
+        key = (host, service or "", level, facility or "")
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        incident_id = self.default_incident_id
+        for rule_incident_id, matchers in self.rules:
+            if all(match(key[field]) for field, match in matchers):
+                incident_id = rule_incident_id
+                break
+        if len(self._cache) >= MAX_ROUTE_CACHE:
+            self._cache.clear()
+        self._cache[key] = incident_id
+        return incident_id
+
+
+class SyslogDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "SyslogListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr):
+        # A datagram may carry several newline-separated lines
+        for line in data.split(b"\n"):
+            self.listener.feed(line, addr[0])
+
+
+class SyslogListener:
+    """UDP and TCP listener feeding syslog and JSON lines into storage
+
+    Lines are parsed and routed as they arrive and buffered; the buffer is
+    flushed every `flush_interval` seconds or once it holds `batch_size`
+    lines, through the same sampling, bulk event building and storage (or
+    ingest queue) path as the batch endpoint. TCP uses newline framing and
+    is slowed down while a flush is in progress; UDP lines arriving while
+    `max_buffered` are already waiting are dropped.
+    """
+
+    def __init__(
+        self,
+        router: SyslogRouter,
+        host: str = "0.0.0.0",
+        udp_port: int = 5514,
+        tcp_port: int = 5514,
+        batch_size: int = 1000,
+        flush_interval: float = 0.05,
+        max_buffered: int = 100_000,
+    ):
+        self.router = router
+        self.host = host
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._counts: Counter = Counter()
+        self._known_incidents: Set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._transport = None
+        self._server = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Bind the UDP and TCP sockets (a port of 0 disables one) and start flushing"""
+        loop = asyncio.get_running_loop()
+        # Lets every worker of a multi-worker deployment bind the same ports
+        reuse_port = hasattr(socket, "SO_REUSEPORT")
+        if self.udp_port:
+            self._transport, _ = await loop.create_datagram_endpoint(
+                lambda: SyslogDatagramProtocol(self),
+                local_addr=(self.host, self.udp_port),
+                reuse_port=reuse_port,
+            )
+            sock = self._transport.get_extra_info("socket")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER_BYTES)
+        if self.tcp_port:
+            self._server = await asyncio.start_server(
+                self._handle_tcp, self.host, self.tcp_port, reuse_port=reuse_port,
+            )
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop listening and store what is still buffered"""
+        if self._transport is not None:
+            self._transport.close()
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+        if self._task is not None:
+            self._task.cancel()
+        await self.flush()
+
+    def feed(self, line: bytes, peer: str):
+        """Parse, route and buffer one received line"""
+        text = line.decode("utf-8", "replace").rstrip("\r\x00")
+        if not text.strip():
+            return
+        if len(self._buffer) >= self.max_buffered:
+            self._counts["dropped"] += 1
+            return
+
+        event = parse_line(text, peer)
+        if event is None:
+            self._counts["invalid"] += 1
+            return
+        if not event.get("incident_id"):
+            service, facility = (event["metadata"].get(key) for key in ("service", "facility"))
+            incident_id = self.router.route(
+                str(event["source"]), None if service is None else str(service),
+                str(event.get("level", "info")), None if facility is None else str(facility),
+            )
+            if incident_id is None and anomaly_detector is None:
+                self._counts["unrouted"] += 1
+                return
+            event["incident_id"] = incident_id
+
+        self._buffer.append(event)
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        peer = peer[0] if peer else "unknown"
+        self._clients.add(writer)
+        buffer = bytearray()
+        oversized = False
+        try:
+            while chunk := await reader.read(65536):
+                buffer += chunk
+                start = 0
+                while (end := buffer.find(b"\n", start)) != -1:
+                    if oversized or end - start > MAX_LINE_BYTES:
+                        self._counts["invalid"] += 1
+                        oversized = False
+                    else:
+                        self.feed(buffer[start:end], peer)
+                    start = end + 1
+                del buffer[:start]
+                if len(buffer) > MAX_LINE_BYTES:
+                    # Drop the rest of an oversized line as it streams in
+                    oversized = True
+                    buffer.clear()
+                if len(self._buffer) >= self.batch_size:
+                    await self.flush()
+            if buffer and not oversized:
+                self.feed(buffer, peer)
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Syslog flush error: {e}")
+
+    async def flush(self):
+        """Store the buffered lines now"""
+        async with self._flush_lock:
+            batch, self._buffer = self._buffer, []
+            counts, self._counts = self._counts, Counter()
+            try:
+                if batch:
+                    await self._store(batch, counts)
+            finally:
+                for result, count in counts.items():
+                    syslog_lines.labels(result=result).inc(count)
+
+    async def _store(self, batch: List[Dict[str, Any]], counts: Counter):
+        # Incidents are never deleted, so only unconfirmed ids are looked up;
+        # unrouted lines (None) go to anomaly detection
+        for incident_id in {event["incident_id"] for event in batch} - self._known_incidents - {None}:
+            if await run_storage(storage.get_incident, incident_id) is not None:
+                self._known_incidents.add(incident_id)
+        routed = [
+            event for event in batch
+            if event["incident_id"] is None or event["incident_id"] in self._known_incidents
+        ]
+        counts["unknown_incident"] += len(batch) - len(routed)
+
+        try:
+            events_data = event_creates_adapter.validate_python(routed)
+        except ValidationError:
+            events_data = []
+            for event in routed:
+                try:
+                    events_data.append(EventCreate.model_validate(event))
+                except ValidationError:
+                    counts["invalid"] += 1
+
+        attached, unattached = await attach_incidents(build_events(events_data, datetime.utcnow()))
+        counts["unattached"] += unattached
+        kept = sample_events(attached)
+        counts["sampled"] += len(attached) - len(kept)
+        if kept:
+            counts["accepted"] += await store_events(kept, wait=True)
+
+
+def create_listener(settings) -> Optional[SyslogListener]:
+    """Build the syslog listener from application settings, or None if disabled"""
+    if not settings.syslog_enabled:
+        return None
+    return SyslogListener(
+        SyslogRouter(settings.syslog_routes, settings.syslog_default_incident_id),
+        host=settings.syslog_host,
+        udp_port=settings.syslog_udp_port,
+        tcp_port=settings.syslog_tcp_port,
+        batch_size=settings.syslog_batch_size,
+        flush_interval=settings.syslog_flush_interval_ms / 1000,
+    )
+
+
+# Global listener started by the application when syslog ingestion is enabled
+syslog_listener = create_listener(get_settings())
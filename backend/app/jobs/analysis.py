@@ -3,7 +3,7 @@ from typing import Dict, Optional
 from datetime import datetime
 
 from ..ai.commander import ai_commander
-from ..db.storage import storage
+from ..db.storage import storage, run_storage
 from ..models import TimelineEntry, TimelineEntryType
 
 
@@ -27,7 +27,7 @@ class JobQueue:
                 description=f"AI Commander completed deep analysis",
                 actor="Background Job"
             )
-            storage.add_timeline_entry(timeline_entry)
+            await run_storage(storage.add_timeline_entry, timeline_entry)
 
             return analysis
 
@@ -37,15 +37,15 @@ class JobQueue:
 
     async def generate_postmortem(self, incident_id: str) -> Optional[str]:
         """Generate incident postmortem"""
-        incident = storage.get_incident(incident_id)
+        incident = await run_storage(storage.get_incident, incident_id)
         if not incident:
             return None
 
         # Get timeline
-        timeline = storage.get_timeline(incident_id)
+        timeline = await run_storage(storage.get_timeline, incident_id)
 
         # Get actions
-        actions = storage.list_actions(incident_id)
+        actions = await run_storage(storage.list_actions, incident_id)
 
         # Build postmortem
         postmortem = f"""
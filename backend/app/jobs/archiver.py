@@ -0,0 +1,45 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from ..db.storage import InMemoryStorage
+
+# Most incidents moved into one segment per pass
+ARCHIVE_BATCH_SIZE = 500
+
+
+async def archive_incidents(storage: InMemoryStorage, max_age: timedelta) -> int:
+    """Move resolved and closed incidents idle for `max_age` to the archive.
+    Returns the number of incidents archived."""
+    if storage.archive is None:
+        return 0
+
+    # Capture models on the event loop, serialize and write in a thread,
+    # then drop from memory only the incidents that did not change meanwhile
+    batch = []
+    for incident_id in storage.archivable_incidents(datetime.utcnow() - max_age, ARCHIVE_BATCH_SIZE):
+        batch.append((
+            storage.get_incident(incident_id),
+            storage.incident_models(incident_id),
+            storage.incident_version(incident_id),
+        ))
+    if not batch:
+        return 0
+
+    await asyncio.to_thread(
+        storage.archive.write_segment,
+        [(incident, storage.snapshot_records(models)) for incident, models, _ in batch],
+    )
+    return sum(storage.drop_archived(incident.id, version) for incident, _, version in batch)
+
+
+async def archive_loop(storage: InMemoryStorage, max_age_hours: float, interval_seconds: int):
+    """Archive idle incidents every `interval_seconds`"""
+    max_age = timedelta(hours=max_age_hours)
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            archived = await archive_incidents(storage, max_age)
+            if archived:
+                print(f"Archived {archived} incidents")
+        except Exception as e:
+            print(f"Archive error: {e}")
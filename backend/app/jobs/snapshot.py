@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from ..db.storage import InMemoryStorage
+
+# How often the loop checks whether a snapshot is due
+CHECK_INTERVAL_SECONDS = 5
+
+
+async def take_snapshot(storage: InMemoryStorage):
+    """Compact the write-ahead log into a snapshot of the current state"""
+    wal = storage.wal
+    if wal is None:
+        return
+
+    # Rotation and model capture happen without yielding to the event loop,
+    # so the snapshot matches exactly the segments it replaces
+    seq = wal.rotate()
+    models = storage.snapshot_models()
+    await asyncio.to_thread(wal.write_snapshot, seq, storage.snapshot_records(models))
+
+
+async def snapshot_loop(storage: InMemoryStorage, interval_seconds: int, max_wal_bytes: int):
+    """Take a snapshot every `interval_seconds`, or sooner once the log
+    has grown by `max_wal_bytes` since the last one"""
+    last_snapshot = time.monotonic()
+    while True:
+        await asyncio.sleep(CHECK_INTERVAL_SECONDS)
+        if storage.wal is None:
+            continue
+
+        due = time.monotonic() - last_snapshot >= interval_seconds
+        if due or storage.wal.bytes_since_snapshot >= max_wal_bytes:
+            try:
+                await take_snapshot(storage)
+            except Exception as e:
+                print(f"Snapshot error: {e}")
+            last_snapshot = time.monotonic()
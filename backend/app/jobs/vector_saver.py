@@ -0,0 +1,15 @@
+import asyncio
+
+from ..db.vector_store import VectorStore
+
+
+async def vector_save_loop(store: VectorStore, interval_seconds: int):
+    """Save vectors added to the store every `interval_seconds`"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if not store.unsaved:
+            continue
+        try:
+            await asyncio.to_thread(store.save)
+        except Exception as e:
+            print(f"Vector store save error: {e}")
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -6,7 +7,17 @@ from slowapi.errors import RateLimitExceeded
 from prometheus_client import CONTENT_TYPE_LATEST
 
 from .config import get_settings
-from .api import incidents, ingestion, websocket
+from .api import correlation, incidents, ingestion, search, websocket
+from .db.storage import storage, run_storage, InMemoryStorage
+from .db.remote import ensure_server
+from .db.wal import WriteAheadLog
+from .db.archive import SegmentArchive
+from .db.vector_store import vector_store
+from .jobs.snapshot import snapshot_loop
+from .jobs.archiver import archive_loop
+from .jobs.vector_saver import vector_save_loop
+from .ingest.pipeline import ingest_pipeline
+from .ingest.syslog import syslog_listener
 from .observability.metrics import get_metrics
 
 # Initialize settings
@@ -35,14 +46,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
 app.include_router(incidents.router)
 app.include_router(ingestion.router)
+app.include_router(search.router)
+app.include_router(correlation.router)
 app.include_router(websocket.router)
 
 
+@app.on_event("startup")
+async def startup():
+    """Recover durable state before serving requests"""
+    if settings.storage_backend == "remote":
+        if settings.storage_server_autostart:
+            await asyncio.to_thread(ensure_server, settings.storage_socket_path)
+        print("Storage is shared through the storage server; vectors, WebSocket rooms, jobs, "
+              "anomaly detection and correlation stay per worker")
+
+    if settings.wal_enabled and isinstance(storage, InMemoryStorage):
+        wal = WriteAheadLog(
+            settings.data_dir,
+            fsync=settings.wal_fsync,
+            flush_interval=settings.wal_flush_interval_ms / 1000,
+        )
+        storage.attach_wal(wal)
+        app.state.snapshot_task = asyncio.create_task(snapshot_loop(
+            storage,
+            interval_seconds=settings.snapshot_interval_seconds,
+            max_wal_bytes=settings.snapshot_wal_mb * 1024 * 1024,
+        ))
+
+    if settings.archive_enabled and isinstance(storage, InMemoryStorage):
+        storage.attach_archive(
+            SegmentArchive(settings.archive_dir, compression=settings.archive_compression),
+            cache_size=settings.archive_cache_size,
+        )
+        app.state.archive_task = asyncio.create_task(archive_loop(
+            storage,
+            max_age_hours=settings.archive_after_hours,
+            interval_seconds=settings.archive_interval_seconds,
+        ))
+
+    # Only the worker that claimed the vector index directory saves it
+    if settings.vector_save_interval_seconds > 0 and vector_store.writable:
+        app.state.vector_save_task = asyncio.create_task(vector_save_loop(
+            vector_store, interval_seconds=settings.vector_save_interval_seconds,
+        ))
+
+    if settings.ingest_queue_enabled:
+        ingest_pipeline.start(lambda events: run_storage(storage.create_events, events))
+
+    if syslog_listener is not None:
+        await syslog_listener.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush durable state"""
+    if syslog_listener is not None:
+        await syslog_listener.close()
+    await ingest_pipeline.close()
+    if getattr(storage, "wal", None) is not None:
+        app.state.snapshot_task.cancel()
+        storage.wal.close()
+    if getattr(storage, "archive", None) is not None:
+        app.state.archive_task.cancel()
+    if settings.vector_save_interval_seconds > 0 and vector_store.writable:
+        app.state.vector_save_task.cancel()
+    if vector_store.unsaved:
+        await asyncio.to_thread(vector_store.save)
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,7 +1,19 @@
 from .incident import Incident, IncidentStatus, IncidentSeverity, IncidentCreate
-from .event import Event, EventType, EventCreate
+from .event import (
+    Event,
+    EventType,
+    EventCreate,
+    EventHistogram,
+    EventHistogramBucket,
+    EventSearchHit,
+    EventSearchResult,
+    IngestError,
+    IngestResult,
+    BatchIngestResult,
+)
 from .timeline import TimelineEntry, TimelineEntryType
 from .action import Action, ActionStatus, ActionCreate
+from .correlation import CorrelationProposal, ProposalKind
 
 __all__ = [
     "Incident",
@@ -11,9 +23,18 @@ __all__ = [
     "Event",
     "EventType",
     "EventCreate",
+    "EventHistogram",
+    "EventHistogramBucket",
+    "EventSearchHit",
+    "EventSearchResult",
+    "IngestError",
+    "IngestResult",
+    "BatchIngestResult",
     "TimelineEntry",
     "TimelineEntryType",
     "Action",
     "ActionStatus",
     "ActionCreate",
+    "CorrelationProposal",
+    "ProposalKind",
 ]
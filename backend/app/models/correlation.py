@@ -0,0 +1,25 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class ProposalKind(str, Enum):
+    """What accepting a correlation proposal does"""
+    MERGE = "merge"  # fold incident_ids into incident_id
+    ATTACH = "attach"  # route the source/service's unattached events to incident_id
+
+
+class CorrelationProposal(BaseModel):
+    """Incidents or unattached events that look like one problem"""
+    id: str
+    kind: ProposalKind
+    incident_id: str = Field(..., description="Incident that is kept (merge) or attached to (attach)")
+    incident_ids: List[str] = Field(default_factory=list, description="Incidents merged into incident_id")
+    source: Optional[str] = Field(default=None, description="Source of the unattached events (attach)")
+    service: Optional[str] = Field(default=None, description="metadata.service of the unattached events (attach)")
+    score: float = Field(..., description="Strongest evidence linking the events, see correlation_min_score")
+    evidence: List[str] = Field(default_factory=list, description="Shared metadata values and message shapes")
+    events: int = Field(default=0, description="Correlated events seen")
+    first_seen: datetime
+    last_seen: datetime
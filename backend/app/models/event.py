@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 import uuid
 
@@ -16,7 +16,9 @@ class EventType(str, Enum):
 
 class EventCreate(BaseModel):
     """Request model for creating an event"""
-    incident_id: str
+    incident_id: Optional[str] = Field(
+        default=None, description="Omit to let anomaly detection attach the event to an incident"
+    )
     event_type: EventType
     message: str
     level: str = Field(default="info", description="Log level: debug, info, warning, error, critical")
@@ -27,7 +29,7 @@ class EventCreate(BaseModel):
 class Event(BaseModel):
     """Event data model - logs, metrics, alerts"""
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    incident_id: str
+    incident_id: Optional[str] = None  # None until anomaly detection attaches it
     event_type: EventType
     message: str
     level: str = "info"
@@ -53,3 +55,56 @@ class Event(BaseModel):
                 }
             }
         }
+
+
+class IngestError(BaseModel):
+    """An input line or batch item that could not be ingested"""
+    line: int = Field(..., description="1-based line number (NDJSON) or item number (batch)")
+    error: str
+
+
+class IngestResult(BaseModel):
+    """Outcome of a streaming ingest request"""
+    accepted: int = 0
+    rejected: int = 0
+    sampled: int = Field(default=0, description="Low-severity events dropped by adaptive sampling")
+    unattached: int = Field(
+        default=0, description="Events without an incident_id seen only by anomaly detection, not stored"
+    )
+    errors: List[IngestError] = Field(default_factory=list, description="First rejected lines, in order")
+
+
+class BatchIngestResult(IngestResult):
+    """Outcome of a batch ingest request, with the stored events"""
+    events: List[Event] = Field(default_factory=list)
+
+
+class EventHistogramBucket(BaseModel):
+    """Event counts for one time bucket"""
+    start: datetime
+    count: int
+    by_level: Dict[str, int] = Field(default_factory=dict)
+    by_source: Dict[str, int] = Field(default_factory=dict)
+
+
+class EventHistogram(BaseModel):
+    """Event counts over a time range, bucketed and broken down by level and source"""
+    incident_id: str
+    bucket_seconds: int
+    total: int = 0
+    by_level: Dict[str, int] = Field(default_factory=dict)
+    by_source: Dict[str, int] = Field(default_factory=dict)
+    buckets: List[EventHistogramBucket] = Field(default_factory=list)
+
+
+class EventSearchHit(BaseModel):
+    """An event matching a search query, with its relevance score"""
+    event: Event
+    score: float
+
+
+class EventSearchResult(BaseModel):
+    """Top matching events, plus match counts over all matches"""
+    total: int = 0
+    incidents: Dict[str, int] = Field(default_factory=dict, description="Matching events per incident")
+    hits: List[EventSearchHit] = Field(default_factory=list)
@@ -25,6 +25,9 @@ class TimelineEntry(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     metadata: dict = Field(default_factory=dict)
 
+    # Position in the incident's timeline, assigned by storage (1, 2, 3, ...)
+    seq: Optional[int] = None
+
     class Config:
         json_schema_extra = {
             "example": {
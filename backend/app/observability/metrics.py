@@ -43,6 +43,24 @@ ai_suggestions_generated = Counter(
     ["suggestion_type"]
 )
 
+vector_index_promotions = Counter(
+    "vector_index_promotions_total",
+    "Vector store index rebuilds into a larger-corpus index type",
+    ["index_type"]
+)
+
+vector_segment_merges = Counter(
+    "vector_segment_merges_total",
+    "Background merges of saved vector store segments",
+    ["kind"]  # vectors, metadata, deleted, base, compaction
+)
+
+vector_filtered_searches = Counter(
+    "vector_filtered_searches_total",
+    "Filtered vector searches by how the filter was applied",
+    ["strategy"]  # exact, prefilter, postfilter
+)
+
 # API metrics
 http_requests = Counter(
     "http_requests_total",
@@ -62,6 +80,18 @@ websocket_connections = Gauge(
     "Active WebSocket connections"
 )
 
+anomalies_detected = Counter(
+    "anomalies_detected_total",
+    "Anomalies that opened incidents automatically",
+    ["kind"]
+)
+
+correlation_proposals = Counter(
+    "correlation_proposals_total",
+    "Merge and attachment proposals raised by event correlation",
+    ["kind"]
+)
+
 # Event metrics
 events_ingested = Counter(
     "events_ingested_total",
@@ -69,6 +99,70 @@ events_ingested = Counter(
     ["event_type", "source"]
 )
 
+events_sampled_out = Counter(
+    "events_sampled_out_total",
+    "Low-severity events dropped by adaptive sampling during log storms",
+    ["level"]
+)
+
+events_stored = Gauge(
+    "events_stored",
+    "Events currently held in storage"
+)
+
+events_stored_bytes = Gauge(
+    "events_stored_bytes",
+    "Estimated memory held by stored events"
+)
+
+events_evicted = Counter(
+    "events_evicted_total",
+    "Events evicted by the retention policy",
+    ["reason"]
+)
+
+events_evicted_bytes = Counter(
+    "events_evicted_bytes_total",
+    "Estimated bytes freed by event evictions",
+    ["reason"]
+)
+
+# Ingest pipeline metrics
+ingest_queue_depth = Gauge(
+    "ingest_queue_depth",
+    "Events waiting in the ingest queue"
+)
+
+ingest_batch_size = Histogram(
+    "ingest_batch_size",
+    "Events per storage write made by the ingest writers",
+    buckets=[1, 10, 50, 100, 250, 500, 1000, 2500, 5000]
+)
+
+ingest_commit_latency = Histogram(
+    "ingest_commit_latency_seconds",
+    "Time from enqueueing events to committing them to storage, per enqueue",
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5]
+)
+
+ingest_rejected = Counter(
+    "ingest_rejected_total",
+    "Events rejected because the ingest queue was full or the batch too large"
+)
+
+ingest_dropped = Counter(
+    "ingest_dropped_total",
+    "Queued events lost before reaching storage",
+    ["reason"]  # write_error, shutdown
+)
+
+
+syslog_lines = Counter(
+    "syslog_lines_total",
+    "Lines received by the syslog listener, by outcome",
+    ["result"]
+)
+
 
 def track_request_metrics(endpoint: str):
     """Decorator to track HTTP request metrics"""
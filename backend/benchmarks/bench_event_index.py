@@ -0,0 +1,65 @@
+"""Benchmark list_events latency as the global event count grows
+
+Usage: python benchmarks/bench_event_index.py [--max-events 1000000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.storage import InMemoryStorage
+from app.models import Incident, IncidentSeverity, Event, EventType
+
+
+def fill(storage: InMemoryStorage, incident_ids, count: int):
+    """Spread `count` events round-robin across incidents"""
+    for i in range(count):
+        storage.create_event(Event.model_construct(
+            id=str(i),
+            incident_id=incident_ids[i % len(incident_ids)],
+            event_type=EventType.LOG,
+            message=f"log line {i}",
+            level="info",
+            source="bench",
+            metadata={},
+            timestamp=Event.model_fields["timestamp"].default_factory(),
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-events", type=int, default=1_000_000)
+    parser.add_argument("--incidents", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    storage = InMemoryStorage()
+    incident_ids = []
+    for i in range(args.incidents):
+        incident = Incident(title=f"Bench {i}", description="bench", severity=IncidentSeverity.LOW)
+        storage.create_incident(incident)
+        incident_ids.append(incident.id)
+
+    total = 0
+    size = 10_000
+    print(f"{'events':>10} {'list_events p50 (us)':>22} {'max (us)':>10}")
+    while size <= args.max_events:
+        fill(storage, incident_ids, size - total)
+        total = size
+
+        samples = []
+        for i in range(args.reads):
+            start = time.perf_counter()
+            storage.list_events(incident_ids[i % len(incident_ids)], limit=args.limit)
+            samples.append((time.perf_counter() - start) * 1e6)
+        samples.sort()
+        print(f"{total:>10} {samples[len(samples) // 2]:>22.1f} {samples[-1]:>10.1f}")
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
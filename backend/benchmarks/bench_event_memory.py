@@ -0,0 +1,65 @@
+"""Benchmark memory per stored event for the objects and columnar event stores
+
+Usage: python benchmarks/bench_event_memory.py [--events 200000]
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.storage import InMemoryStorage
+from app.models import Incident, IncidentSeverity, Event, EventType
+
+LEVELS = ["debug", "info", "info", "info", "warning", "error"]
+
+
+def make_events(incident_ids, count: int):
+    """Realistic log lines: a few hundred distinct messages, some metadata"""
+    for i in range(count):
+        yield Event(
+            incident_id=incident_ids[i % len(incident_ids)],
+            event_type=EventType.LOG,
+            message=f"upstream request failed with status {500 + i % 4} on route /api/v1/items/{i % 200}",
+            level=LEVELS[i % len(LEVELS)],
+            source=f"api-server-{i % 16:02d}",
+            metadata={"container_id": f"c{i % 64}"} if i % 10 == 0 else {},
+        )
+
+
+def measure(event_store: str, count: int) -> float:
+    """Return bytes retained per event"""
+    storage = InMemoryStorage(event_store=event_store)
+    incident_ids = []
+    for i in range(10):
+        incident = Incident(title=f"Bench {i}", description="bench", severity=IncidentSeverity.LOW)
+        storage.create_incident(incident)
+        incident_ids.append(incident.id)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for event in make_events(incident_ids, count):
+        storage.create_event(event)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    objects = measure("objects", args.events)
+    columnar = measure("columnar", args.events)
+    print(f"objects:  {objects:>8.0f} bytes/event")
+    print(f"columnar: {columnar:>8.0f} bytes/event ({objects / columnar:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark the batch ingest endpoint at different batch sizes
+
+Compares the bulk path of `ingest_events_batch` with the previous
+per-event path (an incident lookup, a validated `Event` and a metrics
+update per event) on in-memory storage. Request parsing is included, the
+HTTP layer is not.
+
+Usage: python benchmarks/bench_ingest_batch.py [--events 100000] [--incidents 5]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi import Request, Response
+
+from app.api import ingestion
+from app.ingest import events as events_module
+from app.db.storage import InMemoryStorage
+from app.models import Incident, IncidentSeverity, Event, EventCreate
+from app.observability.metrics import events_ingested
+
+BATCH_SIZES = [10, 100, 1000, 10_000]
+
+request_adapter = TypeAdapter(List[EventCreate])
+
+
+async def per_event_batch(body: bytes) -> List[Event]:
+    """The per-event ingest path, for comparison"""
+    events_data = request_adapter.validate_json(body)
+    storage = ingestion.storage
+    created_events = []
+    for event_data in events_data:
+        if not storage.get_incident(event_data.incident_id):
+            continue
+        event = Event(
+            incident_id=event_data.incident_id,
+            event_type=event_data.event_type,
+            message=event_data.message,
+            level=event_data.level,
+            source=event_data.source,
+            metadata=event_data.metadata,
+        )
+        created_events.append(event)
+        events_ingested.labels(event_type=event.event_type.value, source=event.source).inc()
+    storage.create_events(created_events)
+    return created_events
+
+
+async def bulk_batch(body: bytes):
+    """The batch endpoint, from its JSON body"""
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]}, receive)
+    return await ingestion.ingest_events_batch(request, Response())
+
+
+def run(handler, bodies: List[bytes]) -> float:
+    async def ingest_all():
+        for body in bodies:
+            await handler(body)
+
+    start = time.perf_counter()
+    asyncio.run(ingest_all())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100_000, help="events per batch size")
+    parser.add_argument("--incidents", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'batch size':>10} {'per-event':>14} {'bulk':>14} {'speedup':>8}")
+    for batch_size in BATCH_SIZES:
+        results = []
+        for handler in (per_event_batch, bulk_batch):
+            # Fresh storage per run so both paths insert into the same state
+            ingestion.storage = events_module.storage = InMemoryStorage()
+            incident_ids = [
+                ingestion.storage.create_incident(
+                    Incident(title=f"Incident {i}", description="bench", severity=IncidentSeverity.LOW)
+                ).id
+                for i in range(args.incidents)
+            ]
+            events = [
+                {"incident_id": incident_ids[i % len(incident_ids)], "event_type": "log",
+                 "message": f"request {i} failed", "level": "error", "source": f"host-{i % 10}"}
+                for i in range(batch_size)
+            ]
+            body = json.dumps(events).encode()
+            bodies = [body] * max(args.events // batch_size, 1)
+            elapsed = run(handler, bodies)
+            results.append(len(bodies) * batch_size / elapsed)
+        print(f"{batch_size:>10} {results[0]:>10.0f} ev/s {results[1]:>10.0f} ev/s {results[1] / results[0]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark batch ingest body formats: JSON vs MessagePack, plain and compressed
+
+For each format, reports bytes on the wire per event, the client's
+encoding CPU per event, and the server's CPU per event to decode and
+validate the body and to ingest it (decode, validate and store in
+in-memory storage). Bodies go through the batch handler's decoding path
+in-process; the HTTP layer is not included. Events carry a random trace
+id so compression ratios are not flattered by identical events.
+
+Usage: python benchmarks/bench_ingest_codecs.py [--events 100000] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import msgpack
+import zstandard
+from fastapi import Request, Response
+
+from app.api import ingestion
+from app.db.storage import InMemoryStorage
+from app.ingest import events as events_module
+from app.models import Incident, IncidentSeverity
+
+zstd_compressor = zstandard.ZstdCompressor(level=3)
+
+FORMATS = {
+    "json": ("application/json", None, lambda events: json.dumps(events).encode()),
+    "json+gzip": ("application/json", "gzip", lambda events: gzip.compress(json.dumps(events).encode(), 6)),
+    "json+zstd": ("application/json", "zstd", lambda events: zstd_compressor.compress(json.dumps(events).encode())),
+    "msgpack": ("application/msgpack", None, msgpack.packb),
+    "msgpack+gzip": ("application/msgpack", "gzip", lambda events: gzip.compress(msgpack.packb(events), 6)),
+    "msgpack+zstd": ("application/msgpack", "zstd", lambda events: zstd_compressor.compress(msgpack.packb(events))),
+}
+
+
+def make_request(body: bytes, content_type: str, content_encoding: str = None) -> Request:
+    headers = [(b"content-type", content_type.encode())]
+    if content_encoding:
+        headers.append((b"content-encoding", content_encoding.encode()))
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def cpu_per_event(run, bodies: List[bytes], batch_size: int) -> float:
+    start = time.process_time()
+    run(bodies)
+    return (time.process_time() - start) / (len(bodies) * batch_size) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    levels = ["debug", "info", "warning", "error"]
+    rng = random.Random(42)
+    batches = max(args.events // args.batch_size, 1)
+
+    print(f"{'format':<14} {'bytes/ev':>9} {'encode':>10} {'decode':>10} {'ingest':>10}   (CPU us/event)")
+    for name, (content_type, content_encoding, encode) in FORMATS.items():
+        # Fresh storage per format so every run inserts into the same state
+        ingestion.storage = events_module.storage = InMemoryStorage()
+        incident_id = ingestion.storage.create_incident(
+            Incident(title="Codec benchmark", description="bench", severity=IncidentSeverity.LOW)
+        ).id
+        events = [
+            {"incident_id": incident_id, "event_type": "log", "message": f"GET /api/orders/{i} returned 503",
+             "level": levels[i % 4], "source": f"api-{i % 20}", "metadata": {"status": 503, "latency_ms": rng.randrange(700), "trace_id": "%032x" % rng.getrandbits(128)}}
+            for i in range(args.batch_size)
+        ]
+
+        start = time.process_time()
+        body = encode(events)
+        encode_us = (time.process_time() - start) / args.batch_size * 1e6
+        bodies = [body] * batches
+        decode = ingestion._decode_batch
+
+        async def decode_all(bodies):
+            for body in bodies:
+                await decode(make_request(body, content_type, content_encoding))
+
+        async def ingest_all(bodies):
+            for body in bodies:
+                events_data = await decode(make_request(body, content_type, content_encoding))
+                await ingestion._ingest_batch(events_data, Response())
+
+        decode_us = cpu_per_event(lambda b: asyncio.run(decode_all(b)), bodies, args.batch_size)
+        ingest_us = cpu_per_event(lambda b: asyncio.run(ingest_all(b)), bodies, args.batch_size)
+        print(f"{name:<14} {len(body) / args.batch_size:>9.1f} {encode_us:>10.2f} {decode_us:>10.2f} {ingest_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
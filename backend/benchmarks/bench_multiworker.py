@@ -0,0 +1,83 @@
+"""Benchmark ingest throughput through the shared storage server
+
+Starts a storage server on a temporary socket, then runs 1, 2, 4, ...
+worker processes that each parse and validate events (the per-request
+work a uvicorn worker does) and store them in batches via RemoteStorage.
+
+Usage: python benchmarks/bench_multiworker.py [--max-workers 8] [--events 50000]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.remote import RemoteStorage, StorageServer, _is_listening
+from app.db.storage import InMemoryStorage
+from app.models import Incident, IncidentSeverity, Event, EventCreate
+
+
+def serve(socket_path: str):
+    asyncio.run(StorageServer(InMemoryStorage(), socket_path).serve())
+
+
+def ingest(socket_path: str, incident_id: str, events: int, batch_size: int):
+    storage = RemoteStorage(socket_path)
+    batch = []
+    for i in range(events):
+        data = EventCreate.model_validate_json(
+            f'{{"incident_id": "{incident_id}", "event_type": "log", '
+            f'"message": "request {i} failed", "level": "error", "source": "bench"}}'
+        )
+        batch.append(Event(**data.model_dump()))
+        if len(batch) == batch_size:
+            storage.create_events(batch)
+            batch = []
+    if batch:
+        storage.create_events(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--events", type=int, default=50_000, help="events per worker")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    socket_path = str(Path(tempfile.mkdtemp()) / "storage.sock")
+    server = multiprocessing.Process(target=serve, args=(socket_path,), daemon=True)
+    server.start()
+    while not _is_listening(socket_path):
+        time.sleep(0.05)
+
+    incident = Incident(title="Bench incident", description="bench", severity=IncidentSeverity.LOW)
+    RemoteStorage(socket_path).create_incident(incident)
+
+    print(f"{multiprocessing.cpu_count()} CPUs available")
+    workers = 1
+    baseline = None
+    while workers <= args.max_workers:
+        pool = [
+            multiprocessing.Process(target=ingest, args=(socket_path, incident.id, args.events, args.batch_size))
+            for _ in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in pool:
+            process.start()
+        for process in pool:
+            process.join()
+        throughput = workers * args.events / (time.perf_counter() - start)
+        baseline = baseline or throughput
+        print(f"{workers:>2} worker(s): {throughput:>10.0f} events/s ({throughput / baseline:.1f}x)")
+        workers *= 2
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the full-text event search index
+
+Fills in-memory storage with synthetic log events spread over many
+incidents, then times representative queries: a rare term, a common term,
+a phrase, a conjunction and an exclusion.
+
+Usage: python benchmarks/bench_search.py [--events 1000000] [--incidents 1000]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.storage import InMemoryStorage
+from app.models import Incident, IncidentSeverity, Event, EventType
+
+MESSAGES = [
+    "GET /api/users/{n} 200 in {n}ms",
+    "POST /api/orders/{n} 201 in {n}ms",
+    "cache miss for key user:{n}",
+    "PostgreSQL connection pool exhausted after {n}ms",
+    "upstream request timeout to payments-{n}",
+    "worker {n} restarted by supervisor",
+    "disk usage at {n} percent on /var/lib/data",
+]
+
+QUERIES = [
+    "supervisor",
+    "api",
+    '"connection pool exhausted"',
+    "timeout payments",
+    "pool -postgresql",
+    "orders OR users",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--incidents", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    storage = InMemoryStorage(search_index=True, event_store="columnar")
+    incidents = [
+        storage.create_incident(Incident(title=f"Incident {i}", description="bench", severity=IncidentSeverity.LOW)).id
+        for i in range(args.incidents)
+    ]
+    # Rare messages are rare: the first two templates dominate
+    weights = [40, 30, 15, 5, 5, 3, 2]
+
+    start = time.perf_counter()
+    for _ in range(args.events):
+        template = rng.choices(MESSAGES, weights)[0]
+        storage.create_event(Event(
+            incident_id=rng.choice(incidents),
+            event_type=EventType.LOG,
+            message=template.replace("{n}", str(rng.randrange(1000))),
+            level="error",
+            source=f"host-{rng.randrange(50)}",
+        ))
+    elapsed = time.perf_counter() - start
+    postings = sum(p.nbytes for p in storage.search_index.postings.values())
+    print(f"Indexed {args.events} events in {elapsed:.1f}s ({args.events / elapsed:.0f} events/s), "
+          f"postings {postings / args.events:.1f} bytes/event")
+
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = storage.search_events(query, limit=20)
+            timings.append(time.perf_counter() - start)
+        print(f"{query:>32}: {result.total:>8} matches, {min(timings) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark concurrent ingest and status updates from many threads
+
+Compares a single InMemoryStorage behind one global lock with
+ShardedStorage, where each shard has its own lock.
+
+Usage: python benchmarks/bench_sharded_contention.py [--threads 16] [--shards 16]
+"""
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.sharded import ShardedStorage
+from app.models import Incident, IncidentSeverity, IncidentStatus, Event, EventType
+
+STATUS_CYCLE = [IncidentStatus.OPEN, IncidentStatus.INVESTIGATING, IncidentStatus.IDENTIFIED]
+
+
+def worker(storage, incident_ids, ops: int, seed: int, conflicts: list):
+    """Mostly event ingest, with a compare-and-set status change every 10 ops"""
+    lost = 0
+    for i in range(ops):
+        incident_id = incident_ids[(seed * 7919 + i) % len(incident_ids)]
+        if i % 10 == 0:
+            incident = storage.get_incident(incident_id)
+            current = incident.status
+            following = STATUS_CYCLE[(STATUS_CYCLE.index(current) + 1) % len(STATUS_CYCLE)]
+            if storage.compare_and_set_status(incident_id, current, {"status": following}) is None:
+                lost += 1
+        else:
+            storage.create_event(Event(
+                incident_id=incident_id,
+                event_type=EventType.LOG,
+                message="request timed out",
+                source=f"worker-{seed}",
+            ))
+    conflicts.append(lost)
+
+
+def run(storage, threads: int, ops: int, incidents: int):
+    incident_ids = []
+    for i in range(incidents):
+        incident = Incident(title=f"Bench {i}", description="bench", severity=IncidentSeverity.LOW)
+        storage.create_incident(incident)
+        incident_ids.append(incident.id)
+
+    conflicts = []
+    pool = [threading.Thread(target=worker, args=(storage, incident_ids, ops, t, conflicts)) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops / elapsed, sum(conflicts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=20_000, help="operations per thread")
+    parser.add_argument("--incidents", type=int, default=256)
+    args = parser.parse_args()
+
+    free_threaded = not getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"{args.threads} threads, free-threaded interpreter: {free_threaded}")
+    for shards in (1, args.shards):
+        throughput, conflicts = run(ShardedStorage(shards), args.threads, args.ops, args.incidents)
+        print(f"{shards:>3} shard(s): {throughput:>10.0f} ops/s, {conflicts} CAS conflicts detected")
+
+
+if __name__ == "__main__":
+    main()
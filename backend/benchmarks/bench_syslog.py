@@ -0,0 +1,131 @@
+"""Benchmark the syslog listener against the single-event REST endpoint
+
+A generator process sends RFC5424, RFC3164 or JSON lines to a listener on
+localhost over TCP and UDP; throughput is measured from the first line
+sent to the last event stored in in-memory storage. UDP has no flow
+control, so the UDP generator is paced at `--udp-rate` lines/s and lines
+the kernel or the listener still drop are reported as lost.
+The REST figure posts events one by one through the ASGI app in-process.
+
+Usage: python benchmarks/bench_syslog.py [--events 200000] [--udp-rate 10000] [--rest-events 5000]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import sys
+import time
+from pathlib import Path
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.db.storage import storage
+from app.ingest.syslog import SyslogListener, SyslogRouter
+from app.main import app
+from app.models import Incident, IncidentSeverity
+
+FORMATS = {
+    "rfc5424": lambda i: f"<11>1 2024-05-01T12:00:00.000Z host-{i % 50} api 4242 REQ - request {i} failed",
+    "rfc3164": lambda i: f"<11>May  1 12:00:00 host-{i % 50} api[4242]: request {i} failed",
+    "json": lambda i: json.dumps({"event_type": "log", "message": f"request {i} failed",
+                                  "level": "error", "source": f"host-{i % 50}"}),
+}
+
+LINES_PER_WRITE = 1000
+
+
+def generate(protocol: str, fmt: str, port: int, count: int, udp_rate: float):
+    """Send `count` lines to the listener; runs in a child process"""
+    make_line = FORMATS[fmt]
+    if protocol == "tcp":
+        with socket.create_connection(("127.0.0.1", port)) as sock:
+            for start in range(0, count, LINES_PER_WRITE):
+                sock.sendall("".join(make_line(i) + "\n" for i in range(start, min(start + LINES_PER_WRITE, count))).encode())
+    else:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+            start = time.perf_counter()
+            for i in range(count):
+                sock.sendto(make_line(i).encode(), ("127.0.0.1", port))
+                if i % LINES_PER_WRITE == 0:
+                    time.sleep(max(0.0, start + i / udp_rate - time.perf_counter()))
+
+
+def accepted() -> float:
+    return REGISTRY.get_sample_value("syslog_lines_total", {"result": "accepted"}) or 0.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_listener(protocol: str, fmt: str, count: int, udp_rate: float, incident_id: str):
+    port = free_port()
+    listener = SyslogListener(
+        SyslogRouter([], default_incident_id=incident_id),
+        host="127.0.0.1",
+        udp_port=port if protocol == "udp" else 0,
+        tcp_port=port if protocol == "tcp" else 0,
+    )
+    await listener.start()
+    base = accepted()
+
+    start = time.perf_counter()
+    generator = multiprocessing.Process(target=generate, args=(protocol, fmt, port, count, udp_rate))
+    generator.start()
+
+    # Wait until every line is stored, or nothing arrived for a second
+    stored, last_change = 0.0, time.perf_counter()
+    while stored < count and time.perf_counter() - last_change < 1.0:
+        await asyncio.sleep(0.005)
+        if accepted() - base != stored:
+            stored, last_change = accepted() - base, time.perf_counter()
+    elapsed = last_change - start
+
+    generator.join()
+    await listener.close()
+    return int(stored), elapsed
+
+
+def run_rest(count: int, incident_id: str) -> float:
+    with TestClient(app) as client:
+        start = time.perf_counter()
+        for i in range(count):
+            client.post("/api/ingest/events", json={
+                "incident_id": incident_id, "event_type": "log",
+                "message": f"request {i} failed", "level": "error", "source": f"host-{i % 50}",
+            })
+        return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=200_000, help="lines per syslog run")
+    parser.add_argument("--udp-rate", type=float, default=10_000, help="UDP lines sent per second")
+    parser.add_argument("--rest-events", type=int, default=5000)
+    args = parser.parse_args()
+
+    incident_id = storage.create_incident(
+        Incident(title="Syslog benchmark", description="bench", severity=IncidentSeverity.LOW)
+    ).id
+
+    rest_rate = run_rest(args.rest_events, incident_id)
+    print(f"{'path':<16} {'stored':>9} {'lost':>7} {'rate':>14} {'vs REST':>8}")
+    print(f"{'rest (single)':<16} {args.rest_events:>9} {0:>7} {rest_rate:>10.0f} ev/s {1:>7.1f}x")
+    for protocol in ("tcp", "udp"):
+        for fmt in FORMATS:
+            stored, elapsed = asyncio.run(run_listener(protocol, fmt, args.events, args.udp_rate, incident_id))
+            rate = stored / elapsed
+            print(f"{protocol + ' ' + fmt:<16} {stored:>9} {args.events - stored:>7} "
+                  f"{rate:>10.0f} ev/s {rate / rest_rate:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
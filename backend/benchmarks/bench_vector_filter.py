@@ -0,0 +1,125 @@
+"""Benchmark filtered VectorStore search as filters get more selective
+
+Builds a store over synthetic clustered 384-d embeddings whose metadata
+carries a timestamp spread evenly over a year, then searches with time
+windows matching a shrinking share of the corpus. For each window it
+reports the strategy the store picked (exact, prefilter or postfilter),
+the mean latency per query through `VectorStore.search` with the filter,
+recall@k against the exact filtered neighbours, and for comparison the
+latency of filtering in the caller: searching for k / share hits without
+a filter and dropping the ones outside the window.
+
+Usage: python benchmarks/bench_vector_filter.py [--size 1000000] [--types flat,ivf_flat] [--queries 100] [--k 10]
+"""
+import argparse
+import math
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.db.vector_attributes import VectorFilter
+from app.db.vector_store import VectorStore
+from app.observability.metrics import vector_filtered_searches
+
+DIMENSION = 384
+ADD_CHUNK = 100_000
+YEAR_SECONDS = 365 * 24 * 3600
+NOW = datetime(2026, 1, 1)
+SHARES = [1.0, 0.5, 0.2, 0.05, 0.01, 0.001, 0.0001]
+
+
+def normalized(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def embeddings(count: int, centres: np.ndarray, spread: float, rng: np.random.Generator) -> np.ndarray:
+    """Normalized points scattered around randomly chosen centres"""
+    out = np.empty((count, DIMENSION), dtype="float32")
+    for start in range(0, count, ADD_CHUNK):
+        end = min(start + ADD_CHUNK, count)
+        chunk = centres[rng.integers(len(centres), size=end - start)]
+        chunk += rng.standard_normal(chunk.shape, dtype="float32") * (spread / np.sqrt(DIMENSION))
+        out[start:end] = normalized(chunk)
+    return out
+
+
+def exact_neighbours(data: np.ndarray, allowed: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Exact top-k ids among the allowed rows"""
+    rows = np.flatnonzero(allowed)
+    truth = []
+    for query in queries:
+        scores = np.concatenate([data[rows[start:start + ADD_CHUNK]] @ query
+                                 for start in range(0, len(rows), ADD_CHUNK)])
+        truth.append(set(rows[np.argsort(-scores)[:k]].tolist()))
+    return truth
+
+
+def strategy_counts() -> dict:
+    return {strategy: vector_filtered_searches.labels(strategy=strategy)._value.get()
+            for strategy in ("exact", "prefilter", "postfilter")}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--types", default="flat,ivf_flat")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centres = normalized(rng.standard_normal((max(args.size // 100, 1), DIMENSION), dtype="float32"))
+    data = embeddings(args.size, centres, 0.6, rng)
+    queries = embeddings(args.queries, centres, 0.6, rng)
+    ages = rng.integers(YEAR_SECONDS, size=args.size)
+
+    for index_type in args.types.split(","):
+        with tempfile.TemporaryDirectory() as path:
+            store = VectorStore(dimension=DIMENSION, index_path=path, index_type=index_type, background=False)
+            for start in range(0, args.size, ADD_CHUNK):
+                chunk = data[start:start + ADD_CHUNK]
+                store.add_vectors(chunk, [
+                    {"id": i, "timestamp": (NOW - timedelta(seconds=int(ages[i]))).isoformat()}
+                    for i in range(start, start + len(chunk))
+                ])
+            print(f"\n{index_type}: {args.size} vectors, {args.queries} queries, recall@{args.k}")
+            print(f"{'share':>8} {'strategy':>10} {'ms/query':>9} {'recall':>7} {'caller ms':>10} {'recall':>7}")
+
+            for share in SHARES:
+                window = int(YEAR_SECONDS * share)
+                vector_filter = VectorFilter(since=NOW - timedelta(seconds=window))
+                truth = exact_neighbours(data, ages < window, queries, args.k)
+
+                before = strategy_counts()
+                start = time.perf_counter()
+                results = [store.search(query, args.k, vector_filter=vector_filter) for query in queries]
+                latency = (time.perf_counter() - start) / len(queries) * 1000
+                strategy = max(strategy_counts().items(), key=lambda item: item[1] - before[item[0]])[0]
+                found = sum(len({hit["id"] for hit in hits} & expected) for hits, expected in zip(results, truth))
+
+                # Filtering in the caller needs k / share hits to keep k
+                fetch = min(math.ceil(args.k / share), args.size)
+                start = time.perf_counter()
+                caller = [
+                    [hit for hit in store.search(query, fetch) if ages[hit["id"]] < window][:args.k]
+                    for query in queries
+                ]
+                caller_latency = (time.perf_counter() - start) / len(queries) * 1000
+                caller_found = sum(len({hit["id"] for hit in hits} & expected) for hits, expected in zip(caller, truth))
+
+                expected_total = sum(len(expected) for expected in truth)
+                print(f"{share:>8.4f} {strategy:>10} {latency:>9.3f} {found / expected_total:>7.3f} "
+                      f"{caller_latency:>10.3f} {caller_found / expected_total:>7.3f}")
+            del store
+
+
+if __name__ == "__main__":
+    main()
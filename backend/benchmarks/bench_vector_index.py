@@ -0,0 +1,134 @@
+"""Benchmark VectorStore index types: recall@k against query latency
+
+Builds each index type over synthetic 384-d embeddings (normalized points
+around cluster centres that are themselves grouped into topics, like
+sentence embeddings of related log lines) and sweeps its per-query knob:
+nprobe for the IVF indexes, ef_search for HNSW. Reports build time, on-disk
+bytes per vector, and for each setting the mean latency per query through
+`VectorStore.search` and through one `VectorStore.search_batch` call for
+all queries, and recall@k against exact neighbours. HNSW builds are slow on
+few cores; leave it out of --types for the largest sizes if needed.
+
+Usage: python benchmarks/bench_vector_index.py [--sizes 10000,100000,1000000] [--types flat,ivf_flat,ivf_pq,hnsw] [--queries 200] [--k 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import faiss
+
+from app.db.vector_store import VectorStore
+
+DIMENSION = 384
+ADD_CHUNK = 100_000
+SWEEPS = {
+    "flat": [None],
+    "ivf_flat": [1, 4, 16, 64],
+    "ivf_pq": [1, 4, 16, 64],
+    "hnsw": [16, 32, 64, 128, 256],
+}
+
+
+def normalized(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def cluster_centres(count: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    """Cluster centres scattered around a smaller set of topic centres"""
+    topic_centres = normalized(rng.standard_normal((topics, DIMENSION), dtype="float32"))
+    noise = rng.standard_normal((count, DIMENSION), dtype="float32") * (0.8 / np.sqrt(DIMENSION))
+    return normalized(topic_centres[rng.integers(topics, size=count)] + noise)
+
+
+def embeddings(count: int, centres: np.ndarray, spread: float, rng: np.random.Generator) -> np.ndarray:
+    """Normalized points scattered around randomly chosen centres, `spread` away on average"""
+    out = np.empty((count, DIMENSION), dtype="float32")
+    for start in range(0, count, ADD_CHUNK):
+        end = min(start + ADD_CHUNK, count)
+        chunk = centres[rng.integers(len(centres), size=end - start)]
+        chunk += rng.standard_normal(chunk.shape, dtype="float32") * (spread / np.sqrt(DIMENSION))
+        out[start:end] = normalized(chunk)
+    return out
+
+
+def exact_neighbours(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k ids by cosine similarity, scanning the data in chunks"""
+    best_scores = np.full((len(queries), k), -np.inf, dtype="float32")
+    best_ids = np.zeros((len(queries), k), dtype="int64")
+    for start in range(0, len(data), ADD_CHUNK):
+        scores = queries @ data[start:start + ADD_CHUNK].T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        candidates = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        ids = np.concatenate([best_ids, top + start], axis=1)
+        keep = np.argsort(-candidates, axis=1)[:, :k]
+        best_scores = np.take_along_axis(candidates, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+    return best_ids
+
+
+def bytes_per_vector(index, count: int) -> float:
+    with tempfile.NamedTemporaryFile(suffix=".faiss") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name) / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--types", default="flat,ivf_flat,ivf_pq,hnsw")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--per-cluster", type=int, default=100, help="vectors per cluster centre")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=0.6, help="noise norm around each cluster centre")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        centres = cluster_centres(max(size // args.per_cluster, 1), args.topics, rng)
+        data = embeddings(size, centres, args.spread, rng)
+        queries = embeddings(args.queries, centres, args.spread, rng)
+        truth = exact_neighbours(data, queries, args.k)
+        print(f"\n{size} vectors, {args.queries} queries, recall@{args.k}")
+        print(f"{'index':<9} {'build s':>8} {'B/vec':>7} {'knob':>11} {'recall':>7} {'ms/query':>9} {'batched':>8}")
+
+        for index_type in args.types.split(","):
+            with tempfile.TemporaryDirectory() as path:
+                store = VectorStore(dimension=DIMENSION, index_path=path, index_type=index_type, background=False)
+                start = time.perf_counter()
+                for chunk_start in range(0, size, ADD_CHUNK):
+                    chunk = data[chunk_start:chunk_start + ADD_CHUNK]
+                    store.add_vectors(chunk, [{"id": i} for i in range(chunk_start, chunk_start + len(chunk))])
+                build = time.perf_counter() - start
+                if store.index_type != index_type:
+                    print(f"{index_type:<9} not built ({size} vectors are too few to train it)")
+                    continue
+                size_per_vector = bytes_per_vector(store.index, size)
+
+                for knob in SWEEPS[index_type]:
+                    kwargs = {"ef_search": knob} if index_type == "hnsw" else {"nprobe": knob}
+                    start = time.perf_counter()
+                    results = [store.search(query, args.k, **kwargs) for query in queries]
+                    latency = (time.perf_counter() - start) / len(queries) * 1000
+                    start = time.perf_counter()
+                    store.search_batch(queries, args.k, **kwargs)
+                    batched = (time.perf_counter() - start) / len(queries) * 1000
+                    found = sum(len({r["id"] for r in hits} & set(expected))
+                                for hits, expected in zip(results, truth.tolist()))
+                    label = "-" if knob is None else ("ef=" if index_type == "hnsw" else "nprobe=") + str(knob)
+                    print(f"{index_type:<9} {build:>8.1f} {size_per_vector:>7.0f} {label:>11} "
+                          f"{found / truth.size:>7.3f} {latency:>9.3f} {batched:>8.3f}")
+            del store
+
+
+if __name__ == "__main__":
+    main()
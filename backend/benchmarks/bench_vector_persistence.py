@@ -0,0 +1,112 @@
+"""Benchmark VectorStore persistence: incremental saves and memory-mapped loads
+
+Fills a store with N random 384-d vectors (with small metadata dicts), then
+measures the first save, saves of `--delta` new vectors at a time, and
+opening the saved store again: load time, resident memory added by the
+load, and the first and steady-state query latency. The same corpus is
+also written and read the way the store used to persist itself (the whole
+FAISS index plus one metadata pickle) for comparison.
+
+Usage: python benchmarks/bench_vector_persistence.py [--size 200000] [--delta 1000] [--saves 20]
+"""
+import argparse
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the app directory to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import faiss
+
+from app.db.vector_store import VectorStore
+
+DIMENSION = 384
+ADD_CHUNK = 100_000
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096 / 2 ** 20
+
+
+def metadata(start: int, count: int):
+    return [{"id": i, "incident_id": f"incident-{i % 997}", "source": "api"} for i in range(start, start + count)]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--delta", type=int, default=1000, help="vectors added between incremental saves")
+    parser.add_argument("--saves", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as path:
+        store = VectorStore(dimension=DIMENSION, index_path=path, index_type="flat", background=False)
+        for start in range(0, args.size, ADD_CHUNK):
+            count = min(ADD_CHUNK, args.size - start)
+            store.add_vectors(rng.standard_normal((count, DIMENSION), dtype="float32"), metadata(start, count))
+        first, _ = timed(store.save)
+
+        incremental = []
+        size = args.size
+        for _ in range(args.saves):
+            store.add_vectors(rng.standard_normal((args.delta, DIMENSION), dtype="float32"), metadata(size, args.delta))
+            size += args.delta
+            elapsed, _ = timed(store.save)
+            incremental.append(elapsed)
+
+        # The previous format: rewrite everything on every save
+        legacy_dir = Path(path) / "legacy"
+        legacy_dir.mkdir()
+
+        def legacy_save():
+            faiss.write_index(store.index, str(legacy_dir / "index.faiss"))
+            with open(legacy_dir / "metadata.pkl", "wb") as f:
+                pickle.dump(list(store.metadata), f)
+
+        legacy, _ = timed(legacy_save)
+        manifest = store._manifest
+        del store
+
+        print(f"{size} vectors, saves of {args.delta}")
+        print(f"first save:        {first * 1000:9.1f} ms")
+        print(f"incremental save:  {np.median(incremental) * 1000:9.1f} ms median, "
+              f"{max(incremental) * 1000:.1f} ms max ({len(manifest['vectors'])} vector and "
+              f"{len(manifest['metadata'])} metadata segments left)")
+        print(f"full rewrite save: {legacy * 1000:9.1f} ms (index file + metadata pickle)")
+
+        query = rng.standard_normal(DIMENSION, dtype="float32")
+        before = rss_mb()
+        load, store = timed(VectorStore, DIMENSION, path, "flat")
+        loaded = rss_mb() - before
+        first_query, _ = timed(store.search, query, 10)
+        steady = min(timed(store.search, query, 10)[0] for _ in range(5))
+        print(f"segmented load:    {load * 1000:9.1f} ms, +{loaded:.0f} MB resident, "
+              f"first query {first_query * 1000:.1f} ms, then {steady * 1000:.1f} ms")
+        del store
+
+        before = rss_mb()
+        start = time.perf_counter()
+        index = faiss.read_index(str(legacy_dir / "index.faiss"))
+        with open(legacy_dir / "metadata.pkl", "rb") as f:
+            records = pickle.load(f)
+        load = time.perf_counter() - start
+        print(f"full load:         {load * 1000:9.1f} ms, +{rss_mb() - before:.0f} MB resident "
+              f"({index.ntotal} vectors, {len(records)} metadata entries)")
+
+
+if __name__ == "__main__":
+    main()